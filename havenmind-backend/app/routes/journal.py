@@ -16,14 +16,11 @@ def create_entry():
     # Get user context for personalized responses
     user_context = _get_user_context(user_id)
     
-    # Advanced sentiment analysis using Gemini
-    sentiment_analysis = gemini_ai.analyze_sentiment_advanced(content)
-    
-    # Crisis assessment
-    crisis_assessment = gemini_ai.assess_crisis_risk(content, sentiment_analysis)
-    
-    # Generate therapeutic AI response
-    ai_response = gemini_ai.generate_therapeutic_response(content, sentiment_analysis, user_context)
+    # Sentiment, crisis assessment and therapeutic response in one Gemini call
+    analysis = gemini_ai.analyze_entry(content, user_context)
+    sentiment_analysis = analysis['sentiment']
+    crisis_assessment = analysis['crisis']
+    ai_response = analysis['ai_response']
     
     # Save to database
     session = get_db_session()
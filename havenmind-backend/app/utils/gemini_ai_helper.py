@@ -5,6 +5,10 @@ import json
 import re
 from typing import Dict, List, Optional
 
+SENTIMENT_SCORES = {"positive": 0.8, "mixed": 0.5, "neutral": 0.5, "negative": 0.2}
+STRESS_LEVELS = ["low", "medium", "high", "crisis"]
+CRISIS_LEVELS = ["none", "low", "medium", "high", "immediate"]
+
 class GeminiTherapeuticAI:
     def __init__(self):
         # Configure Gemini AI
@@ -70,6 +74,77 @@ class GeminiTherapeuticAI:
             print(f"Gemini analysis error: {e}")
             return self._fallback_sentiment_analysis(text)
     
+    def analyze_entry(self, text: str, user_context: Optional[Dict] = None) -> Dict:
+        """Sentiment, crisis assessment and therapeutic response for a journal entry in one Gemini call"""
+        if not self.model:
+            return self._fallback_entry_analysis(text)
+        
+        context_info = ""
+        if user_context:
+            context_info = f"""
+            Additional context about the student:
+            - Previous entries mood trend: {user_context.get('mood_trend', 'unknown')}
+            - Recent stress level: {user_context.get('recent_stress', 'unknown')}
+            - Writing frequency: {user_context.get('writing_frequency', 'unknown')}
+            """
+        
+        prompt = f"""
+        {self.therapeutic_context}
+        
+        {context_info}
+        
+        Student's journal entry: "{text}"
+        
+        Analyze the entry, assess it for crisis indicators (suicidal ideation or self-harm,
+        severe hopelessness, substance abuse, extreme isolation, academic/life crisis) and
+        write a 2-4 sentence therapeutic response that acknowledges their emotions, validates
+        them, offers gentle support and ends with a reflective question.
+        
+        Respond only with valid JSON of this shape:
+        {{
+            "sentiment": {{
+                "sentiment": "positive|negative|neutral|mixed",
+                "emotions": ["up to 3 specific emotions"],
+                "stress_level": "low|medium|high|crisis",
+                "concerns": ["specific concerns or challenges mentioned"],
+                "strengths": ["positive aspects or coping mechanisms mentioned"]
+            }},
+            "crisis": {{
+                "crisis_level": "none|low|medium|high|immediate",
+                "risk_factors": ["list of specific concerns"],
+                "recommended_action": "description of suggested response",
+                "urgent": true
+            }},
+            "response": "the therapeutic response"
+        }}
+        """
+        
+        try:
+            response = self.model.generate_content(prompt)
+            analysis = self._parse_json_object(response.text)
+        except Exception as e:
+            print(f"Gemini entry analysis error: {e}")
+            return self._fallback_entry_analysis(text)
+        
+        # Validate each section on its own so one malformed part does not discard the others
+        sentiment_analysis = self._validate_sentiment(analysis.get('sentiment'))
+        if sentiment_analysis is None:
+            sentiment_analysis = self._fallback_sentiment_analysis(text)
+        
+        crisis_assessment = self._validate_crisis(analysis.get('crisis'))
+        if crisis_assessment is None:
+            crisis_assessment = self._fallback_crisis_assessment(text, sentiment_analysis)
+        
+        ai_response = analysis.get('response')
+        if not isinstance(ai_response, str) or not ai_response.strip():
+            ai_response = self._fallback_therapeutic_response(text, sentiment_analysis)
+        
+        return {
+            'sentiment': sentiment_analysis,
+            'crisis': crisis_assessment,
+            'ai_response': ai_response.strip()
+        }
+    
     def generate_therapeutic_response(self, user_input: str, sentiment_analysis: Dict, user_context: Optional[Dict] = None) -> str:
         """Generate personalized therapeutic response using Gemini AI"""
         if not self.model:
@@ -179,6 +254,67 @@ class GeminiTherapeuticAI:
             print(f"Crisis assessment error: {e}")
             return self._fallback_crisis_assessment(text, sentiment_analysis)
     
+    def _parse_json_object(self, text: str) -> Dict:
+        """Parse the JSON object in a model reply, tolerating ```json fences around it"""
+        match = re.search(r'\{.*\}', text, re.DOTALL)
+        if not match:
+            raise ValueError("No JSON object in response")
+        data = json.loads(match.group(0))
+        if not isinstance(data, dict):
+            raise ValueError("Response is not a JSON object")
+        return data
+    
+    def _validate_sentiment(self, data) -> Optional[Dict]:
+        """Normalized sentiment section, or None if it does not match the schema"""
+        if not isinstance(data, dict):
+            return None
+        sentiment = str(data.get('sentiment', '')).lower()
+        stress_level = str(data.get('stress_level', '')).lower()
+        if sentiment not in SENTIMENT_SCORES or stress_level not in STRESS_LEVELS:
+            return None
+        
+        return {
+            'sentiment': sentiment,
+            'score': SENTIMENT_SCORES[sentiment],
+            'stress_level': stress_level,
+            'emotions': self._string_list(data.get('emotions'))[:3],
+            'concerns': self._string_list(data.get('concerns')),
+            'strengths': self._string_list(data.get('strengths'))
+        }
+    
+    def _validate_crisis(self, data) -> Optional[Dict]:
+        """Normalized crisis section, or None if it does not match the schema"""
+        if not isinstance(data, dict):
+            return None
+        crisis_level = str(data.get('crisis_level', '')).lower()
+        if crisis_level not in CRISIS_LEVELS:
+            return None
+        
+        urgent = data.get('urgent', False)
+        if isinstance(urgent, str):
+            urgent = urgent.strip().lower() == 'true'
+        
+        return {
+            'crisis_level': crisis_level,
+            'risk_factors': self._string_list(data.get('risk_factors')),
+            'recommended_action': str(data.get('recommended_action') or 'Continue monitoring'),
+            'urgent': bool(urgent) or crisis_level == 'immediate'
+        }
+    
+    def _string_list(self, value) -> List[str]:
+        if not isinstance(value, list):
+            return []
+        return [str(item) for item in value if item]
+    
+    def _fallback_entry_analysis(self, text: str) -> Dict:
+        """Fallback for analyze_entry built from the individual fallbacks"""
+        sentiment_analysis = self._fallback_sentiment_analysis(text)
+        return {
+            'sentiment': sentiment_analysis,
+            'crisis': self._fallback_crisis_assessment(text, sentiment_analysis),
+            'ai_response': self._fallback_therapeutic_response(text, sentiment_analysis)
+        }
+    
     def _fallback_sentiment_analysis(self, text: str) -> Dict:
         """Fallback sentiment analysis when Gemini is unavailable"""
         negative_words = ['stressed', 'anxious', 'overwhelmed', 'tired', 'sad', 'difficult', 'hard', 'worried', 'scared', 'late', 'afraid']
@@ -0,0 +1,124 @@
+"""
+Alert Coalescing for HavenMind
+Folds alerts to the same emergency contact within a window into one escalating message and a closing digest, severity upgrades always go out
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from crisis_screening import SEVERITY_RANK
+from outbox import enqueue, KIND_EMERGENCY_SMS, PRIORITY_URGENT, STATUS_PENDING
+
+TOPIC_CRISIS = 'crisis'
+TOPIC_LOCATION = 'location'
+
+# What enqueue_alert did with an alert
+ALERT_QUEUED = 'queued'
+ALERT_MERGED = 'merged'
+ALERT_DEFERRED = 'deferred'
+
+
+class AlertCoalescer:
+    def __init__(self, window_seconds=None):
+        self.window_seconds = window_seconds or float(os.getenv('ALERT_COALESCE_MINUTES', '10')) * 60
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.bypassed = 0
+        self.merged = 0
+        self.suppressed = 0
+
+    def enqueue_alert(self, conn, recipient, topic, message, key, severity=None):
+        """Queue message for recipient in conn's transaction, folding it into the window's alert on topic.
+
+        Inside the window a still-queued alert is rewritten to the latest message with a
+        running count (ALERT_MERGED). Once the window's alert was sent, later ones go into
+        one digest sent when the window closes, carrying the latest message and how many
+        were held (ALERT_DEFERRED). A higher severity than the window's always opens a new
+        window. Returns ALERT_QUEUED when a new alert was queued.
+        Callers must already hold the write lock, i.e. have written in this transaction,
+        so two requests cannot both open a window for the same recipient.
+        """
+        now = time.time()
+        window = conn.execute(
+            'SELECT * FROM alert_windows WHERE recipient = ? AND topic = ?', (recipient, topic)
+        ).fetchone()
+        
+        upgrade = window is not None and SEVERITY_RANK.get(severity, 0) > SEVERITY_RANK.get(window['severity'], 0)
+        if window is None or upgrade or now - window['opened_ts'] >= self.window_seconds:
+            # A digest still waiting for the old window's end is folded into this alert
+            if window is not None and conn.execute(
+                'DELETE FROM notification_outbox WHERE idempotency_key = ? AND status = ?',
+                (self._digest_key(window), STATUS_PENDING)
+            ).rowcount:
+                message += f"\n\n({window['suppressed']} more alert(s) since {self._clock(window['opened_ts'])} were held back)"
+            outbox_id = enqueue(conn, KIND_EMERGENCY_SMS, {'to_phone': recipient, 'message': message}, key, PRIORITY_URGENT)
+            conn.execute(
+                '''INSERT OR REPLACE INTO alert_windows (recipient, topic, opened_ts, severity, alerts, suppressed, outbox_id)
+                   VALUES (?, ?, ?, ?, 1, 0, ?)''',
+                (recipient, topic, now, severity, outbox_id)
+            )
+            with self._lock:
+                self.sent += 1
+                self.bypassed += upgrade
+            return ALERT_QUEUED
+        
+        alerts = window['alerts'] + 1
+        queued = conn.execute(
+            'SELECT payload FROM notification_outbox WHERE id = ? AND status = ?', (window['outbox_id'], STATUS_PENDING)
+        ).fetchone()
+        if queued:
+            # Not sent yet, so the contact gets the latest news once instead of a burst
+            payload = json.loads(queued['payload'])
+            payload['message'] = f"{message}\n\n({alerts} alerts since {self._clock(window['opened_ts'])})"
+            conn.execute('UPDATE notification_outbox SET payload = ? WHERE id = ?', (json.dumps(payload), window['outbox_id']))
+            conn.execute('UPDATE alert_windows SET alerts = ? WHERE recipient = ? AND topic = ?', (alerts, recipient, topic))
+            with self._lock:
+                self.merged += 1
+            return ALERT_MERGED
+        
+        # Already sent, so this one and any later ones in the window go out together when it closes
+        suppressed = window['suppressed'] + 1
+        payload = {
+            'to_phone': recipient,
+            'message': f"{message}\n\n({suppressed} more alert(s) since {self._clock(window['opened_ts'])})"
+        }
+        digest_key = self._digest_key(window)
+        updated = conn.execute(
+            'UPDATE notification_outbox SET payload = ? WHERE idempotency_key = ? AND status = ?',
+            (json.dumps(payload), digest_key, STATUS_PENDING)
+        ).rowcount
+        if not updated:
+            enqueue(conn, KIND_EMERGENCY_SMS, payload, digest_key, PRIORITY_URGENT,
+                    not_before=window['opened_ts'] + self.window_seconds)
+        conn.execute(
+            'UPDATE alert_windows SET alerts = ?, suppressed = ? WHERE recipient = ? AND topic = ?',
+            (alerts, suppressed, recipient, topic)
+        )
+        with self._lock:
+            self.suppressed += 1
+        return ALERT_DEFERRED
+
+    @staticmethod
+    def _digest_key(window):
+        return f"alert_digest:{window['recipient']}:{window['topic']}:{window['opened_ts']!r}"
+
+    @staticmethod
+    def _clock(ts):
+        return datetime.fromtimestamp(ts).strftime('%H:%M')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'window_seconds': self.window_seconds,
+                'sent': self.sent,
+                'severity_bypassed': self.bypassed,
+                'merged': self.merged,
+                'suppressed': self.suppressed
+            }
+
+
+# Global alert coalescer instance
+alert_coalescer = AlertCoalescer()
@@ -1,14 +1,30 @@
 
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, g, Response, stream_with_context
+import json
 import sqlite3
 from datetime import datetime, timedelta
 import os
 import hashlib
 import secrets
+import time
 from functools import wraps
 from dotenv import load_dotenv
 from notification_system import notification_system, send_crisis_alert
+from db import get_db_connection, init_app as init_db_pool
+from migrator import apply_migrations
+from timestamps import now_ts, days_ago_ts, days_ahead_ts, local_month_bounds
+from user_cache import get_user, invalidate_user
+from conversation_versions import conversation_versions, get_conversation_version, invalidate_conversation
+from journal_analysis import JournalAnalysisPipeline, STATUS_PENDING
+from lexicon import scan_text
+from context_classifier import context_classifier
+from llm_client import llm_client, LLMUnavailable
+from llm_scheduler import LANE_JOURNAL, LANE_CHAT, LANE_PROMPTS
+from hedging import ai_hedge, budget_seconds
+from crisis_screening import CrisisScreen, severity_for, SEVERITY_NONE, SEVERITY_CRISIS
+from outbox import notification_outbox, enqueue as enqueue_notification, KIND_NOTIFICATION, PRIORITY_URGENT, PRIORITY_NORMAL
+from alert_coalescing import alert_coalescer, TOPIC_CRISIS, TOPIC_LOCATION, ALERT_DEFERRED
 
 # Location sharing functions
 def get_user_location():
@@ -20,11 +36,9 @@ def get_user_location():
         'timestamp': datetime.now().isoformat()
     }
 
-def send_crisis_alert_with_location(user_id, content):
-    """Send crisis alert with location to emergency contact"""
-    conn = get_db_connection()
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-    conn.close()
+def send_crisis_alert_with_location(conn, user_id, content, source='journal entry', key=None, severity=SEVERITY_CRISIS):
+    """Queue a crisis alert with location for the emergency contact in conn's transaction"""
+    user = get_user(user_id)
     
     if user and user['emergency_contact_phone']:
         # Enhanced crisis message with location sharing request
@@ -33,7 +47,7 @@ def send_crisis_alert_with_location(user_id, content):
 Student: {user['username']}
 Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
-Concerning journal entry detected:
+Concerning {source} detected:
 "{content[:100]}..."
 
 📍 LIVE LOCATION SHARING ACTIVATED
@@ -49,27 +63,22 @@ Crisis Resources:
 
 This is an automated alert from HavenMind."""
         
-        try:
-            # Send SMS to emergency contact
-            notification_system.send_sms(
-                user['emergency_contact_phone'],
-                crisis_message
-            )
-            print(f"Crisis alert with location sent to {user['emergency_contact_phone']}")
-            return True
-        except Exception as e:
-            print(f"Failed to send crisis alert: {e}")
-            return False
+        # SMS to emergency contact over every channel, sent by the outbox workers once the caller commits.
+        # Alerts within the coalescing window are folded into one unless the severity went up.
+        alert_coalescer.enqueue_alert(
+            conn,
+            user['emergency_contact_phone'],
+            TOPIC_CRISIS,
+            crisis_message,
+            key and f'{key}:contact',
+            severity
+        )
+        return True
     return False
 
 def get_student_location_for_professional(student_id):
     """Get student location and emergency contact for professional"""
-    conn = get_db_connection()
-    student = conn.execute(
-        'SELECT username, emergency_contact_name, emergency_contact_phone, emergency_contact_relationship FROM users WHERE id = ?',
-        (student_id,)
-    ).fetchone()
-    conn.close()
+    student = get_user(student_id)
     
     if student:
         # Convert Row to dict to avoid .get() issues
@@ -87,7 +96,8 @@ def get_student_location_for_professional(student_id):
             }
         }
     return None
-from daily_scheduler import start_daily_scheduler, send_schedule_now
+from daily_scheduler import start_daily_scheduler, send_schedule_now, daily_schedule_timer, user_zone
+from leases import stats as job_lease_stats
 
 # Load environment variables
 load_dotenv()
@@ -96,49 +106,14 @@ load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = 'havenmind-secret-2024'
-
-# Make generate_ai_response available to templates
-@app.template_global()
-def generate_ai_response(content, emotion_tags, sentiment_score):
-    """Generate contextual AI response based on journal content - enhanced version"""
-    return generate_enhanced_ai_response(content, emotion_tags, sentiment_score)
-
-def generate_enhanced_ai_response(content, emotion_tags, sentiment_score):
-    """Generate enhanced therapeutic AI response using real AI"""
-    # Quick fallback first, then try AI with timeout
-    try:
-        import google.generativeai as genai
-        api_key = os.getenv('GEMINI_API_KEY')
-        if api_key and len(content) < 200:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            
-            prompt = f"You are a compassionate AI mental health companion. Student wrote: '{content[:100]}'. Respond in 1 sentence."
-            
-            response = model.generate_content(prompt)
-            return response.text.strip()
-    except:
-        pass
-    
-    # Fast fallback
-    return generate_contextual_fallback(content, emotion_tags, sentiment_score)
+init_db_pool(app)
 
 def generate_contextual_fallback(content, emotion_tags, sentiment_score):
     """Smart fallback that understands context with crisis detection"""
-    content_lower = content.lower()
+    hits = scan_text(content)
     
     # CRISIS DETECTION - HIGHEST PRIORITY
-    crisis_indicators = ['die', 'diee', 'dieee', 'kill myself', 'end it', 'suicide', 'hurt myself', 'no point', 'give up', 'cant go on', 'want to die', 'wanna die', 'end my life']
-    crisis_patterns = ['go die', 'imma die', 'gonna die', 'wanna die', 'so imma go die']
-    
-    # Check for direct crisis words
-    has_crisis = any(indicator in content_lower for indicator in crisis_indicators)
-    
-    # Check for crisis patterns
-    if not has_crisis:
-        has_crisis = any(pattern in content_lower for pattern in crisis_patterns)
-    
-    if has_crisis:
+    if 'crisis' in hits:
         return """I'm very concerned about what you've shared. Your life has value and meaning, even when things feel overwhelming. Please reach out for immediate support:
         
 CRISIS RESOURCES (INDIA):
@@ -151,33 +126,33 @@ CRISIS RESOURCES (INDIA):
 You don't have to face this alone. There are people who want to help you through this difficult time. Please consider reaching out to a counselor, trusted friend, or family member right now."""
     
     # Academic achievement detection - but check for negative context first
-    if any(phrase in content_lower for phrase in ['completed', 'finished', 'done', 'accomplished']) and any(word in content_lower for word in ['assignment', 'work', 'project', 'task']):
+    if 'achievement' in hits and 'academic_task' in hits:
         # Check if it's actually about NOT completing or struggling with projects
-        if any(phrase in content_lower for phrase in ['have not started', 'not started', 'have to complete', 'due on', 'don\'t know', 'so much work', 'have to learn']):
+        if 'not_started' in hits:
             # This is actually academic stress, not achievement
             pass  # Fall through to stress detection
         else:
             return "Congratulations on completing your assignments! That's a real accomplishment and shows your dedication to your studies. It must feel great to have that work finished. How are you feeling about your progress in your courses?"
     
     # Family separation
-    elif any(word in content_lower for word in ['brother', 'sister', 'family']) and any(word in content_lower for word in ['going', 'leaving', 'away']):
+    elif 'family' in hits and 'departure' in hits:
         return "I can understand how sad it must feel to have your brother going away. It's completely natural to feel this way when someone important to you has to leave, even temporarily. Family bonds are precious. How do you usually stay connected when you're apart?"
     
     # Exhaustion and mixed emotions
-    elif any(word in content_lower for word in ['ded', 'dead', 'exhausted', 'drained', 'burnt out']) and any(word in content_lower for word in ['groove', 'getting into', 'finally', 'progress', 'better']):
+    elif 'exhaustion' in hits and 'momentum' in hits:
         return "I can hear that you're feeling really drained and exhausted right now, but it sounds like you're also starting to find your rhythm and make some progress. That's actually a really positive sign - even when we feel physically and emotionally depleted, recognizing that we're getting into a groove shows resilience. It's okay to feel tired while still moving forward. How can you take care of yourself while maintaining this momentum?"
     
     # Pure exhaustion without progress indicators
-    elif any(word in content_lower for word in ['ded', 'dead', 'exhausted', 'drained', 'burnt out', 'feel ded', 'look ded']):
+    elif 'exhaustion' in hits:
         return "It sounds like you're feeling really exhausted and drained right now. When we say we feel 'dead' or completely worn out, it usually means we've been pushing ourselves pretty hard. Your body and mind are telling you they need some care and rest. What's been taking so much out of you lately? And what's one small thing you could do today to recharge, even just a little?"
     
     # Academic stress and deadline pressure
-    if any(phrase in content_lower for phrase in ['due on', 'project due', 'have not started', 'not started', 'have to complete', 'so much work', 'don\'t know what', 'have to learn', 'upcoming few days']) or any(phrase in content_lower for phrase in ['lot of work', 'too much', 'overwhelmed', 'stressed']) and any(word in content_lower for word in ['assignment', 'work', 'study', 'project']):
+    if 'deadline_pressure' in hits or 'workload' in hits and hits.keys() & {'academic_task', 'study'}:
         # Check for specific academic deadline stress
-        if any(phrase in content_lower for phrase in ['due on', 'project due', 'have not started', 'have to learn', 'don\'t know what']):
+        if 'deadline_urgent' in hits:
             return "I can hear the stress in your voice about these upcoming project deadlines. Having multiple projects due so close together, especially when you need to learn new technologies like Flask and Vue, feels incredibly overwhelming. It's completely understandable to feel lost when facing unfamiliar tech with tight deadlines. Let's break this down - what's the most urgent project, and what's one small step you could take today to get started?"
         # Check for concerning attitude
-        elif any(phrase in content_lower for phrase in ['dont care', "don't care", 'whatever', 'give up']):
+        elif 'apathy' in hits:
             return "I hear that you're feeling overwhelmed with work and maybe disconnected from caring about it right now. Sometimes when we're really stressed, we can feel numb or like giving up. These feelings are understandable, but I'm concerned about you. Your wellbeing matters more than any assignment. Have you been able to talk to anyone about how you're feeling?"
         else:
             return "It sounds like you're feeling overwhelmed with your academic workload right now. That's a common experience for students, and your feelings are completely valid. Remember that you don't have to tackle everything at once. What's one small step you could take today to feel more in control?"
@@ -192,106 +167,152 @@ You don't have to face this alone. There are people who want to help you through
     else:
         return "Thank you for sharing your thoughts with me. Taking time to reflect like this shows real self-awareness. What's been on your mind lately that you'd like to explore further?"
 
+SUPPORT_PRIORITY_RANK = {'medium': 1, 'high': 2, 'urgent': 3}
+
+def support_priority(message, hits=None):
+    """Support request priority from the crisis and distress phrases in the student's message"""
+    if hits is None:
+        hits = scan_text(message)
+    if hits.keys() & {'crisis', 'urgent_support'}:
+        return 'urgent'
+    if 'high_support' in hits:
+        return 'high'
+    return 'medium'
+
+JOURNAL_ANALYSIS_SENTIMENTS = {'positive': 0.8, 'neutral': 0.5, 'negative': 0.3, 'crisis': 0.05}
+JOURNAL_ANALYSIS_CRISIS_LEVELS = ['none', 'low', 'medium', 'high', 'immediate']
+
+def validate_journal_analysis(data):
+    """Check a structured journal analysis against its schema, returns (sentiment_score, emotion_tags, ai_response)"""
+    sentiment = str(data.get('sentiment', '')).strip().lower()
+    crisis_level = str(data.get('crisis_level', '')).strip().lower()
+    reply = data.get('reply')
+    
+    if sentiment not in JOURNAL_ANALYSIS_SENTIMENTS:
+        raise ValueError(f"invalid sentiment: {sentiment!r}")
+    if crisis_level not in JOURNAL_ANALYSIS_CRISIS_LEVELS:
+        raise ValueError(f"invalid crisis_level: {crisis_level!r}")
+    if not isinstance(reply, str) or not reply.strip():
+        raise ValueError("missing reply")
+    
+    if crisis_level in ['high', 'immediate']:
+        sentiment = 'crisis'
+    return JOURNAL_ANALYSIS_SENTIMENTS[sentiment], sentiment, reply.strip()
+
+def analyze_journal_entry_with_gemini(content, user_id=None, lane=LANE_JOURNAL):
+    """Sentiment, crisis level and companion reply for a journal entry in a single Gemini call"""
+    prompt = f"""You are a compassionate AI mental health companion for college students.
+
+Student's journal entry: "{content}"
+
+Respond only with a JSON object of this exact shape:
+{{"sentiment": "positive|negative|neutral|crisis", "crisis_level": "none|low|medium|high|immediate", "reply": "a warm 1-2 sentence response to the student"}}"""
+    
+    return validate_journal_analysis(llm_client.generate_json(prompt, lane=lane, user_id=user_id))
+
+def needs_wellness_alert(emotion_tags, sentiment_score):
+    return severity_for(emotion_tags, sentiment_score) != SEVERITY_NONE
+
+def send_wellness_alerts(conn, user_id, content, severity, source='journal entry', key=None):
+    """Queue a wellness check-in to the user plus a location alert to their emergency contact, returns True if the contact was alerted"""
+    enqueue_notification(
+        conn,
+        KIND_NOTIFICATION,
+        {
+            'user_id': user_id,
+            'notification_type': "Wellness Check-in Alert",
+            'message': "We noticed you might be going through a difficult time. Remember, support is available 24/7. Your wellbeing matters.",
+            'subject': "HavenMind - Wellness Alert"
+        },
+        key and f'{key}:checkin',
+        PRIORITY_URGENT if severity == SEVERITY_CRISIS else PRIORITY_NORMAL
+    )
+    if send_crisis_alert_with_location(conn, user_id, content, source, key, severity):
+        print(f"Emergency alert with location queued for user {user_id}")
+        return True
+    return False
+
+# Local crisis screen that runs before any LLM call, alerts go into the outbox with the row that raised them
+crisis_screen = CrisisScreen(alert=send_wellness_alerts)
+
+def notify_case_responders(conn, request_id, student_id, message, key):
+    """Tell whoever is handling a support case, or the peers who could pick it up, that it turned urgent"""
+    case = conn.execute('SELECT peer_id, professional_id FROM support_requests WHERE id = ?', (request_id,)).fetchone()
+    if case and (case['peer_id'] or case['professional_id']):
+        responder_ids = [responder_id for responder_id in (case['peer_id'], case['professional_id']) if responder_id]
+    else:
+        student = get_user(student_id)
+        if student and student['university']:
+            rows = conn.execute(
+                'SELECT id FROM users WHERE role = "peer_supporter" AND university = ?', (student['university'],)
+            ).fetchall()
+        else:
+            rows = conn.execute('SELECT id FROM users WHERE role = "peer_supporter"').fetchall()
+        responder_ids = [row['id'] for row in rows]
+    
+    for responder_id in responder_ids:
+        enqueue_notification(
+            conn,
+            KIND_NOTIFICATION,
+            {
+                'user_id': responder_id,
+                'notification_type': "Urgent Support Case",
+                'message': f"A student in support case #{request_id} has used crisis language:\n\n\"{message[:100]}\"\n\nPlease check in with them right away.",
+                'subject': "HavenMind - Urgent Support Case"
+            },
+            f'{key}:responder:{responder_id}',
+            PRIORITY_URGENT
+        )
+
+def screen_support_message(conn, case, student_id, message, message_id):
+    """Screen a student's chat message and raise the case's priority if it calls for it.
+
+    When the case turns urgent its responders are notified, and crisis language also
+    alerts the student's emergency contact. The notifications are queued in conn's
+    transaction, call notification_outbox.wake() once it commits.
+    """
+    screen = crisis_screen.screen(message)
+    priority = support_priority(message, screen.hits)
+    if SUPPORT_PRIORITY_RANK[priority] <= SUPPORT_PRIORITY_RANK.get(case['priority'], 0):
+        return case['priority']
+    
+    conn.execute('UPDATE support_requests SET priority = ? WHERE id = ?', (priority, case['id']))
+    if priority == 'urgent':
+        key = f'chat_message:{message_id}'
+        notify_case_responders(conn, case['id'], student_id, message, key)
+        crisis_screen.alert_if(conn, screen, student_id, message, 'chat message', key, min_severity=SEVERITY_CRISIS)
+    return priority
+
+def on_journal_analysis_complete(entry):
+    """Alert when Gemini finds more distress than the local crisis screen did"""
+    conn = get_db_connection()
+    try:
+        escalated = crisis_screen.escalate(
+            conn,
+            entry['user_id'],
+            entry['content'],
+            entry['screened_severity'],
+            severity_for(entry['emotion_tags'], entry['sentiment_score']),
+            'journal entry',
+            f"journal:{entry['id']}"
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    if escalated:
+        notification_outbox.wake()
+
+# Background LLM enrichment for journal entries
+journal_analysis = JournalAnalysisPipeline(
+    analyze=analyze_journal_entry_with_gemini,
+    fallback_respond=generate_contextual_fallback,
+    on_complete=on_journal_analysis_complete,
+    screen=lambda content: crisis_screen.screen(content).severity
+)
+
 def analyze_context_with_nlp(content):
     """Analyze content using NLP to understand context and intent"""
-    import re
-    from collections import Counter
-    
-    # Tokenize and clean content
-    words = re.findall(r'\b\w+\b', content.lower())
-    
-    # Define semantic clusters for different life domains
-    context_indicators = {
-        'employment_loss': {
-            'primary': ['laid', 'off', 'fired', 'terminated', 'unemployed', 'jobless'],
-            'secondary': ['job', 'work', 'employment', 'career', 'position'],
-            'emotional': ['lost', 'gone', 'ended', 'finished']
-        },
-        'company_placement': {
-            'primary': ['company', 'placement', 'internship', 'position'],
-            'secondary': ['based', 'assigned', 'placed', 'working'],
-            'emotional': ['lost', 'ended', 'cancelled', 'removed']
-        },
-        'academic_stress': {
-            'primary': ['semester', 'coursework', 'assignments', 'workload'],
-            'secondary': ['study', 'class', 'school', 'college', 'university'],
-            'emotional': ['overwhelmed', 'stressed', 'pressure', 'much']
-        },
-        'financial_pressure': {
-            'primary': ['money', 'financial', 'bills', 'rent', 'expenses'],
-            'secondary': ['afford', 'pay', 'cost', 'budget'],
-            'emotional': ['worried', 'stressed', 'anxious', 'scared']
-        },
-        'time_pressure': {
-            'primary': ['deadline', 'time', 'months', 'weeks', 'days'],
-            'secondary': ['before', 'until', 'left', 'remaining'],
-            'emotional': ['running', 'out', 'pressure', 'urgent']
-        },
-        'social_isolation': {
-            'primary': ['lonely', 'alone', 'isolated', 'nobody'],
-            'secondary': ['friends', 'family', 'people', 'social'],
-            'emotional': ['sad', 'empty', 'disconnected']
-        },
-        'separation_sadness': {
-            'primary': ['brother', 'sister', 'family', 'friend', 'leaving', 'going'],
-            'secondary': ['out', 'station', 'away', 'travel', 'trip'],
-            'emotional': ['sad', 'miss', 'upset', 'worried']
-        },
-        'academic_transition': {
-            'primary': ['college', 'university', 'first', 'day', 'new'],
-            'secondary': ['student', 'campus', 'class', 'course'],
-            'emotional': ['nervous', 'scared', 'anxious', 'worried']
-        }
-    }
-    
-    # Calculate context scores
-    context_scores = {}
-    word_set = set(words)
-    
-    for context, indicators in context_indicators.items():
-        score = 0
-        
-        # Primary indicators (high weight)
-        primary_matches = len(word_set.intersection(indicators['primary']))
-        score += primary_matches * 3
-        
-        # Secondary indicators (medium weight)
-        secondary_matches = len(word_set.intersection(indicators['secondary']))
-        score += secondary_matches * 2
-        
-        # Emotional indicators (low weight but important for context)
-        emotional_matches = len(word_set.intersection(indicators['emotional']))
-        score += emotional_matches * 1
-        
-        # Bonus for phrase combinations
-        content_lower = content.lower()
-        if context == 'employment_loss':
-            if 'laid off' in content_lower or 'lost job' in content_lower:
-                score += 5
-        elif context == 'company_placement':
-            if 'no company' in content_lower or 'lost company' in content_lower:
-                score += 5
-        elif context == 'academic_stress':
-            if 'too much work' in content_lower or 'semester started' in content_lower:
-                score += 5
-        elif context == 'separation_sadness':
-            if 'going out' in content_lower or 'out of station' in content_lower or 'brother is' in content_lower:
-                score += 5
-        
-        context_scores[context] = score
-    
-    # Find dominant context
-    if not context_scores or max(context_scores.values()) == 0:
-        return 'general_distress'
-    
-    dominant_context = max(context_scores, key=context_scores.get)
-    
-    # Return context with confidence score
-    return {
-        'primary_context': dominant_context,
-        'confidence': context_scores[dominant_context],
-        'all_scores': context_scores
-    }
+    return context_classifier.classify(content)
 
 def generate_contextual_therapeutic_response(content, context_analysis, emotion_tags, sentiment_score):
     """Generate therapeutic response based on NLP context analysis"""
@@ -303,47 +324,10 @@ def generate_contextual_therapeutic_response(content, context_analysis, emotion_
         return generate_basic_therapeutic_response(content, emotion_tags, sentiment_score)
     
     # Context-specific therapeutic responses
-    responses = {
-        'employment_loss': [
-            "I'm so sorry to hear about your job loss. Losing employment is one of life's most stressful experiences, and your feelings of sadness and worry are completely understandable. This kind of sudden change can feel overwhelming, especially with financial pressures and time constraints. Remember that this setback doesn't define your worth or future potential. What support systems do you have available right now?",
-            "Losing your job is incredibly difficult, and I can hear the pain in your words. It's natural to feel sad and anxious when facing such uncertainty. This kind of major life change affects not just your finances but your sense of identity and security. Please know that many people face similar challenges and find their way through. Have you been able to reach out to anyone for support during this time?"
-        ],
-        'company_placement': [
-            "Losing your company placement or internship is incredibly stressful, especially when you're facing academic deadlines. Your feelings of sadness and worry are completely valid - this kind of uncertainty about your future is genuinely difficult to handle. It's important to remember that many students face similar challenges, and there are often alternative paths forward. Have you been able to speak with your academic advisor or career services about options?",
-            "I understand how devastating it must feel to lose your company placement. This kind of setback can feel like it threatens your entire academic and career path. Your emotions are completely valid - it's normal to feel sad and worried when facing this kind of uncertainty. Remember that this doesn't define your capabilities or future success. What resources are available to help you explore alternative options?"
-        ],
-        'academic_stress': [
-            "The beginning of a new semester can feel overwhelming with all the new coursework and expectations. It's completely normal to feel this way when facing a heavy workload. Remember, you don't have to tackle everything at once. What's one assignment or task you could focus on first to help you feel more in control?",
-            "Academic pressure can be intense, and it sounds like you're feeling the weight of your coursework right now. It's important to remember that feeling overwhelmed doesn't mean you can't handle it - it just means you're human. Breaking things down into smaller, manageable pieces can help. What's the most pressing thing you need to address first?"
-        ],
-        'financial_pressure': [
-            "Financial stress can be incredibly overwhelming and affects every aspect of your life. It's completely understandable that you're feeling anxious and worried about money. These concerns are valid and it's important to acknowledge how difficult this situation is. Have you been able to explore any financial resources or support options available to you?",
-            "Money worries can consume your thoughts and make everything else feel more difficult. Your stress about finances is completely understandable - financial security is a basic need, and when it's threatened, it affects your entire sense of well-being. What small steps might you be able to take to address your most immediate financial concerns?"
-        ],
-        'time_pressure': [
-            "Feeling pressed for time can create intense anxiety, especially when you're facing important deadlines. It's natural to feel overwhelmed when you feel like time is running out. Remember that even when time feels short, taking a moment to prioritize and plan can help you use your time more effectively. What's the most important thing you need to focus on right now?",
-            "Time pressure can make everything feel more urgent and stressful. It's understandable that you're feeling anxious about your deadlines. Sometimes when we feel rushed, it helps to step back and break things down into what absolutely must be done versus what would be nice to accomplish. What are your most critical priorities?"
-        ],
-        'social_isolation': [
-            "Feeling lonely and isolated can be incredibly painful, especially when you're already dealing with other stresses. Your feelings are completely valid - humans need connection, and when we don't have it, it affects our entire well-being. Even small steps toward connection can help. Is there anyone in your life you might be able to reach out to?",
-            "Loneliness can make every other challenge feel more difficult to handle. It's important to acknowledge how hard it is to feel alone, especially during stressful times. Remember that reaching out - even through journaling like this - shows strength. What's one small way you might be able to connect with someone today?"
-        ],
-        'academic_transition': [
-            "Starting college or transitioning to a new academic environment can feel overwhelming, and it's completely normal to feel anxious about new experiences. These initial worries often feel bigger than they actually are, and most students face similar anxieties. Remember that adjustment takes time, and it's okay to feel uncertain. What's one thing you could do to help yourself feel more prepared or confident?",
-            "Academic transitions can be really challenging, and your feelings of nervousness or worry are completely normal. Starting something new always involves uncertainty, and that can feel scary. It's important to remember that these feelings are temporary and that you have the strength to adapt. What support systems are available to help you through this transition?"
-        ],
-        'separation_sadness': [
-            "It sounds like you're feeling sad about your brother leaving. It's completely natural to feel this way when someone important to you goes away, even temporarily. These feelings show how much you care about your family relationships. While it's hard when loved ones are far away, remember that distance doesn't diminish the bond you share. How do you usually stay connected when you're apart?",
-            "I can hear the sadness in your words about your brother going out of station. It's really hard when family members have to leave, and your feelings are completely valid. Missing someone shows the strength of your relationship with them. Even though it feels difficult right now, this separation is temporary. What are some ways you might stay in touch while he's away?"
-        ]
-    }
-    
-    # Select appropriate response
-    if primary_context in responses:
-        import random
-        return random.choice(responses[primary_context])
-    else:
-        return generate_basic_therapeutic_response(content, emotion_tags, sentiment_score)
+    response = context_classifier.response_for(primary_context)
+    if response:
+        return response
+    return generate_basic_therapeutic_response(content, emotion_tags, sentiment_score)
 
 def generate_basic_therapeutic_response(content, emotion_tags, sentiment_score):
     """Generate basic therapeutic response when context is unclear"""
@@ -366,8 +350,8 @@ def get_user_context_for_ai(user_id):
     
     # Get recent entries (last 30 days)
     recent_entries = conn.execute(
-        'SELECT sentiment_score, emotion_tags FROM journal_entries WHERE user_id = ? AND created_at >= datetime("now", "-30 days") ORDER BY created_at DESC LIMIT 10',
-        (user_id,)
+        'SELECT sentiment_score, emotion_tags FROM journal_entries WHERE user_id = ? AND created_ts >= ? ORDER BY created_at DESC LIMIT 10',
+        (user_id, days_ago_ts(30))
     ).fetchall()
     
     conn.close()
@@ -404,129 +388,8 @@ def get_user_context_for_ai(user_id):
 
 # Database setup
 def init_db():
-    conn = sqlite3.connect('havenmind.db')
-    c = conn.cursor()
-    
-    # Add new columns if they don't exist
-    try:
-        c.execute('ALTER TABLE support_requests ADD COLUMN professional_id INTEGER')
-        c.execute('ALTER TABLE support_requests ADD COLUMN appointment_date TEXT')
-        c.execute('ALTER TABLE support_requests ADD COLUMN appointment_time TEXT')
-    except sqlite3.OperationalError:
-        pass  # Columns already exist
-    
-    # Users table
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        role TEXT DEFAULT 'student',
-        is_verified BOOLEAN DEFAULT 0,
-        reset_token TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        cognitive_load_score REAL DEFAULT 0.0,
-        first_name TEXT,
-        last_name TEXT,
-        university TEXT,
-        major TEXT,
-        phone TEXT,
-        year_of_study TEXT,
-        daily_checkins BOOLEAN DEFAULT 1,
-        mood_reminders BOOLEAN DEFAULT 1,
-        peer_notifications BOOLEAN DEFAULT 0,
-        ai_insights BOOLEAN DEFAULT 1,
-        appointment_reminders BOOLEAN DEFAULT 1,
-        support_type TEXT DEFAULT 'self_help',
-        emergency_alerts BOOLEAN DEFAULT 1,
-        share_location BOOLEAN DEFAULT 0,
-        auto_professional_escalation BOOLEAN DEFAULT 0,
-        emergency_contact_name TEXT,
-        emergency_contact_phone TEXT,
-        emergency_contact_relationship TEXT,
-        notification_method TEXT DEFAULT 'email',
-        notification_time TEXT DEFAULT 'morning',
-        share_research BOOLEAN DEFAULT 0,
-        ai_analysis BOOLEAN DEFAULT 1,
-        share_counselors BOOLEAN DEFAULT 0
-    )''')
-    
-    # Journal entries table
-    c.execute('''CREATE TABLE IF NOT EXISTS journal_entries (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        content TEXT NOT NULL,
-        sentiment_score REAL,
-        emotion_tags TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )''')
-    
-    # Calendar events table
-    c.execute('''CREATE TABLE IF NOT EXISTS calendar_events (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        title TEXT NOT NULL,
-        description TEXT,
-        event_date TIMESTAMP NOT NULL,
-        stress_level TEXT DEFAULT 'medium',
-        completed BOOLEAN DEFAULT 0,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )''')
-    
-    # Add completed column if it doesn't exist
-    try:
-        c.execute('ALTER TABLE calendar_events ADD COLUMN completed BOOLEAN DEFAULT 0')
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
-    # Support requests table
-    c.execute('''CREATE TABLE IF NOT EXISTS support_requests (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        message TEXT NOT NULL,
-        priority TEXT DEFAULT 'medium',
-        status TEXT DEFAULT 'waiting',
-        peer_id INTEGER,
-        professional_id INTEGER,
-        appointment_date TEXT,
-        appointment_time TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id),
-        FOREIGN KEY (peer_id) REFERENCES users (id),
-        FOREIGN KEY (professional_id) REFERENCES users (id)
-    )''')
-    
-    # Chat messages table
-    c.execute('''CREATE TABLE IF NOT EXISTS chat_messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        request_id INTEGER NOT NULL,
-        sender_id INTEGER NOT NULL,
-        message TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (request_id) REFERENCES support_requests (id),
-        FOREIGN KEY (sender_id) REFERENCES users (id)
-    )''')
-    
-    # Session notes table for professional notes
-    c.execute('''CREATE TABLE IF NOT EXISTS session_notes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        case_id INTEGER NOT NULL,
-        professional_id INTEGER NOT NULL,
-        note TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (case_id) REFERENCES support_requests (id),
-        FOREIGN KEY (professional_id) REFERENCES users (id)
-    )''')
-    
-    conn.commit()
-    conn.close()
-
-def get_db_connection():
-    conn = sqlite3.connect('havenmind.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Bring the database schema up to date by applying pending migrations"""
+    apply_migrations()
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
@@ -555,9 +418,11 @@ def login_required(f):
 
 def get_current_user():
     if 'user_id' in session:
-        conn = get_db_connection()
-        user = conn.execute('SELECT * FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-        conn.close()
+        # Memoized for the request, backed by the cross-request user cache
+        user = g.get('_current_user')
+        if user is None or user['id'] != session['user_id']:
+            user = get_user(session['user_id'])
+            g._current_user = user
         return user
     return None
 
@@ -730,6 +595,7 @@ def forgot_password_post():
         reset_token = secrets.token_urlsafe(32)
         conn.execute('UPDATE users SET reset_token = ? WHERE id = ?', (reset_token, user['id']))
         conn.commit()
+        invalidate_user(user['id'])
         
         # In real app, send email with reset link
         flash(f'Password reset link sent to {email}. Reset token: {reset_token}')
@@ -870,13 +736,13 @@ def admin_dashboard():
     total_support_requests = conn.execute('SELECT COUNT(*) as count FROM support_requests').fetchone()['count']
     
     # Crisis indicators
-    crisis_entries = conn.execute('SELECT COUNT(*) as count FROM journal_entries WHERE sentiment_score < 0.3 AND created_at >= datetime("now", "-7 days")').fetchone()['count']
+    crisis_entries = conn.execute('SELECT COUNT(*) as count FROM journal_entries WHERE sentiment_score < 0.3 AND created_ts >= ?', (days_ago_ts(7),)).fetchone()['count']
     
     # Active users (last 7 days)
-    active_users = conn.execute('SELECT COUNT(DISTINCT user_id) as count FROM journal_entries WHERE created_at >= datetime("now", "-7 days")').fetchone()['count']
+    active_users = conn.execute('SELECT COUNT(DISTINCT user_id) as count FROM journal_entries WHERE created_ts >= ?', (days_ago_ts(7),)).fetchone()['count']
     
     # Platform health metrics
-    avg_wellness = conn.execute('SELECT AVG(sentiment_score) as avg FROM journal_entries WHERE created_at >= datetime("now", "-30 days")').fetchone()['avg']
+    avg_wellness = conn.execute('SELECT AVG(sentiment_score) as avg FROM journal_entries WHERE created_ts >= ?', (days_ago_ts(30),)).fetchone()['avg']
     
     conn.close()
     
@@ -952,9 +818,9 @@ def institution_dashboard():
         '''SELECT ce.stress_level, COUNT(*) as count
            FROM calendar_events ce 
            JOIN users u ON ce.user_id = u.id 
-           WHERE u.university = ? AND u.role = "student" AND ce.event_date >= datetime("now")
+           WHERE u.university = ? AND u.role = "student" AND ce.event_ts >= ?
            GROUP BY ce.stress_level''',
-        (user_institution,)
+        (user_institution, now_ts())
     ).fetchall()
     
     # Get crisis indicators (last 30 days) - count distinct users
@@ -964,8 +830,8 @@ def institution_dashboard():
            JOIN users u ON je.user_id = u.id 
            WHERE u.university = ? AND u.role = "student" 
            AND je.sentiment_score < 0.3 
-           AND je.created_at >= datetime("now", "-30 days")''',
-        (user_institution,)
+           AND je.created_ts >= ?''',
+        (user_institution, days_ago_ts(30))
     ).fetchone()
     
     # Get support requests from institution students
@@ -974,8 +840,8 @@ def institution_dashboard():
            FROM support_requests sr 
            JOIN users u ON sr.user_id = u.id 
            WHERE u.university = ? AND u.role = "student" 
-           AND sr.created_at >= datetime("now", "-30 days")''',
-        (user_institution,)
+           AND sr.created_ts >= ?''',
+        (user_institution, days_ago_ts(30))
     ).fetchone()
     
     conn.close()
@@ -1047,31 +913,31 @@ def dashboard():
     
     # Get upcoming events
     events = conn.execute(
-        'SELECT * FROM calendar_events WHERE user_id = ? AND event_date >= datetime("now") ORDER BY event_date LIMIT 5',
-        (user['id'],)
+        'SELECT * FROM calendar_events WHERE user_id = ? AND event_ts >= ? ORDER BY event_ts LIMIT 5',
+        (user['id'], now_ts())
     ).fetchall()
     
     # Calculate cognitive load metrics
     high_stress_events = conn.execute(
-        'SELECT COUNT(*) as count FROM calendar_events WHERE user_id = ? AND stress_level = "high" AND event_date >= datetime("now")',
-        (user['id'],)
+        'SELECT COUNT(*) as count FROM calendar_events WHERE user_id = ? AND stress_level = "high" AND event_ts >= ?',
+        (user['id'], now_ts())
     ).fetchone()
     
     # Get sentiment trends (last 7 days)
     sentiment_trend = conn.execute(
-        'SELECT AVG(sentiment_score) as avg_sentiment FROM journal_entries WHERE user_id = ? AND created_at >= datetime("now", "-7 days")',
-        (user['id'],)
+        'SELECT AVG(sentiment_score) as avg_sentiment FROM journal_entries WHERE user_id = ? AND created_ts >= ?',
+        (user['id'], days_ago_ts(7))
     ).fetchone()
     
     # Get stress distribution
     stress_distribution = conn.execute(
-        'SELECT stress_level, COUNT(*) as count FROM calendar_events WHERE user_id = ? AND event_date >= datetime("now") GROUP BY stress_level',
-        (user['id'],)
+        'SELECT stress_level, COUNT(*) as count FROM calendar_events WHERE user_id = ? AND event_ts >= ? GROUP BY stress_level',
+        (user['id'], now_ts())
     ).fetchall()
     
     # Calculate wellness metrics
     total_entries = conn.execute('SELECT COUNT(*) as count FROM journal_entries WHERE user_id = ?', (user['id'],)).fetchone()
-    recent_entries = conn.execute('SELECT COUNT(*) as count FROM journal_entries WHERE user_id = ? AND created_at >= datetime("now", "-7 days")', (user['id'],)).fetchone()
+    recent_entries = conn.execute('SELECT COUNT(*) as count FROM journal_entries WHERE user_id = ? AND created_ts >= ?', (user['id'], days_ago_ts(7))).fetchone()
     
     cognitive_load = min(0.3 + (high_stress_events['count'] * 0.2), 1.0)
     mood_trend = sentiment_trend['avg_sentiment'] if sentiment_trend['avg_sentiment'] else 0.5
@@ -1113,8 +979,8 @@ def journal():
     
     # Calculate mood analytics
     mood_trend = conn.execute(
-        'SELECT AVG(sentiment_score) as avg_mood FROM journal_entries WHERE user_id = ? AND created_at >= datetime("now", "-7 days")',
-        (user['id'],)
+        'SELECT AVG(sentiment_score) as avg_mood FROM journal_entries WHERE user_id = ? AND created_ts >= ?',
+        (user['id'], days_ago_ts(7))
     ).fetchone()
     
     # Get emotion distribution
@@ -1125,8 +991,8 @@ def journal():
     
     # Get writing streak
     writing_streak = conn.execute(
-        'SELECT COUNT(DISTINCT date(created_at)) as streak FROM journal_entries WHERE user_id = ? AND created_at >= datetime("now", "-30 days")',
-        (user['id'],)
+        'SELECT COUNT(DISTINCT date(created_at)) as streak FROM journal_entries WHERE user_id = ? AND created_ts >= ?',
+        (user['id'], days_ago_ts(30))
     ).fetchone()
     
     # Generate insights
@@ -1161,63 +1027,31 @@ def add_journal_entry():
     user = get_current_user()
     content = request.form['content']
     
-    # Try Gemini AI for sentiment analysis
-    try:
-        import google.generativeai as genai
-        api_key = os.getenv('GEMINI_API_KEY')
-        if api_key:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            
-            analysis_response = model.generate_content(f"Analyze this text sentiment in one word (positive, negative, neutral, or crisis): {content}")
-            detected_emotion = analysis_response.text.strip().lower()
-            
-            if 'crisis' in detected_emotion:
-                sentiment_score, emotion_tags = 0.05, 'crisis'
-            elif 'negative' in detected_emotion:
-                sentiment_score, emotion_tags = 0.3, 'negative'
-            elif 'positive' in detected_emotion:
-                sentiment_score, emotion_tags = 0.8, 'positive'
-            else:
-                sentiment_score, emotion_tags = 0.5, 'neutral'
-        else:
-            raise Exception("No API key")
-    except Exception as e:
-        print(f"Gemini sentiment error: {e}")
-        from simple_ai import analyze_sentiment_simple
-        sentiment_score, emotion_tags = analyze_sentiment_simple(content)
-    
-    ai_response = generate_enhanced_ai_response(content, emotion_tags, sentiment_score)
-
+    # Local crisis screen first, its alerts are queued in the same transaction as the entry
+    screen = crisis_screen.screen(content)
+    sentiment_score, emotion_tags = screen.sentiment_score, screen.emotion_tags
     
     conn = get_db_connection()
-    conn.execute(
-        'INSERT INTO journal_entries (user_id, content, sentiment_score, emotion_tags) VALUES (?, ?, ?, ?)',
-        (user['id'], content, sentiment_score, emotion_tags)
+    cursor = conn.execute(
+        'INSERT INTO journal_entries (user_id, content, sentiment_score, emotion_tags, analysis_status) VALUES (?, ?, ?, ?, ?)',
+        (user['id'], content, sentiment_score, emotion_tags, STATUS_PENDING)
     )
+    entry_id = cursor.lastrowid
+    alerted = crisis_screen.alert_if(conn, screen, user['id'], content, 'journal entry', f'journal:{entry_id}')
     conn.commit()
     conn.close()
+    if alerted:
+        notification_outbox.wake()
     
-    # Send notification for negative emotions
-    if emotion_tags in ['negative', 'crisis'] or sentiment_score < 0.4:
-        try:
-            # Send to user
-            notification_system.send_notification(
-                user['id'],
-                "Wellness Check-in Alert",
-                f"We noticed you might be going through a difficult time. Remember, support is available 24/7. Your wellbeing matters.",
-                "HavenMind - Wellness Alert"
-            )
-            # Send emergency alert with location if user has emergency contact
-            if user['emergency_contact_phone']:
-                send_crisis_alert_with_location(user['id'], content)
-                print(f"Emergency alert with location sent for user {user['id']}")
-                # Set session flag to prompt for location sharing
-                session['prompt_location_share'] = True
-                flash(f'Journal entry added! Mood detected: {emotion_tags}. Emergency contact has been notified.')
-                return redirect(url_for('journal'))
-        except Exception as e:
-            print(f"Notification error: {e}")
+    # Gemini refines the provisional analysis in the background and may escalate the alert,
+    # the journal page polls for its result
+    journal_analysis.submit(entry_id, user['id'], content, sentiment_score, emotion_tags, screen.severity)
+    
+    if screen.severity != SEVERITY_NONE and user['emergency_contact_phone']:
+        # Set session flag to prompt for location sharing
+        session['prompt_location_share'] = True
+        flash(f'Journal entry added! Mood detected: {emotion_tags}. Your emergency contact is being notified.')
+        return redirect(url_for('journal'))
     
     flash(f'Journal entry added! Mood detected: {emotion_tags}')
     return redirect(url_for('journal'))
@@ -1236,118 +1070,49 @@ def add_voice_journal():
     # Remove [Voice Entry] prefix if present for processing
     clean_text = voice_text.replace('[Voice Entry] ', '')
     
-    # Try Gemini AI for voice journal too
-    try:
-        import google.generativeai as genai
-        api_key = os.getenv('GEMINI_API_KEY')
-        if api_key:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            
-            analysis_response = model.generate_content(f"Analyze sentiment in one word: {clean_text}")
-            detected_emotion = analysis_response.text.strip().lower()
-            
-            if 'crisis' in detected_emotion or 'negative' in detected_emotion:
-                sentiment_score = 0.3
-                emotion_tags = 'negative'
-            elif 'positive' in detected_emotion:
-                sentiment_score = 0.8
-                emotion_tags = 'positive'
-            else:
-                sentiment_score = 0.5
-                emotion_tags = 'neutral'
-                
-            ai_response = generate_enhanced_ai_response(clean_text, emotion_tags, sentiment_score)
-        else:
-            raise Exception("No API key")
-    except Exception as e:
-        print(f"Voice Gemini failed: {e}")
-        # Enhanced sentiment analysis with crisis detection
-        crisis_words = ['die', 'diee', 'dieee', 'kill', 'suicide', 'hurt myself', 'end it', 'give up', 'no point', 'want to die', 'wanna die', 'kill myself', 'end my life']
-        negative_words = ['stressed', 'anxious', 'overwhelmed', 'tired', 'sad', 'laid', 'off', 'lost', 'worried', 'upset', 'miss', 'leaving', 'dont care', "don't care", 'whatever']
-        positive_words = ['happy', 'good', 'great', 'excited', 'confident', 'accomplished', 'grateful', 'joy', 'yay']
-        emotional_indicators = [':(', ':-(', '😢', '😭', '💔']
-        
-        content_lower = clean_text.lower()
-        
-        # Enhanced crisis detection with pattern matching
-        has_crisis_indicators = False
-        for crisis_word in crisis_words:
-            if crisis_word in content_lower:
-                has_crisis_indicators = True
-                break
-        
-        # Additional crisis pattern detection
-        crisis_patterns = ['go die', 'imma die', 'gonna die', 'wanna die']
-        if not has_crisis_indicators:
-            for pattern in crisis_patterns:
-                if pattern in content_lower:
-                    has_crisis_indicators = True
-                    break
-        
-        # Check for emotional indicators (emojis, emoticons)
-        has_sad_indicators = any(indicator in clean_text for indicator in emotional_indicators)
-        
-        negative_count = sum(1 for word in negative_words if word in content_lower)
-        positive_count = sum(1 for word in positive_words if word in content_lower)
-        
-        # Crisis indicators override everything
-        if has_crisis_indicators:
-            sentiment_score = 0.05  # Very low score for crisis
-            emotion_tags = 'crisis'
-        # Boost negative sentiment if sad indicators present
-        elif has_sad_indicators:
-            sentiment_score = 0.2
-            emotion_tags = 'negative'
-        elif negative_count > positive_count:
-            sentiment_score = 0.3
-            emotion_tags = 'negative'
-        elif positive_count > negative_count:
-            sentiment_score = 0.8
-            emotion_tags = 'positive'
-        else:
-            sentiment_score = 0.5
-            emotion_tags = 'neutral'
-        
-        # Generate enhanced therapeutic response using Gemini AI
-        ai_response = generate_enhanced_ai_response(clean_text, emotion_tags, sentiment_score)
+    # Local crisis screen first, its alerts are queued in the same transaction as the entry
+    screen = crisis_screen.screen(clean_text)
+    sentiment_score, emotion_tags = screen.sentiment_score, screen.emotion_tags
+    
+    # Sad emoticons and emojis push an otherwise neutral entry negative, crisis still wins
+    if 'sad_emoticon' in screen.hits and emotion_tags != 'crisis':
+        sentiment_score = 0.2
+        emotion_tags = 'negative'
+    
+    # Local response for the immediate reply, the stored one comes from the pipeline
+    ai_response = generate_contextual_fallback(clean_text, emotion_tags, sentiment_score)
     
     conn = get_db_connection()
-    conn.execute(
-        'INSERT INTO journal_entries (user_id, content, sentiment_score, emotion_tags) VALUES (?, ?, ?, ?)',
-        (user['id'], voice_text, sentiment_score, emotion_tags)
+    cursor = conn.execute(
+        'INSERT INTO journal_entries (user_id, content, sentiment_score, emotion_tags, analysis_status) VALUES (?, ?, ?, ?, ?)',
+        (user['id'], voice_text, sentiment_score, emotion_tags, STATUS_PENDING)
     )
+    entry_id = cursor.lastrowid
+    alerted = crisis_screen.alert_if(conn, screen, user['id'], clean_text, 'voice journal entry', f'journal:{entry_id}')
     conn.commit()
     conn.close()
+    if alerted:
+        notification_outbox.wake()
     
-    # Send notification for negative emotions
-    if emotion_tags in ['negative', 'crisis'] or sentiment_score < 0.4:
-        try:
-            # Send to user
-            notification_system.send_notification(
-                user['id'],
-                "Wellness Check-in Alert",
-                f"We noticed you might be going through a difficult time. Remember, support is available 24/7. Your wellbeing matters.",
-                "HavenMind - Wellness Alert"
-            )
-            # Send emergency alert with location if user has emergency contact
-            if user['emergency_contact_phone']:
-                send_crisis_alert_with_location(user['id'], clean_text)
-                print(f"Emergency alert with location sent for user {user['id']}")
-                # Set session flag to prompt for location sharing
-                session['prompt_location_share'] = True
-        except Exception as e:
-            print(f"Notification error: {e}")
+    # Gemini refines the provisional analysis in the background and may escalate the alert,
+    # the journal page polls for its result
+    journal_analysis.submit(entry_id, user['id'], clean_text, sentiment_score, emotion_tags, screen.severity)
+    
+    if screen.severity != SEVERITY_NONE and user['emergency_contact_phone']:
+        # Set session flag to prompt for location sharing
+        session['prompt_location_share'] = True
     
     response_data = {
         'success': True, 
         'message': 'Voice journal entry added successfully!',
         'emotion': emotion_tags,
-        'ai_response': ai_response
+        'ai_response': ai_response,
+        'entry_id': entry_id,
+        'analysis_status': STATUS_PENDING
     }
     
     # Add location sharing prompt for negative emotions
-    if emotion_tags in ['negative', 'crisis'] or sentiment_score < 0.4:
+    if needs_wellness_alert(emotion_tags, sentiment_score):
         response_data['prompt_location'] = True
         response_data['emergency_contact'] = user.get('emergency_contact_name', 'your emergency contact')
     
@@ -1365,6 +1130,28 @@ def delete_journal_entry(entry_id):
     flash('Journal entry deleted successfully!')
     return redirect(url_for('journal'))
 
+@app.route('/journal/<int:entry_id>/analysis')
+@login_required
+def journal_entry_analysis(entry_id):
+    """Analysis status of a journal entry, polled by the journal page while it is pending"""
+    user = get_current_user()
+    conn = get_db_connection()
+    entry = conn.execute(
+        'SELECT sentiment_score, emotion_tags, ai_response, analysis_status FROM journal_entries WHERE id = ? AND user_id = ?',
+        (entry_id, user['id'])
+    ).fetchone()
+    conn.close()
+    
+    if not entry:
+        return jsonify({'error': 'Entry not found'}), 404
+    
+    return jsonify({
+        'status': entry['analysis_status'],
+        'sentiment_score': entry['sentiment_score'],
+        'emotion_tags': entry['emotion_tags'],
+        'ai_response': entry['ai_response']
+    })
+
 @app.route('/journal/analytics')
 @login_required
 def journal_analytics():
@@ -1392,21 +1179,22 @@ def calendar():
     
     # Get all events
     events = conn.execute(
-        'SELECT * FROM calendar_events WHERE user_id = ? ORDER BY event_date',
+        'SELECT * FROM calendar_events WHERE user_id = ? ORDER BY event_ts',
         (user['id'],)
     ).fetchall()
     
     # Get events by month for calendar view
     current_month = datetime.now().strftime('%Y-%m')
+    month_start, month_end = local_month_bounds(datetime.now())
     monthly_events = conn.execute(
-        'SELECT * FROM calendar_events WHERE user_id = ? AND strftime("%Y-%m", event_date) = ? ORDER BY event_date',
-        (user['id'], current_month)
+        'SELECT * FROM calendar_events WHERE user_id = ? AND event_ts >= ? AND event_ts < ? ORDER BY event_ts',
+        (user['id'], month_start, month_end)
     ).fetchall()
     
     # Calculate cognitive load forecast
     upcoming_events = conn.execute(
-        'SELECT * FROM calendar_events WHERE user_id = ? AND event_date >= datetime("now") AND event_date <= datetime("now", "+7 days") ORDER BY event_date',
-        (user['id'],)
+        'SELECT * FROM calendar_events WHERE user_id = ? AND event_ts >= ? AND event_ts <= ? ORDER BY event_ts',
+        (user['id'], now_ts(), days_ahead_ts(7))
     ).fetchall()
     
     weekly_load = 0
@@ -1590,14 +1378,12 @@ def chat():
     user = get_current_user()
     return render_template('chat.html', user=user)
 
-@app.route('/chat', methods=['POST'])
-@login_required
-def ai_chat():
-    """AI chat endpoint for support page"""
-    user_message = request.json.get('message', '').strip()
-    
-    if not user_message:
-        return jsonify({'error': 'No message provided'}), 400
+AI_CHAT_FALLBACK = "मैं यहाँ आपकी बात सुनने के लिए हूँ। आप क्या महसूस कर रहे हैं? / I'm here to listen. How are you feeling?"
+
+def open_ai_chat_support_request(user_id, user_message):
+    """Screen an AI chat message, alert on crisis language and queue a support request when no peer supporters are registered"""
+    screen = crisis_screen.screen(user_message)
+    key = f'ai_chat:{user_id}:{secrets.token_hex(8)}'
     
     # Check if peer supporters are available
     conn = get_db_connection()
@@ -1608,33 +1394,23 @@ def ai_chat():
     # If no peers available or this is first message, create support request
     if available_peers['count'] == 0:
         # Determine priority based on message content
-        priority = 'medium'
-        urgent_words = ['panic', 'crisis', 'suicide', 'kill myself', 'die', 'emergency']
-        high_words = ['overwhelmed', 'stressed', 'anxious', 'depressed', 'help']
-        
-        if any(word in user_message.lower() for word in urgent_words):
-            priority = 'urgent'
-        elif any(word in user_message.lower() for word in high_words):
-            priority = 'high'
+        priority = support_priority(user_message, screen.hits)
         
         # Create support request
-        conn.execute(
+        cursor = conn.execute(
             'INSERT INTO support_requests (user_id, message, priority) VALUES (?, ?, ?)',
-            (session['user_id'], user_message, priority)
+            (user_id, user_message, priority)
         )
-        conn.commit()
+        key = f'support_request:{cursor.lastrowid}'
     
+    alerted = crisis_screen.alert_if(conn, screen, user_id, user_message, 'chat message', key, min_severity=SEVERITY_CRISIS)
+    conn.commit()
     conn.close()
-    
-    # Continue with AI response
-    try:
-        import google.generativeai as genai
-        api_key = os.getenv('GEMINI_API_KEY')
-        if api_key:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            
-            prompt = f"""You are a compassionate mental health companion for college students. 
+    if alerted:
+        notification_outbox.wake()
+
+def build_ai_chat_prompt(user_message):
+    return f"""You are a compassionate mental health companion for college students. 
 
 IMPORTANT: Match the user's language style exactly:
 - If Hindi/Hinglish: respond in Hinglish ("Haan yaar, tension mat lo")
@@ -1647,12 +1423,61 @@ Be warm, empathetic, and supportive like a caring friend. Keep responses 2-3 sen
 Student wrote: "{user_message}"
 
 Respond in their exact language style:"""
-            
-            response = model.generate_content(prompt)
-            return jsonify({'response': response.text.strip()})
-    except Exception as e:
-        print(f"Chat error: {e}")
-        return jsonify({'response': "मैं यहाँ आपकी बात सुनने के लिए हूँ। आप क्या महसूस कर रहे हैं? / I'm here to listen. How are you feeling?"})
+
+@app.route('/chat', methods=['POST'])
+@login_required
+def ai_chat():
+    """AI chat endpoint for support page"""
+    user_message = request.json.get('message', '').strip()
+    
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    open_ai_chat_support_request(session['user_id'], user_message)
+    
+    # Continue with AI response, or the fallback if Gemini misses the chat budget
+    user_id = session['user_id']
+    prompt = build_ai_chat_prompt(user_message)
+    response, late_id = ai_hedge.run(
+        'chat',
+        lambda: llm_client.generate(prompt, lane=LANE_CHAT, user_id=user_id),
+        lambda: AI_CHAT_FALLBACK,
+        user_id=user_id
+    )
+    return jsonify({'response': response, 'late_id': late_id})
+
+@app.route('/chat/stream', methods=['POST'])
+@login_required
+def ai_chat_stream():
+    """AI chat reply streamed as Server-Sent Events, one 'data' event per chunk then a 'done' event"""
+    user_message = request.json.get('message', '').strip()
+    
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    user_id = session['user_id']
+    open_ai_chat_support_request(user_id, user_message)
+    prompt = build_ai_chat_prompt(user_message)
+    
+    def events():
+        sent = False
+        try:
+            # The chat budget bounds the wait for the first chunk
+            for chunk in llm_client.stream(prompt, lane=LANE_CHAT, user_id=user_id, first_timeout=budget_seconds('chat')):
+                sent = True
+                yield f"data: {json.dumps({'text': chunk})}\n\n"
+        except LLMUnavailable as e:
+            print(f"Chat stream error: {e}")
+            # A reply that broke off midway is left as is rather than followed by the fallback
+            if not sent:
+                yield f"data: {json.dumps({'text': AI_CHAT_FALLBACK})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/peer-ai-assist', methods=['POST'])
 @login_required
@@ -1661,14 +1486,7 @@ def peer_ai_assist():
     student_id = request.json.get('studentId')
     context = request.json.get('context', '')
     
-    try:
-        import google.generativeai as genai
-        api_key = os.getenv('GEMINI_API_KEY')
-        if api_key:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            
-            prompt = f"""You are an AI assistant helping a peer supporter respond to a student in distress. 
+    prompt = f"""You are an AI assistant helping a peer supporter respond to a student in distress. 
 
 Student's message: "{context}"
 
@@ -1685,25 +1503,28 @@ Respond in JSON format:
   "keyPoints": ["point 1", "point 2", "point 3"],
   "warnings": ["warning 1", "warning 2"]
 }}"""
-            
-            response = model.generate_content(prompt)
-            import json
-            try:
-                ai_data = json.loads(response.text.strip())
-                return jsonify(ai_data)
-            except:
-                return jsonify({
-                    'suggestion': "I can hear that you're going through a really tough time right now. Your feelings are completely valid, and I want you to know that you're not alone in this.",
-                    'keyPoints': ["Validate their emotions", "Ask open-ended questions", "Offer practical next steps"],
-                    'warnings': ["Watch for crisis language", "Monitor for escalation needs"]
-                })
-    except Exception as e:
-        print(f"Peer AI assist error: {e}")
-        return jsonify({
+    
+    user_id = session['user_id']
+    ai_data, late_id = ai_hedge.run(
+        'peer_assist',
+        lambda: llm_client.generate_json(prompt, lane=LANE_PROMPTS, user_id=user_id),
+        lambda: {
             'suggestion': "I can hear that you're going through a really tough time right now. Your feelings are completely valid, and I want you to know that you're not alone in this.",
             'keyPoints': ["Validate their emotions", "Ask open-ended questions", "Offer practical next steps"],
             'warnings': ["Watch for crisis language", "Monitor for escalation needs"]
-        })
+        },
+        user_id=user_id
+    )
+    return jsonify(dict(ai_data, late_id=late_id))
+
+@app.route('/ai/late/<late_id>')
+@login_required
+def ai_late_result(late_id):
+    """Gemini's answer for a request that was served the local fallback because Gemini missed its budget"""
+    result = ai_hedge.late_results.get(late_id, session['user_id'])
+    if result is None:
+        return jsonify({'error': 'Unknown or expired result'}), 404
+    return jsonify(result)
 
 @app.route('/request-peer-support', methods=['POST'])
 @login_required
@@ -1721,53 +1542,76 @@ def request_peer_support():
         conn = get_db_connection()
         
         # Check if user already has an active request
-        existing_request = conn.execute(
+        existing_requests = [row['id'] for row in conn.execute(
             'SELECT id FROM support_requests WHERE user_id = ? AND status IN ("waiting", "active")',
             (session['user_id'],)
-        ).fetchone()
+        ).fetchall()]
         
-        if existing_request:
+        if existing_requests:
             # Close old request and create new one
-            conn.execute(
-                'UPDATE support_requests SET status = "closed" WHERE user_id = ? AND status IN ("waiting", "active")',
-                (session['user_id'],)
+            conn.executemany(
+                'UPDATE support_requests SET status = "closed" WHERE id = ?',
+                [(existing_id,) for existing_id in existing_requests]
             )
             conn.commit()
+            for existing_id in existing_requests:
+                invalidate_conversation(existing_id)
         
-        # Determine priority
-        priority = 'medium'
-        urgent_words = ['panic', 'crisis', 'suicide', 'kill myself', 'die', 'emergency', 'urgent']
-        high_words = ['overwhelmed', 'stressed', 'anxious', 'depressed', 'help', 'struggling']
-        
-        if any(word in message.lower() for word in urgent_words):
-            priority = 'urgent'
-        elif any(word in message.lower() for word in high_words):
-            priority = 'high'
-        
-        # Create support request
+        # Create support request, screening the first message sets its priority
         cursor = conn.execute(
-            'INSERT INTO support_requests (user_id, message, priority) VALUES (?, ?, ?)',
-            (session['user_id'], message, priority)
+            'INSERT INTO support_requests (user_id, message) VALUES (?, ?)',
+            (session['user_id'], message)
         )
         request_id = cursor.lastrowid
         
         # Store the initial student message in chat_messages
-        conn.execute(
+        cursor = conn.execute(
             'INSERT INTO chat_messages (request_id, sender_id, message) VALUES (?, ?, ?)',
             (request_id, session['user_id'], message)
         )
+        priority = screen_support_message(conn, {'id': request_id, 'priority': 'medium'}, session['user_id'], message, cursor.lastrowid)
         conn.commit()
         conn.close()
+        if priority == 'urgent':
+            notification_outbox.wake()
         
         return jsonify({'success': True})
     except Exception as e:
         print(f"Error in request_peer_support: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+def conversation_messages(conn, request_id, after_id=0, hide_professional=False):
+    """Messages of a support conversation with their senders, only those after after_id when polling"""
+    return conn.execute(
+        '''SELECT cm.id, cm.message, cm.created_at, u.username, u.role
+           FROM chat_messages cm
+           JOIN users u ON cm.sender_id = u.id
+           WHERE cm.request_id = ? AND cm.id > ?'''
+        + (" AND u.role != 'professional'" if hide_professional else '')
+        + ' ORDER BY cm.id',
+        (request_id, after_id)
+    ).fetchall()
+
+def conversation_response(response, request_id, version):
+    """Attach the conversation's validators so the next poll can be answered with a 304"""
+    response.set_etag(version['etag'])
+    if version['last_modified']:
+        response.last_modified = version['last_modified']
+    # Revalidate every time, the client keeps the messages it already has
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['X-Conversation-Id'] = str(request_id)
+    return response
+
+def conversation_not_modified(request_id, version):
+    """A 304 if the poller's ETag still matches the conversation, else None"""
+    if request.if_none_match.contains(version['etag']):
+        return conversation_response(Response(status=304), request_id, version)
+    return None
+
 @app.route('/student-messages')
 @login_required
 def get_student_messages():
-    """Get messages for current student's support request"""
+    """Get messages for current student's support request, ?after_id= returns only newer ones"""
     conn = get_db_connection()
     request_data = conn.execute(
         'SELECT id, status FROM support_requests WHERE user_id = ? AND status IN ("waiting", "active", "escalated", "professional", "professional_booking") ORDER BY created_at DESC LIMIT 1',
@@ -1776,26 +1620,30 @@ def get_student_messages():
     
     if not request_data:
         conn.close()
-        return jsonify([])
+        # An empty conversation id tells the poller the previous case is gone
+        response = jsonify([])
+        response.headers['X-Conversation-Id'] = ''
+        return response
+    
+    version = get_conversation_version(request_data['id'])
+    not_modified = version and conversation_not_modified(request_data['id'], version)
+    if not_modified:
+        conn.close()
+        return not_modified
     
     # Students can see all messages including professional ones
-    messages = conn.execute(
-        '''SELECT cm.*, u.username, u.role 
-           FROM chat_messages cm 
-           JOIN users u ON cm.sender_id = u.id 
-           WHERE cm.request_id = ? 
-           ORDER BY cm.created_at ASC''',
-        (request_data['id'],)
-    ).fetchall()
+    messages = conversation_messages(conn, request_data['id'], request.args.get('after_id', 0, type=int))
     conn.close()
     
-    return jsonify([{
+    response = jsonify([{
+        'id': msg['id'],
         'message': msg['message'],
         'sender': msg['username'],
         'role': msg['role'],
         'created_at': msg['created_at'],
         'case_status': request_data['status']
     } for msg in messages])
+    return conversation_response(response, request_data['id'], version) if version else response
 
 @app.route('/debug-messages/<int:user_id>')
 def debug_messages(user_id):
@@ -1821,17 +1669,21 @@ def student_send_message():
     conn = get_db_connection()
     # Find student's active support request
     request_data = conn.execute(
-        'SELECT id FROM support_requests WHERE user_id = ? AND status IN ("waiting", "active", "escalated", "professional") ORDER BY created_at DESC LIMIT 1',
+        'SELECT id, priority FROM support_requests WHERE user_id = ? AND status IN ("waiting", "active", "escalated", "professional") ORDER BY created_at DESC LIMIT 1',
         (session['user_id'],)
     ).fetchone()
     
     if request_data:
-        # Store student message
-        conn.execute(
+        # Store student message, crisis language mid-conversation makes the case urgent
+        cursor = conn.execute(
             'INSERT INTO chat_messages (request_id, sender_id, message) VALUES (?, ?, ?)',
             (request_data['id'], session['user_id'], message)
         )
+        priority = screen_support_message(conn, request_data, session['user_id'], message, cursor.lastrowid)
         conn.commit()
+        invalidate_conversation(request_data['id'])
+        if priority == 'urgent' and request_data['priority'] != 'urgent':
+            notification_outbox.wake()
     
     conn.close()
     return jsonify({'success': True})
@@ -1864,6 +1716,7 @@ def peer_send_message():
     )
     conn.commit()
     conn.close()
+    invalidate_conversation(request_id)
     
     return jsonify({'success': True})
 
@@ -1894,6 +1747,7 @@ def accept_support_request():
     )
     conn.commit()
     conn.close()
+    invalidate_conversation(request_id)
     
     return jsonify({'success': True})
 
@@ -1902,40 +1756,36 @@ def accept_support_request():
 @app.route('/get-peer-messages/<int:request_id>')
 @login_required
 def get_peer_messages(request_id):
-    """Get messages for a specific support request (for peer supporters)"""
+    """Get messages for a specific support request (for peer supporters), ?after_id= returns only newer ones"""
     user = get_current_user()
     if user['role'] != 'peer_supporter':
         return jsonify({'error': 'Unauthorized'}), 403
     
-    conn = get_db_connection()
+    # The cached version carries the case status, so an unchanged poll needs no query
+    version = get_conversation_version(request_id)
+    if version is None:
+        return jsonify([])
     
     # Check if case has been escalated to professional
-    case_status = conn.execute(
-        'SELECT status FROM support_requests WHERE id = ?',
-        (request_id,)
-    ).fetchone()
-    
-    if case_status and case_status['status'] == 'professional':
-        conn.close()
+    if version['status'] == 'professional':
         return jsonify({'professional_takeover': True})
     
+    not_modified = conversation_not_modified(request_id, version)
+    if not_modified:
+        return not_modified
+    
     # Get messages only if professional hasn't taken over
-    messages = conn.execute(
-        '''SELECT cm.*, u.username, u.role 
-           FROM chat_messages cm 
-           JOIN users u ON cm.sender_id = u.id 
-           WHERE cm.request_id = ? AND u.role != 'professional'
-           ORDER BY cm.created_at ASC''',
-        (request_id,)
-    ).fetchall()
+    conn = get_db_connection()
+    messages = conversation_messages(conn, request_id, request.args.get('after_id', 0, type=int), hide_professional=True)
     conn.close()
     
-    return jsonify([{
+    return conversation_response(jsonify([{
+        'id': msg['id'],
         'message': msg['message'],
         'sender': msg['username'],
         'role': msg['role'],
         'created_at': msg['created_at']
-    } for msg in messages])
+    } for msg in messages]), request_id, version)
 
 @app.route('/api/peer-requests')
 @login_required
@@ -2010,6 +1860,7 @@ def escalate_to_professional():
     
     conn.commit()
     conn.close()
+    invalidate_conversation(request_id)
     
     return jsonify({'success': True})
 
@@ -2058,17 +1909,6 @@ def update_profile():
         (username, email, user['id'])
     )
     
-    # Add additional profile fields to database if they don't exist
-    try:
-        conn.execute('ALTER TABLE users ADD COLUMN first_name TEXT')
-        conn.execute('ALTER TABLE users ADD COLUMN last_name TEXT')
-        conn.execute('ALTER TABLE users ADD COLUMN university TEXT')
-        conn.execute('ALTER TABLE users ADD COLUMN major TEXT')
-        conn.execute('ALTER TABLE users ADD COLUMN phone TEXT')
-        conn.execute('ALTER TABLE users ADD COLUMN year_of_study TEXT')
-    except sqlite3.OperationalError:
-        pass  # Columns already exist
-    
     # Update additional profile fields
     conn.execute(
         'UPDATE users SET first_name = ?, last_name = ?, university = ?, major = ?, phone = ?, year_of_study = ? WHERE id = ?',
@@ -2077,6 +1917,7 @@ def update_profile():
     
     conn.commit()
     conn.close()
+    invalidate_user(user['id'])
     
     flash('Profile updated successfully!')
     return redirect(url_for('profile'))
@@ -2106,6 +1947,10 @@ def update_preferences():
     # Get notification settings
     notification_method = request.form.get('notification_method', 'email')
     notification_time = request.form.get('notification_time', 'morning')
+    # Filled in by the browser, an unknown zone keeps the server's local time
+    timezone = request.form.get('timezone', '').strip()
+    if user_zone(timezone) is None:
+        timezone = user['timezone']
     
     # Validate emergency contact if emergency alerts are enabled
     if emergency_alerts and (not emergency_contact_name or not emergency_contact_phone):
@@ -2119,25 +1964,6 @@ def update_preferences():
     
     conn = get_db_connection()
     
-    # Add preferences columns if they don't exist
-    try:
-        conn.execute('ALTER TABLE users ADD COLUMN daily_checkins BOOLEAN DEFAULT 1')
-        conn.execute('ALTER TABLE users ADD COLUMN mood_reminders BOOLEAN DEFAULT 1')
-        conn.execute('ALTER TABLE users ADD COLUMN peer_notifications BOOLEAN DEFAULT 0')
-        conn.execute('ALTER TABLE users ADD COLUMN ai_insights BOOLEAN DEFAULT 1')
-        conn.execute('ALTER TABLE users ADD COLUMN appointment_reminders BOOLEAN DEFAULT 1')
-        conn.execute('ALTER TABLE users ADD COLUMN support_type TEXT DEFAULT "self_help"')
-        conn.execute('ALTER TABLE users ADD COLUMN emergency_alerts BOOLEAN DEFAULT 1')
-        conn.execute('ALTER TABLE users ADD COLUMN share_location BOOLEAN DEFAULT 0')
-        conn.execute('ALTER TABLE users ADD COLUMN auto_professional_escalation BOOLEAN DEFAULT 0')
-        conn.execute('ALTER TABLE users ADD COLUMN emergency_contact_name TEXT')
-        conn.execute('ALTER TABLE users ADD COLUMN emergency_contact_phone TEXT')
-        conn.execute('ALTER TABLE users ADD COLUMN emergency_contact_relationship TEXT')
-        conn.execute('ALTER TABLE users ADD COLUMN notification_method TEXT DEFAULT "email"')
-        conn.execute('ALTER TABLE users ADD COLUMN notification_time TEXT DEFAULT "morning"')
-    except sqlite3.OperationalError:
-        pass  # Columns already exist
-    
     # Update preferences
     conn.execute(
         '''UPDATE users SET 
@@ -2145,26 +1971,30 @@ def update_preferences():
            ai_insights = ?, appointment_reminders = ?, support_type = ?, 
            emergency_alerts = ?, share_location = ?, auto_professional_escalation = ?,
            emergency_contact_name = ?, emergency_contact_phone = ?, emergency_contact_relationship = ?,
-           notification_method = ?, notification_time = ?
+           notification_method = ?, notification_time = ?, timezone = ?
            WHERE id = ?''',
         (daily_checkins, mood_reminders, peer_notifications, ai_insights, appointment_reminders,
          support_type, emergency_alerts, share_location, auto_professional_escalation,
          emergency_contact_name, emergency_contact_phone, emergency_contact_relationship,
-         notification_method, notification_time, user['id'])
+         notification_method, notification_time, timezone, user['id'])
     )
+    # Saved with the preferences, whichever process runs the timer picks it up
+    daily_schedule_timer.reschedule(conn, user['id'])
     
     conn.commit()
     conn.close()
+    invalidate_user(user['id'])
+    daily_schedule_timer.wake()
     
     # Send test notification if user wants to verify their settings
     if request.form.get('test_notifications'):
         try:
-            result = notification_system.send_notification(
-                user['id'],
-                "Test Notification",
-                "This is a test notification to verify your settings are working correctly.",
-                "HavenMind - Test Notification"
-            )
+            notification_outbox.send(KIND_NOTIFICATION, {
+                'user_id': user['id'],
+                'notification_type': "Test Notification",
+                'message': "This is a test notification to verify your settings are working correctly.",
+                'subject': "HavenMind - Test Notification"
+            })
             flash('Preferences updated! Check your notifications (email/telegram).')
         except Exception as e:
             flash(f'Preferences updated but test notification failed: {e}')
@@ -2211,14 +2041,6 @@ def update_security():
         conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_password_hash, user['id']))
         flash('Password updated successfully!')
     
-    # Add data sharing columns if they don't exist
-    try:
-        conn.execute('ALTER TABLE users ADD COLUMN share_research BOOLEAN DEFAULT 0')
-        conn.execute('ALTER TABLE users ADD COLUMN ai_analysis BOOLEAN DEFAULT 1')
-        conn.execute('ALTER TABLE users ADD COLUMN share_counselors BOOLEAN DEFAULT 0')
-    except sqlite3.OperationalError:
-        pass  # Columns already exist
-    
     # Update data sharing preferences
     conn.execute(
         'UPDATE users SET share_research = ?, ai_analysis = ?, share_counselors = ? WHERE id = ?',
@@ -2227,6 +2049,7 @@ def update_security():
     
     conn.commit()
     conn.close()
+    invalidate_user(user['id'])
     
     if not (current_password and new_password):
         flash('Security preferences updated successfully!')
@@ -2251,8 +2074,8 @@ def get_journal_prompts():
         # Fallback to basic prompts
         conn = get_db_connection()
         recent_mood = conn.execute(
-            'SELECT AVG(sentiment_score) as avg_mood FROM journal_entries WHERE user_id = ? AND created_at >= datetime("now", "-3 days")',
-            (user['id'],)
+            'SELECT AVG(sentiment_score) as avg_mood FROM journal_entries WHERE user_id = ? AND created_ts >= ?',
+            (user['id'], days_ago_ts(3))
         ).fetchone()
         conn.close()
         
@@ -2291,8 +2114,8 @@ def get_cognitive_load_api():
     
     # Get upcoming events for next 7 days
     upcoming_events = conn.execute(
-        'SELECT stress_level, COUNT(*) as count FROM calendar_events WHERE user_id = ? AND event_date >= datetime("now") AND event_date <= datetime("now", "+7 days") GROUP BY stress_level',
-        (user['id'],)
+        'SELECT stress_level, COUNT(*) as count FROM calendar_events WHERE user_id = ? AND event_ts >= ? AND event_ts <= ? GROUP BY stress_level',
+        (user['id'], now_ts(), days_ahead_ts(7))
     ).fetchall()
     
     load_score = 0.2  # Base load
@@ -2579,7 +2402,7 @@ def generate_timetable():
     
     # Get all user events
     events = conn.execute(
-        'SELECT * FROM calendar_events WHERE user_id = ? ORDER BY event_date',
+        'SELECT * FROM calendar_events WHERE user_id = ? ORDER BY event_ts',
         (user['id'],)
     ).fetchall()
     
@@ -2799,9 +2622,7 @@ def get_student_profile(user_id):
     conn = get_db_connection()
     
     # Get student basic info
-    student = conn.execute(
-        'SELECT * FROM users WHERE id = ?', (user_id,)
-    ).fetchone()
+    student = get_user(user_id)
     
     # Get journal entries
     journal_entries = conn.execute(
@@ -2845,28 +2666,30 @@ def get_student_profile(user_id):
 @app.route('/api/chat-history/<int:request_id>')
 @login_required
 def get_chat_history(request_id):
-    """Get chat history for professionals and students"""
+    """Get chat history for professionals and students, ?after_id= returns only newer messages"""
     user = get_current_user()
     if user['role'] not in ['professional', 'student']:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    version = get_conversation_version(request_id)
+    if version is None:
+        return jsonify([])
+    
+    not_modified = conversation_not_modified(request_id, version)
+    if not_modified:
+        return not_modified
+    
     conn = get_db_connection()
-    messages = conn.execute(
-        '''SELECT cm.*, u.username, u.role 
-           FROM chat_messages cm 
-           JOIN users u ON cm.sender_id = u.id 
-           WHERE cm.request_id = ? 
-           ORDER BY cm.created_at ASC''',
-        (request_id,)
-    ).fetchall()
+    messages = conversation_messages(conn, request_id, request.args.get('after_id', 0, type=int))
     conn.close()
     
-    return jsonify([{
+    return conversation_response(jsonify([{
+        'id': msg['id'],
         'message': msg['message'],
         'sender': msg['username'],
         'role': msg['role'],
         'created_at': msg['created_at']
-    } for msg in messages])
+    } for msg in messages]), request_id, version)
 
 @app.route('/start-intervention', methods=['POST'])
 @login_required
@@ -2910,6 +2733,7 @@ def start_intervention():
     
     conn.commit()
     conn.close()
+    invalidate_conversation(case_id)
     
     return jsonify({'success': True})
 
@@ -2964,6 +2788,7 @@ def professional_send_message():
     )
     conn.commit()
     conn.close()
+    invalidate_conversation(request_id)
     
     return jsonify({'success': True})
 
@@ -3048,6 +2873,7 @@ def end_professional_session():
     
     conn.commit()
     conn.close()
+    invalidate_conversation(case_id)
     
     return jsonify({'success': True})
 
@@ -3212,14 +3038,15 @@ def test_notification_debug():
     user = get_current_user()
     
     try:
-        result = notification_system.send_notification(
-            user['id'],
-            "Test Notification",
-            "This is a test notification to verify your settings are working correctly.",
-            "HavenMind - Test Notification"
-        )
+        outbox_id = notification_outbox.send(KIND_NOTIFICATION, {
+            'user_id': user['id'],
+            'notification_type': "Test Notification",
+            'message': "This is a test notification to verify your settings are working correctly.",
+            'subject': "HavenMind - Test Notification"
+        })
         return jsonify({
-            'success': result,
+            'success': True,
+            'outbox_id': outbox_id,
             'phone': user['phone'],
             'email': user['email'],
             'notification_method': user['notification_method']
@@ -3258,6 +3085,48 @@ def admin_send_all_schedules():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/admin/llm-metrics')
+@login_required
+def admin_llm_metrics():
+    """Gemini call, queue depth and wait time metrics for admins"""
+    user = get_current_user()
+    if user['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(dict(
+        llm_client.stats(),
+        budgets=ai_hedge.stats(),
+        crisis_screening=crisis_screen.stats(),
+        notification_outbox=notification_outbox.stats(),
+        notification_channels=notification_system.stats(),
+        alert_coalescing=alert_coalescer.stats(),
+        daily_schedule=daily_schedule_timer.stats(),
+        journal_analysis=journal_analysis.stats(),
+        conversation_versions=conversation_versions.stats(),
+        job_leases=job_lease_stats()
+    ))
+
+@app.route('/admin/notification-providers', methods=['GET', 'POST'])
+@login_required
+def admin_notification_providers():
+    """Provider chains, rate limits and per-provider counts, POST saves changes for every worker without a restart.
+
+    Body: {"chains": {"sms": ["twilio", "textbelt"]}, "rate_limits": {"twilio": 60}}, a null limit removes it.
+    Other workers pick the change up within NOTIFY_PROVIDER_RELOAD_SECONDS.
+    """
+    user = get_current_user()
+    if user['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            notification_system.providers.save(data.get('chains'), data.get('rate_limits'))
+        except (TypeError, ValueError, AttributeError) as e:
+            return jsonify({'error': str(e)}), 400
+    
+    return jsonify(notification_system.providers.stats())
+
 @app.route('/api/student-location/<int:student_id>')
 @login_required
 def get_student_location_api(student_id):
@@ -3284,27 +3153,15 @@ def share_location():
         # Store location in database with timestamp
         conn = get_db_connection()
         try:
-            # Add location sharing table if it doesn't exist
-            conn.execute('''CREATE TABLE IF NOT EXISTS location_shares (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                latitude REAL NOT NULL,
-                longitude REAL NOT NULL,
-                shared_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                emergency_contact_phone TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )''')
-            
             # Store the location share
-            conn.execute(
+            cursor = conn.execute(
                 'INSERT INTO location_shares (user_id, latitude, longitude, emergency_contact_phone) VALUES (?, ?, ?, ?)',
                 (user['id'], latitude, longitude, user['emergency_contact_phone'])
             )
-            conn.commit()
+            share_key = f'location_share:{cursor.lastrowid}'
         except Exception as e:
             print(f"Error storing location: {e}")
-        finally:
-            conn.close()
+            share_key = None
         
         # Send location to emergency contact if crisis situation
         if user['emergency_contact_phone']:
@@ -3321,17 +3178,36 @@ For continuous location updates, the student can share their location again.
 HavenMind Emergency System"""
             
             try:
-                notification_system.send_sms(
+                # Queued with the location share, the outbox workers send it after the commit.
+                # Re-shares within the coalescing window update the queued SMS instead of adding one,
+                # once that went out the latest share follows in a digest when the window closes.
+                outcome = alert_coalescer.enqueue_alert(
+                    conn,
                     user['emergency_contact_phone'],
-                    location_msg
+                    TOPIC_LOCATION,
+                    location_msg,
+                    share_key
                 )
+                conn.commit()
+                notification_outbox.wake()
+                if outcome == ALERT_DEFERRED:
+                    message = (f'Your emergency contact already received your location recently, this update '
+                               f'will be sent to them within {max(1, round(alert_coalescer.window_seconds / 60))} minutes')
+                else:
+                    message = 'Location shared with emergency contact'
                 return jsonify({
                     'success': True, 
-                    'message': 'Location shared with emergency contact',
+                    'message': message,
+                    'deferred': outcome == ALERT_DEFERRED,
                     'emergency_contact': user['emergency_contact_name']
                 })
             except Exception as e:
                 return jsonify({'success': False, 'error': str(e)})
+            finally:
+                conn.close()
+        
+        conn.commit()
+        conn.close()
     
     return jsonify({'success': False, 'error': 'Invalid location data'})
 
@@ -3484,8 +3360,8 @@ def institution_analytics():
             # Active students (journaled in last 7 days)
             placeholders = ','.join(['?'] * len(student_ids))
             active_students = conn.execute(
-                f'SELECT COUNT(DISTINCT user_id) as count FROM journal_entries WHERE user_id IN ({placeholders}) AND created_at >= datetime("now", "-7 days")',
-                student_ids
+                f'SELECT COUNT(DISTINCT user_id) as count FROM journal_entries WHERE user_id IN ({placeholders}) AND created_ts >= ?',
+                (*student_ids, days_ago_ts(7))
             ).fetchone()['count']
             
             # Average wellness score
@@ -3504,8 +3380,8 @@ def institution_analytics():
             
             # Support requests
             support_requests = conn.execute(
-                f'SELECT COUNT(*) as count FROM support_requests WHERE user_id IN ({placeholders}) AND created_at >= datetime("now", "-30 days")',
-                student_ids
+                f'SELECT COUNT(*) as count FROM support_requests WHERE user_id IN ({placeholders}) AND created_ts >= ?',
+                (*student_ids, days_ago_ts(30))
             ).fetchone()['count']
             
             dept_analytics.append({
@@ -3582,10 +3458,10 @@ def institution_wellness_trends():
            FROM journal_entries je 
            JOIN users u ON je.user_id = u.id 
            WHERE u.university = ? AND u.role = "student" 
-           AND je.created_at >= datetime("now", "-30 days")
+           AND je.created_ts >= ?
            GROUP BY date(je.created_at) 
            ORDER BY date''',
-        (user['university'],)
+        (user['university'], days_ago_ts(30))
     ).fetchall()
     
     mood_distribution = conn.execute(
@@ -3599,9 +3475,9 @@ def institution_wellness_trends():
            FROM journal_entries je 
            JOIN users u ON je.user_id = u.id 
            WHERE u.university = ? AND u.role = "student" 
-           AND je.created_at >= datetime("now", "-30 days")
+           AND je.created_ts >= ?
            GROUP BY mood_category''',
-        (user['university'],)
+        (user['university'], days_ago_ts(30))
     ).fetchall()
     
     conn.close()
@@ -3695,8 +3571,8 @@ def generate_monthly_report():
             wellness_scores = []
             for student_id in student_ids:
                 mood = conn.execute(
-                    'SELECT AVG(sentiment_score) as avg_mood FROM journal_entries WHERE user_id = ? AND created_at >= datetime("now", "-30 days")',
-                    (student_id,)
+                    'SELECT AVG(sentiment_score) as avg_mood FROM journal_entries WHERE user_id = ? AND created_ts >= ?',
+                    (student_id, days_ago_ts(30))
                 ).fetchone()['avg_mood']
                 wellness_scores.append((mood * 100) if mood else 75)
             
@@ -3713,19 +3589,19 @@ def generate_monthly_report():
                    COUNT(*) as count
                    FROM journal_entries je 
                    WHERE je.user_id IN ({placeholders}) 
-                   AND je.created_at >= datetime("now", "-30 days")
+                   AND je.created_ts >= ?
                    GROUP BY mood_category''',
-                student_ids
+                (*student_ids, days_ago_ts(30))
             ).fetchall()
             
             # Department analysis
             dept_data = conn.execute(
                 f'''SELECT u.major, COUNT(DISTINCT u.id) as student_count, AVG(je.sentiment_score) as avg_mood
                    FROM users u
-                   LEFT JOIN journal_entries je ON u.id = je.user_id AND je.created_at >= datetime("now", "-30 days")
+                   LEFT JOIN journal_entries je ON u.id = je.user_id AND je.created_ts >= ?
                    WHERE u.id IN ({placeholders}) AND u.major IS NOT NULL
                    GROUP BY u.major''',
-                student_ids
+                (days_ago_ts(30), *student_ids)
             ).fetchall()
             
             # Weekly trends
@@ -3733,10 +3609,10 @@ def generate_monthly_report():
                 f'''SELECT strftime('%W', je.created_at) as week, AVG(je.sentiment_score) as avg_mood
                    FROM journal_entries je 
                    WHERE je.user_id IN ({placeholders}) 
-                   AND je.created_at >= datetime("now", "-30 days")
+                   AND je.created_ts >= ?
                    GROUP BY strftime('%W', je.created_at)
                    ORDER BY week''',
-                student_ids
+                (*student_ids, days_ago_ts(30))
             ).fetchall()
             
             # Stress levels
@@ -3744,21 +3620,21 @@ def generate_monthly_report():
                 f'''SELECT ce.stress_level, COUNT(*) as count
                    FROM calendar_events ce 
                    WHERE ce.user_id IN ({placeholders}) 
-                   AND ce.event_date >= datetime("now", "-30 days")
+                   AND ce.event_ts >= ?
                    GROUP BY ce.stress_level''',
-                student_ids
+                (*student_ids, days_ago_ts(30))
             ).fetchall()
             
             # Support requests
             support_count = conn.execute(
-                f'SELECT COUNT(*) as count FROM support_requests WHERE user_id IN ({placeholders}) AND created_at >= datetime("now", "-30 days")',
-                student_ids
+                f'SELECT COUNT(*) as count FROM support_requests WHERE user_id IN ({placeholders}) AND created_ts >= ?',
+                (*student_ids, days_ago_ts(30))
             ).fetchone()['count']
             
             # Active users
             active_users = conn.execute(
-                f'SELECT COUNT(DISTINCT user_id) as count FROM journal_entries WHERE user_id IN ({placeholders}) AND created_at >= datetime("now", "-30 days")',
-                student_ids
+                f'SELECT COUNT(DISTINCT user_id) as count FROM journal_entries WHERE user_id IN ({placeholders}) AND created_ts >= ?',
+                (*student_ids, days_ago_ts(30))
             ).fetchone()['count']
         
         conn.close()
@@ -4051,8 +3927,13 @@ if __name__ == '__main__':
         print('Admin user created: admin@gmail.com / admin123')
     conn.close()
     
-    # Start the daily scheduler
+    # Start the daily scheduler, the notification dispatch workers, the recovery of journal
+    # analyses lost in a restart and the purge of expired late AI answers, every worker process
+    # may do this since the scheduled jobs only run in the one holding their lease
     start_daily_scheduler()
+    notification_outbox.start()
+    journal_analysis.start()
+    ai_hedge.late_results.start()
     
     app.run(debug=True)
 # Add these routes at the end of app.py before if __name__ == '__main__':
@@ -4090,8 +3971,8 @@ def institution_department_analysis():
             # Active students (journaled in last 7 days)
             placeholders = ','.join(['?'] * len(student_ids))
             active_students = conn.execute(
-                f'SELECT COUNT(DISTINCT user_id) as count FROM journal_entries WHERE user_id IN ({placeholders}) AND created_at >= datetime("now", "-7 days")',
-                student_ids
+                f'SELECT COUNT(DISTINCT user_id) as count FROM journal_entries WHERE user_id IN ({placeholders}) AND created_ts >= ?',
+                (*student_ids, days_ago_ts(7))
             ).fetchone()['count']
             
             # Average wellness score
@@ -4110,8 +3991,8 @@ def institution_department_analysis():
             
             # Support requests
             support_requests = conn.execute(
-                f'SELECT COUNT(*) as count FROM support_requests WHERE user_id IN ({placeholders}) AND created_at >= datetime("now", "-30 days")',
-                student_ids
+                f'SELECT COUNT(*) as count FROM support_requests WHERE user_id IN ({placeholders}) AND created_ts >= ?',
+                (*student_ids, days_ago_ts(30))
             ).fetchone()['count']
             
             dept_analytics.append({
@@ -4148,10 +4029,10 @@ def institution_wellness_trends():
            FROM journal_entries je 
            JOIN users u ON je.user_id = u.id 
            WHERE u.university = ? AND u.role = "student" 
-           AND je.created_at >= datetime("now", "-30 days")
+           AND je.created_ts >= ?
            GROUP BY date(je.created_at) 
            ORDER BY date''',
-        (user['university'],)
+        (user['university'], days_ago_ts(30))
     ).fetchall()
     
     # Get mood distribution
@@ -4166,9 +4047,9 @@ def institution_wellness_trends():
            FROM journal_entries je 
            JOIN users u ON je.user_id = u.id 
            WHERE u.university = ? AND u.role = "student" 
-           AND je.created_at >= datetime("now", "-30 days")
+           AND je.created_ts >= ?
            GROUP BY mood_category''',
-        (user['university'],)
+        (user['university'], days_ago_ts(30))
     ).fetchall()
     
     # Get stress patterns by day of week
@@ -4193,10 +4074,10 @@ def institution_wellness_trends():
            FROM calendar_events ce 
            JOIN users u ON ce.user_id = u.id 
            WHERE u.university = ? AND u.role = "student" 
-           AND ce.event_date >= datetime("now", "-30 days")
+           AND ce.event_ts >= ?
            GROUP BY strftime('%w', ce.event_date)
            ORDER BY strftime('%w', ce.event_date)''',
-        (user['university'],)
+        (user['university'], days_ago_ts(30))
     ).fetchall()
     
     conn.close()
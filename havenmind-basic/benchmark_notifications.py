@@ -0,0 +1,110 @@
+"""
+Notification Dispatch Benchmark for HavenMind
+Drains a batch of outbox rows through the loopback provider to size the dispatch worker pool without touching real providers
+
+Usage:
+    python benchmark_notifications.py [messages] [workers,workers,...] [latency_ms] [failure_rate]
+    python benchmark_notifications.py 500 1,4,8,16 50 0.05
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+# The benchmark gets a throwaway database, set before db reads DATABASE_PATH
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='havenmind-bench-'), 'bench.db')
+
+from db import get_db_connection
+from migrator import apply_migrations
+from notification_system import notification_system, DEFAULT_CHAINS
+from outbox import (NotificationOutbox, enqueue, KIND_SMS, KIND_EMERGENCY_SMS,
+                    PRIORITY_NORMAL, PRIORITY_URGENT, STATUS_SENT, STATUS_DEAD)
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def enqueue_batch(messages):
+    """One urgent emergency SMS for every nine ordinary ones, like a morning blast with a crisis in it"""
+    conn = get_db_connection()
+    conn.execute('DELETE FROM notification_outbox')
+    for number in range(messages):
+        if number % 10 == 0:
+            enqueue(conn, KIND_EMERGENCY_SMS, {'to_phone': f'9{number:09d}', 'message': 'Benchmark alert'}, priority=PRIORITY_URGENT)
+        else:
+            enqueue(conn, KIND_SMS, {'to_phone': f'9{number:09d}', 'message': 'Benchmark message'}, priority=PRIORITY_NORMAL)
+    conn.commit()
+    conn.close()
+
+
+def run(messages, workers, handlers):
+    enqueue_batch(messages)
+    dispatcher = NotificationOutbox(handlers=handlers, workers=workers, base_delay=0.01, max_delay=0.1)
+
+    started = time.time()
+    # Provider and fan-out logging would swamp the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        dispatcher.start()
+        dispatcher.wake()
+        while True:
+            conn = get_db_connection()
+            done = conn.execute(
+                'SELECT COUNT(*) FROM notification_outbox WHERE status IN (?, ?)', (STATUS_SENT, STATUS_DEAD)
+            ).fetchone()[0]
+            conn.close()
+            if done >= messages:
+                break
+            time.sleep(0.05)
+        elapsed = time.time() - started
+        dispatcher.shutdown()
+
+    conn = get_db_connection()
+    rows = conn.execute('SELECT status, priority, sent_ts FROM notification_outbox').fetchall()
+    conn.close()
+    latency = {
+        priority: [row['sent_ts'] - started for row in rows if row['status'] == STATUS_SENT and row['priority'] == priority]
+        for priority in (PRIORITY_URGENT, PRIORITY_NORMAL)
+    }
+    dead = sum(1 for row in rows if row['status'] == STATUS_DEAD)
+
+    print(f"{workers:>7} {messages / elapsed:>10.1f} "
+          f"{_percentile(latency[PRIORITY_URGENT], 0.5):>10.3f} {_percentile(latency[PRIORITY_URGENT], 0.99):>10.3f} "
+          f"{_percentile(latency[PRIORITY_NORMAL], 0.5):>10.3f} {_percentile(latency[PRIORITY_NORMAL], 0.99):>10.3f} {dead:>5}")
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    worker_counts = [int(count) for count in sys.argv[2].split(',')] if len(sys.argv) > 2 else [1, 4, 8]
+    latency_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 50
+    failure_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0
+
+    apply_migrations()
+
+    # Every channel goes to the local fake
+    for channel in DEFAULT_CHAINS:
+        notification_system.providers.configure(channel, ['loopback'])
+    loopback = notification_system.providers.providers['loopback']
+    loopback.latency = latency_ms / 1000.0
+    loopback.failure_rate = failure_rate
+
+    handlers = {
+        KIND_SMS: notification_system.send_sms,
+        KIND_EMERGENCY_SMS: notification_system.send_emergency_sms
+    }
+
+    print(f"{messages} messages, loopback latency {latency_ms:.0f}ms, failure rate {failure_rate:.0%}")
+    print("Seconds are from the start of the run until the row was sent")
+    print(f"{'workers':>7} {'msg/s':>10} {'urgent p50':>10} {'urgent p99':>10} {'normal p50':>10} {'normal p99':>10} {'dead':>5}")
+    for workers in worker_counts:
+        run(messages, workers, handlers)
+
+
+if __name__ == '__main__':
+    main()
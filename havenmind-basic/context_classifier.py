@@ -0,0 +1,151 @@
+"""
+Context Classifier for HavenMind
+Scores journal text against life-domain contexts with a term inverted index built once at import
+"""
+
+import random
+import re
+
+TIER_WEIGHTS = {'primary': 3, 'secondary': 2, 'emotional': 1}
+PHRASE_BONUS = 5
+
+# Semantic clusters for different life domains
+CONTEXT_INDICATORS = {
+    'employment_loss': {
+        'primary': ['laid', 'off', 'fired', 'terminated', 'unemployed', 'jobless'],
+        'secondary': ['job', 'work', 'employment', 'career', 'position'],
+        'emotional': ['lost', 'gone', 'ended', 'finished']
+    },
+    'company_placement': {
+        'primary': ['company', 'placement', 'internship', 'position'],
+        'secondary': ['based', 'assigned', 'placed', 'working'],
+        'emotional': ['lost', 'ended', 'cancelled', 'removed']
+    },
+    'academic_stress': {
+        'primary': ['semester', 'coursework', 'assignments', 'workload'],
+        'secondary': ['study', 'class', 'school', 'college', 'university'],
+        'emotional': ['overwhelmed', 'stressed', 'pressure', 'much']
+    },
+    'financial_pressure': {
+        'primary': ['money', 'financial', 'bills', 'rent', 'expenses'],
+        'secondary': ['afford', 'pay', 'cost', 'budget'],
+        'emotional': ['worried', 'stressed', 'anxious', 'scared']
+    },
+    'time_pressure': {
+        'primary': ['deadline', 'time', 'months', 'weeks', 'days'],
+        'secondary': ['before', 'until', 'left', 'remaining'],
+        'emotional': ['running', 'out', 'pressure', 'urgent']
+    },
+    'social_isolation': {
+        'primary': ['lonely', 'alone', 'isolated', 'nobody'],
+        'secondary': ['friends', 'family', 'people', 'social'],
+        'emotional': ['sad', 'empty', 'disconnected']
+    },
+    'separation_sadness': {
+        'primary': ['brother', 'sister', 'family', 'friend', 'leaving', 'going'],
+        'secondary': ['out', 'station', 'away', 'travel', 'trip'],
+        'emotional': ['sad', 'miss', 'upset', 'worried']
+    },
+    'academic_transition': {
+        'primary': ['college', 'university', 'first', 'day', 'new'],
+        'secondary': ['student', 'campus', 'class', 'course'],
+        'emotional': ['nervous', 'scared', 'anxious', 'worried']
+    }
+}
+
+# Phrase combinations that add PHRASE_BONUS to a context, matched as substrings
+CONTEXT_PHRASES = {
+    'employment_loss': ['laid off', 'lost job'],
+    'company_placement': ['no company', 'lost company'],
+    'academic_stress': ['too much work', 'semester started'],
+    'separation_sadness': ['going out', 'out of station', 'brother is']
+}
+
+# Context-specific therapeutic responses
+CONTEXT_RESPONSES = {
+    'employment_loss': [
+        "I'm so sorry to hear about your job loss. Losing employment is one of life's most stressful experiences, and your feelings of sadness and worry are completely understandable. This kind of sudden change can feel overwhelming, especially with financial pressures and time constraints. Remember that this setback doesn't define your worth or future potential. What support systems do you have available right now?",
+        "Losing your job is incredibly difficult, and I can hear the pain in your words. It's natural to feel sad and anxious when facing such uncertainty. This kind of major life change affects not just your finances but your sense of identity and security. Please know that many people face similar challenges and find their way through. Have you been able to reach out to anyone for support during this time?"
+    ],
+    'company_placement': [
+        "Losing your company placement or internship is incredibly stressful, especially when you're facing academic deadlines. Your feelings of sadness and worry are completely valid - this kind of uncertainty about your future is genuinely difficult to handle. It's important to remember that many students face similar challenges, and there are often alternative paths forward. Have you been able to speak with your academic advisor or career services about options?",
+        "I understand how devastating it must feel to lose your company placement. This kind of setback can feel like it threatens your entire academic and career path. Your emotions are completely valid - it's normal to feel sad and worried when facing this kind of uncertainty. Remember that this doesn't define your capabilities or future success. What resources are available to help you explore alternative options?"
+    ],
+    'academic_stress': [
+        "The beginning of a new semester can feel overwhelming with all the new coursework and expectations. It's completely normal to feel this way when facing a heavy workload. Remember, you don't have to tackle everything at once. What's one assignment or task you could focus on first to help you feel more in control?",
+        "Academic pressure can be intense, and it sounds like you're feeling the weight of your coursework right now. It's important to remember that feeling overwhelmed doesn't mean you can't handle it - it just means you're human. Breaking things down into smaller, manageable pieces can help. What's the most pressing thing you need to address first?"
+    ],
+    'financial_pressure': [
+        "Financial stress can be incredibly overwhelming and affects every aspect of your life. It's completely understandable that you're feeling anxious and worried about money. These concerns are valid and it's important to acknowledge how difficult this situation is. Have you been able to explore any financial resources or support options available to you?",
+        "Money worries can consume your thoughts and make everything else feel more difficult. Your stress about finances is completely understandable - financial security is a basic need, and when it's threatened, it affects your entire sense of well-being. What small steps might you be able to take to address your most immediate financial concerns?"
+    ],
+    'time_pressure': [
+        "Feeling pressed for time can create intense anxiety, especially when you're facing important deadlines. It's natural to feel overwhelmed when you feel like time is running out. Remember that even when time feels short, taking a moment to prioritize and plan can help you use your time more effectively. What's the most important thing you need to focus on right now?",
+        "Time pressure can make everything feel more urgent and stressful. It's understandable that you're feeling anxious about your deadlines. Sometimes when we feel rushed, it helps to step back and break things down into what absolutely must be done versus what would be nice to accomplish. What are your most critical priorities?"
+    ],
+    'social_isolation': [
+        "Feeling lonely and isolated can be incredibly painful, especially when you're already dealing with other stresses. Your feelings are completely valid - humans need connection, and when we don't have it, it affects our entire well-being. Even small steps toward connection can help. Is there anyone in your life you might be able to reach out to?",
+        "Loneliness can make every other challenge feel more difficult to handle. It's important to acknowledge how hard it is to feel alone, especially during stressful times. Remember that reaching out - even through journaling like this - shows strength. What's one small way you might be able to connect with someone today?"
+    ],
+    'academic_transition': [
+        "Starting college or transitioning to a new academic environment can feel overwhelming, and it's completely normal to feel anxious about new experiences. These initial worries often feel bigger than they actually are, and most students face similar anxieties. Remember that adjustment takes time, and it's okay to feel uncertain. What's one thing you could do to help yourself feel more prepared or confident?",
+        "Academic transitions can be really challenging, and your feelings of nervousness or worry are completely normal. Starting something new always involves uncertainty, and that can feel scary. It's important to remember that these feelings are temporary and that you have the strength to adapt. What support systems are available to help you through this transition?"
+    ],
+    'separation_sadness': [
+        "It sounds like you're feeling sad about your brother leaving. It's completely natural to feel this way when someone important to you goes away, even temporarily. These feelings show how much you care about your family relationships. While it's hard when loved ones are far away, remember that distance doesn't diminish the bond you share. How do you usually stay connected when you're apart?",
+        "I can hear the sadness in your words about your brother going out of station. It's really hard when family members have to leave, and your feelings are completely valid. Missing someone shows the strength of your relationship with them. Even though it feels difficult right now, this separation is temporary. What are some ways you might stay in touch while he's away?"
+    ]
+}
+
+
+class ContextClassifier:
+    def __init__(self, indicators, phrases):
+        self.contexts = list(indicators)
+
+        # term -> [(context, weight)], a term listed under several tiers of a context counts for each
+        self._index = {}
+        for context, tiers in indicators.items():
+            for tier, terms in tiers.items():
+                for term in terms:
+                    self._index.setdefault(term, []).append((context, TIER_WEIGHTS[tier]))
+
+        self._phrase_contexts = {}
+        for context, context_phrases in phrases.items():
+            for phrase in context_phrases:
+                self._phrase_contexts[phrase] = context
+        ordered = sorted(self._phrase_contexts, key=len, reverse=True)
+        # Lookahead so overlapping phrases ('going out of station') are all seen in one scan
+        self._phrase_regex = re.compile('(?=(' + '|'.join(re.escape(phrase) for phrase in ordered) + '))')
+        self._word_regex = re.compile(r'\b\w+\b')
+
+    def classify(self, content):
+        """Return {'primary_context', 'confidence', 'all_scores'}, or 'general_distress' if nothing matched"""
+        content_lower = content.lower()
+        scores = dict.fromkeys(self.contexts, 0)
+
+        for word in set(self._word_regex.findall(content_lower)):
+            for context, weight in self._index.get(word, ()):
+                scores[context] += weight
+
+        bonused = {self._phrase_contexts[match.group(1)] for match in self._phrase_regex.finditer(content_lower)}
+        for context in bonused:
+            scores[context] += PHRASE_BONUS
+
+        dominant_context = max(scores, key=scores.get)
+        if scores[dominant_context] == 0:
+            return 'general_distress'
+
+        return {
+            'primary_context': dominant_context,
+            'confidence': scores[dominant_context],
+            'all_scores': scores
+        }
+
+    def response_for(self, context):
+        """A therapeutic response for context, or None if there is none for it"""
+        options = CONTEXT_RESPONSES.get(context)
+        return random.choice(options) if options else None
+
+
+# Global context classifier instance
+context_classifier = ContextClassifier(CONTEXT_INDICATORS, CONTEXT_PHRASES)
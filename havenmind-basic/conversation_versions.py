@@ -0,0 +1,92 @@
+"""
+Conversation Versions for HavenMind
+Keeps each support conversation's last message id and status in a small TTL'd LRU so chat polls with nothing new answer 304 without a query
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from db import get_db_connection
+
+# The case status and its newest message, found through the (request_id, id) index
+VERSION_SQL = '''
+    SELECT sr.status, sr.created_ts, cm.id AS last_id, cm.created_ts AS last_ts
+    FROM support_requests sr
+    LEFT JOIN chat_messages cm ON cm.id = (SELECT MAX(id) FROM chat_messages WHERE request_id = sr.id)
+    WHERE sr.id = ?
+'''
+
+
+class ConversationVersions:
+    def __init__(self, max_size=None, ttl_seconds=None):
+        self.max_size = max_size or int(os.getenv('CHAT_VERSION_CACHE_SIZE', '4096'))
+        # Writes in this process invalidate at once, this bounds how long a message
+        # written by another worker process can go unnoticed by pollers here
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('CHAT_VERSION_TTL', '5'))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, request_id):
+        """{'etag', 'last_modified', 'status', 'last_id'} for the conversation, None if the request does not exist"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(request_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(request_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        conn = get_db_connection()
+        row = conn.execute(VERSION_SQL, (request_id,)).fetchone()
+        conn.close()
+
+        if row is None:
+            self.invalidate(request_id)
+            return None
+
+        last_id = row['last_id'] or 0
+        version = {
+            'etag': f"{request_id}-{last_id}-{row['status']}",
+            'last_modified': row['last_ts'] or row['created_ts'],
+            'status': row['status'],
+            'last_id': last_id
+        }
+        with self._lock:
+            self._entries[request_id] = (now + self.ttl_seconds, version)
+            self._entries.move_to_end(request_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return version
+
+    def invalidate(self, request_id):
+        """Call after committing a message or status change on the conversation"""
+        with self._lock:
+            self._entries.pop(request_id, None)
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {
+            'size': size,
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+# Global conversation version cache instance
+conversation_versions = ConversationVersions()
+
+
+def get_conversation_version(request_id):
+    return conversation_versions.get(request_id)
+
+
+def invalidate_conversation(request_id):
+    conversation_versions.invalidate(request_id)
@@ -0,0 +1,92 @@
+"""
+Local Crisis Screening for HavenMind
+Screens every journal entry and chat message with the compiled lexicon before any LLM call and queues alerts with the row that raised them
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+
+from lexicon import scan_text
+from simple_ai import analyze_sentiment_simple
+
+SEVERITY_NONE = 'none'
+SEVERITY_CONCERN = 'concern'
+SEVERITY_CRISIS = 'crisis'
+SEVERITY_RANK = {SEVERITY_NONE: 0, SEVERITY_CONCERN: 1, SEVERITY_CRISIS: 2}
+
+ScreenResult = namedtuple('ScreenResult', ['severity', 'sentiment_score', 'emotion_tags', 'hits'])
+
+
+def severity_for(emotion_tags, sentiment_score):
+    """Alert severity implied by a sentiment analysis, local or from the LLM"""
+    if emotion_tags == 'crisis':
+        return SEVERITY_CRISIS
+    if emotion_tags == 'negative' or sentiment_score < 0.4:
+        return SEVERITY_CONCERN
+    return SEVERITY_NONE
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class CrisisScreen:
+    def __init__(self, alert):
+        """alert(conn, user_id, content, severity, source, key) enqueues the notifications for a positive
+        screen in the caller's transaction, key is the idempotency key prefix of the triggering row"""
+        self.alert = alert
+        self._lock = threading.Lock()
+        self._screen_ms = deque(maxlen=1000)
+        self.screened = 0
+        self.alerts = {SEVERITY_CONCERN: 0, SEVERITY_CRISIS: 0}
+        self.escalations = 0
+
+    def screen(self, content):
+        """Local severity of content, cheap enough to run on every entry and message"""
+        started = time.monotonic()
+        hits = scan_text(content)
+        sentiment_score, emotion_tags = analyze_sentiment_simple(content, hits)
+        severity = severity_for(emotion_tags, sentiment_score)
+        if severity == SEVERITY_NONE and 'sad_emoticon' in hits:
+            severity = SEVERITY_CONCERN
+
+        with self._lock:
+            self.screened += 1
+            self._screen_ms.append((time.monotonic() - started) * 1000)
+        return ScreenResult(severity, sentiment_score, emotion_tags, hits)
+
+    def alert_if(self, conn, screen, user_id, content, source, key, min_severity=SEVERITY_CONCERN):
+        """Enqueue alerts for a screened text if it reached min_severity, returns True if it did"""
+        if screen.severity == SEVERITY_NONE or SEVERITY_RANK[screen.severity] < SEVERITY_RANK[min_severity]:
+            return False
+        self.dispatch(conn, user_id, content, screen.severity, source, key)
+        return True
+
+    def escalate(self, conn, user_id, content, screened_severity, severity, source, key):
+        """Alert when a later analysis (the LLM) finds a higher severity than the local screen did"""
+        if SEVERITY_RANK[severity] <= SEVERITY_RANK[screened_severity]:
+            return False
+        with self._lock:
+            self.escalations += 1
+        self.dispatch(conn, user_id, content, severity, source, f'{key}:escalated')
+        return True
+
+    def dispatch(self, conn, user_id, content, severity, source, key):
+        with self._lock:
+            self.alerts[severity] += 1
+        self.alert(conn, user_id, content, severity, source, key)
+
+    def stats(self):
+        with self._lock:
+            screen_ms = list(self._screen_ms)
+            return {
+                'screened': self.screened,
+                'alerts': dict(self.alerts),
+                'escalations': self.escalations,
+                'screen_ms_p50': round(_percentile(screen_ms, 0.5), 3),
+                'screen_ms_p99': round(_percentile(screen_ms, 0.99), 3)
+            }
@@ -3,26 +3,71 @@ Daily Schedule Sender for HavenMind
 Automatically sends daily calendar schedules via email and Telegram
 """
 
-import sqlite3
-from datetime import datetime, timedelta
-from notification_system import notification_system
+from db import get_db_connection
+from timestamps import local_day_bounds
+from datetime import date, datetime, timedelta, time as clock_time
+from itertools import groupby
+from outbox import notification_outbox, enqueue, KIND_NOTIFICATION, KIND_ADDRESSED_NOTIFICATION
+from leases import JobLease
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import heapq
+import os
 import threading
 import time
 
+JOB_DAILY_SCHEDULE = 'daily_schedule'
+RUN_RUNNING = 'running'
+RUN_COMPLETE = 'complete'
+
+# How a user's next send relates to today's window, see DailyScheduleTimer.next_fire
+WINDOW_ON_TIME = 'on_time'
+WINDOW_CATCH_UP = 'catch_up'
+WINDOW_MISSED = 'missed'
+
+# Look-back when polling for preference changes, covers clock skew between hosts
+CHANGE_SKEW_SECONDS = 60
+
+# The profile page's notification_time choices, a custom 'HH:MM' is honoured as well
+NOTIFICATION_TIMES = {
+    'morning': clock_time(8, 0),
+    'afternoon': clock_time(14, 0),
+    'evening': clock_time(19, 0)
+}
+
+# One chunk of users joined to their events for the day, keyset-paginated on users.id
+DAILY_SCHEDULE_CHUNK_SQL = '''
+    SELECT u.id AS user_id, u.username, u.email, u.notification_method,
+           e.id AS event_id, e.title, e.description, e.event_date, e.stress_level
+    FROM (SELECT id, username, email, notification_method FROM users
+          WHERE daily_checkins = 1 AND id > ? ORDER BY id LIMIT ?) u
+    LEFT JOIN calendar_events e ON e.user_id = u.id AND e.event_ts >= ? AND e.event_ts < ?
+    ORDER BY u.id, e.event_ts
+'''
+
+# Due users that share a local day joined to that day's events, {ids} is the placeholder list
+DUE_SCHEDULES_SQL = '''
+    SELECT u.id AS user_id, u.username, u.email, u.notification_method, u.notification_time, u.timezone,
+           e.id AS event_id, e.title, e.description, e.event_date, e.stress_level
+    FROM users u
+    LEFT JOIN calendar_events e ON e.user_id = u.id AND e.event_ts >= ? AND e.event_ts < ?
+    WHERE u.daily_checkins = 1 AND u.id IN ({ids})
+    ORDER BY u.id, e.event_ts
+'''
+
 def get_daily_schedule(user_id, date=None):
     """Get user's schedule for a specific date"""
     if date is None:
         date = datetime.now().date()
     
-    conn = sqlite3.connect('havenmind.db')
-    conn.row_factory = sqlite3.Row
+    conn = get_db_connection()
     
     # Get events for the specified date
+    day_start, day_end = local_day_bounds(date)
     events = conn.execute(
         '''SELECT * FROM calendar_events 
-           WHERE user_id = ? AND date(event_date) = ? 
-           ORDER BY event_date''',
-        (user_id, date.strftime('%Y-%m-%d'))
+           WHERE user_id = ? AND event_ts >= ? AND event_ts < ? 
+           ORDER BY event_ts''',
+        (user_id, day_start, day_end)
     ).fetchall()
     
     conn.close()
@@ -75,62 +120,464 @@ Have a great day! 🌟
     
     return message
 
-def send_daily_schedules():
-    """Send daily schedules to all users who have daily check-ins enabled"""
-    conn = sqlite3.connect('havenmind.db')
-    conn.row_factory = sqlite3.Row
+def start_run(conn, job, run_date):
+    """The checkpoint row for job on run_date, created on the first attempt"""
+    conn.execute(
+        'INSERT OR IGNORE INTO schedule_runs (job, run_date, status, started_ts) VALUES (?, ?, ?, ?)',
+        (job, run_date.isoformat(), RUN_RUNNING, time.time())
+    )
+    conn.commit()
+    return conn.execute(
+        'SELECT * FROM schedule_runs WHERE job = ? AND run_date = ?', (job, run_date.isoformat())
+    ).fetchone()
+
+def has_unfinished_run(job, run_date):
+    conn = get_db_connection()
+    try:
+        row = conn.execute(
+            'SELECT status FROM schedule_runs WHERE job = ? AND run_date = ?', (job, run_date.isoformat())
+        ).fetchone()
+    finally:
+        conn.close()
+    return row is not None and row['status'] == RUN_RUNNING
+
+def notification_clock(value):
+    """Local wall-clock time a user's schedule is due, morning when unset or unreadable"""
+    if value in NOTIFICATION_TIMES:
+        return NOTIFICATION_TIMES[value]
+    try:
+        return datetime.strptime(value or '', '%H:%M').time()
+    except ValueError:
+        return NOTIFICATION_TIMES['morning']
+
+def user_zone(name):
+    """ZoneInfo for an IANA zone name, None (the server's local time) when it is empty or unknown"""
+    name = name or os.getenv('DEFAULT_TIMEZONE', '')
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+def enqueue_schedule(conn, user_id, user_rows, day):
+    """Queue one user's schedule for day from their rows joined to the day's events.
     
-    # Get users who have daily check-ins enabled
-    users = conn.execute(
-        'SELECT * FROM users WHERE daily_checkins = 1'
-    ).fetchall()
+    Returns False if it was already queued, the key keeps a resumed or repeated run
+    and the per-user timer from sending twice.
+    """
+    user = user_rows[0]
+    events = [row for row in user_rows if row['event_id'] is not None]
+    schedule_message = format_schedule_message(events, day)
     
-    conn.close()
+    return enqueue(
+        conn,
+        KIND_ADDRESSED_NOTIFICATION,
+        {
+            'email': user['email'],
+            'notification_method': user['notification_method'],
+            'notification_type': "Daily Schedule",
+            'message': schedule_message,
+            'subject': f"Your Schedule for {day.strftime('%B %d, %Y')}"
+        },
+        f"daily_schedule:{user_id}:{day.isoformat()}"
+    ) is not None
+
+def send_daily_schedules(day=None, chunk_size=None):
+    """Queue the day's schedule for every user with daily check-ins enabled, returns how many were queued.
     
-    today = datetime.now().date()
+    This is the admin "send everyone now" run, DailyScheduleTimer sends each user at
+    their own time. Users and their events come from one joined query per chunk, and
+    each chunk's outbox rows are written in the same transaction as the run's
+    checkpoint, so a run that crashed resumes after the last committed chunk instead
+    of starting over. The outbox workers start sending each chunk as soon as it commits.
+    """
+    day = day or datetime.now().date()
+    chunk_size = chunk_size or int(os.getenv('DAILY_SCHEDULE_CHUNK_SIZE', '500'))
+    day_start, day_end = local_day_bounds(day)
     
-    for user in users:
-        try:
-            # Get user's schedule
-            events = get_daily_schedule(user['id'], today)
+    conn = get_db_connection()
+    try:
+        run = start_run(conn, JOB_DAILY_SCHEDULE, day)
+        if run['status'] == RUN_COMPLETE:
+            print(f"Daily schedules for {day} were already queued")
+            return 0
+        
+        last_user_id, queued = run['last_user_id'], run['queued']
+        if last_user_id:
+            print(f"Resuming daily schedules for {day} after user {last_user_id}")
+        
+        while True:
+            rows = conn.execute(DAILY_SCHEDULE_CHUNK_SQL, (last_user_id, chunk_size, day_start, day_end)).fetchall()
+            if not rows:
+                break
             
-            # Format message
-            schedule_message = format_schedule_message(events, today)
+            for user_id, user_rows in groupby(rows, key=lambda row: row['user_id']):
+                try:
+                    enqueue_schedule(conn, user_id, list(user_rows), day)
+                except Exception as e:
+                    print(f"Error formatting schedule for user {user_id}: {e}")
+                    continue
+                queued += 1
             
-            # Send notification
-            notification_system.send_notification(
-                user['id'],
-                "Daily Schedule",
-                schedule_message,
-                f"Your Schedule for {today.strftime('%B %d, %Y')}"
+            last_user_id = rows[-1]['user_id']
+            conn.execute(
+                'UPDATE schedule_runs SET last_user_id = ?, queued = ?, checkpoint_ts = ? WHERE job = ? AND run_date = ?',
+                (last_user_id, queued, time.time(), JOB_DAILY_SCHEDULE, day.isoformat())
             )
+            conn.commit()
+            notification_outbox.wake()
+        
+        conn.execute(
+            'UPDATE schedule_runs SET status = ?, finished_ts = ? WHERE job = ? AND run_date = ?',
+            (RUN_COMPLETE, time.time(), JOB_DAILY_SCHEDULE, day.isoformat())
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    
+    print(f"Daily schedules queued for {queued} users")
+    return queued
+
+class DailyScheduleTimer:
+    """Sends each user's daily schedule at their own notification_time in their own timezone.
+    
+    A min-heap holds one (fire_ts, user_id, local_day) entry per opted-in user. Each
+    user fires at a fixed offset inside the spread window after their chosen time, so a
+    popular time like 8 AM becomes a ramp rather than one burst. The last local day
+    sent is saved in the transaction that queues the outbox row, so after a restart
+    anyone whose window passed while the app was down is caught up, spread the same
+    way from startup, unless it is more than the catch-up limit late. With several
+    workers or hosts, the daily_schedule lease picks the one process that sends and
+    a follower takes over, catching up the same way, if the leader dies. Preference
+    changes in any process are saved with their next send time in
+    daily_schedule_state, where the leader picks them up every poll.
+    """
+    
+    def __init__(self, batch_size=None, spread_minutes=None, catchup_hours=None, refresh_seconds=None,
+                 poll_seconds=None):
+        self.batch_size = batch_size or int(os.getenv('DAILY_SCHEDULE_CHUNK_SIZE', '500'))
+        if spread_minutes is None:
+            spread_minutes = float(os.getenv('DAILY_SCHEDULE_SPREAD_MINUTES', '30'))
+        if catchup_hours is None:
+            catchup_hours = float(os.getenv('DAILY_SCHEDULE_CATCHUP_HOURS', '4'))
+        self.spread_seconds = spread_minutes * 60
+        self.catchup_seconds = catchup_hours * 3600
+        # New sign-ups and changes made without reschedule() are picked up this often
+        self.refresh_seconds = refresh_seconds or float(os.getenv('DAILY_SCHEDULE_REFRESH_SECONDS', '900'))
+        # How often the leader checks daily_schedule_state for changes saved by reschedule()
+        self.poll_seconds = poll_seconds or float(os.getenv('DAILY_SCHEDULE_POLL_SECONDS', '30'))
+        
+        self._heap = []
+        # user_id -> fire_ts of the user's live heap entry, any other entry for them is stale
+        self._fire_at = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        # Only the process holding the lease sends, the others wait to take over
+        self.lease = JobLease(JOB_DAILY_SCHEDULE)
+        self._started_ts = time.time()
+        self._loaded_ts = 0.0
+        # changed_ts of the newest change picked up, and when the leader last looked
+        self._changes_seen_ts = 0.0
+        self._polled_ts = 0.0
+        self.sent = 0
+        self.already_queued = 0
+        self.caught_up = 0
+        self.missed = 0
+        self.format_failed = 0
+    
+    def spread_offset(self, user_id):
+        """Seconds after the chosen time the user fires, fixed per user so restarts do not move it"""
+        return (user_id * 2654435761) % 2 ** 32 / 2 ** 32 * self.spread_seconds
+    
+    def next_fire(self, user_id, notification_time, timezone, last_sent_date, now=None):
+        """(fire_ts, local_day, window) of the user's next send, window is one of the WINDOW_* values"""
+        now = now or time.time()
+        zone = user_zone(timezone)
+        clock = notification_clock(notification_time)
+        offset = self.spread_offset(user_id)
+        today = datetime.fromtimestamp(now, zone).date()
+        tomorrow = today + timedelta(days=1)
+        
+        def fire_on(day):
+            return datetime.combine(day, clock, tzinfo=zone).timestamp() + offset
+        
+        if last_sent_date and last_sent_date >= today.isoformat():
+            next_day = date.fromisoformat(last_sent_date) + timedelta(days=1)
+            return fire_on(next_day), next_day, WINDOW_ON_TIME
+        fire_ts = fire_on(today)
+        if fire_ts < now - self.catchup_seconds:
+            # Too late to be useful, wait for tomorrow's window
+            return fire_on(tomorrow), tomorrow, WINDOW_MISSED
+        if fire_ts < self._started_ts:
+            return self._started_ts + offset, today, WINDOW_CATCH_UP
+        return fire_ts, today, WINDOW_ON_TIME
+    
+    def _push(self, user_id, fire_ts, day):
+        self._fire_at[user_id] = fire_ts
+        heapq.heappush(self._heap, (fire_ts, user_id, day))
+    
+    def load(self, now=None):
+        """Rebuild the heap from the opted-in users and their saved state"""
+        now = now or time.time()
+        conn = get_db_connection()
+        try:
+            changes_seen_ts = conn.execute('SELECT MAX(changed_ts) AS ts FROM daily_schedule_state').fetchone()['ts']
+            users = conn.execute(
+                '''SELECT u.id, u.notification_time, u.timezone, s.last_sent_date
+                   FROM users u LEFT JOIN daily_schedule_state s ON s.user_id = u.id
+                   WHERE u.daily_checkins = 1'''
+            ).fetchall()
+        finally:
+            conn.close()
+        
+        heap, fire_at = [], {}
+        windows = {WINDOW_ON_TIME: 0, WINDOW_CATCH_UP: 0, WINDOW_MISSED: 0}
+        for user in users:
+            fire_ts, day, window = self.next_fire(
+                user['id'], user['notification_time'], user['timezone'], user['last_sent_date'], now
+            )
+            heap.append((fire_ts, user['id'], day))
+            fire_at[user['id']] = fire_ts
+            windows[window] += 1
+        heapq.heapify(heap)
+        
+        with self._lock:
+            first_load = not self._loaded_ts
+            self._heap, self._fire_at = heap, fire_at
+            self._loaded_ts = self._polled_ts = now
+            self._changes_seen_ts = changes_seen_ts or 0.0
+            if first_load:
+                self.caught_up += windows[WINDOW_CATCH_UP]
+                self.missed += windows[WINDOW_MISSED]
+        self._wakeup.set()
+        
+        if first_load and (windows[WINDOW_CATCH_UP] or windows[WINDOW_MISSED]):
+            print(f"Daily schedules: catching up {windows[WINDOW_CATCH_UP]} users, "
+                  f"{windows[WINDOW_MISSED]} missed today's window by more than the catch-up limit")
+    
+    def reschedule(self, conn, user_id):
+        """Save one user's next send after their preferences changed, in conn's open transaction.
+
+        Any process may call this, the leader picks the change up on its next poll. Call
+        wake() after the commit so a leader in this process picks it up at once.
+        """
+        now = time.time()
+        user = conn.execute(
+            '''SELECT u.daily_checkins, u.notification_time, u.timezone, s.last_sent_date
+               FROM users u LEFT JOIN daily_schedule_state s ON s.user_id = u.id
+               WHERE u.id = ?''',
+            (user_id,)
+        ).fetchone()
+        if user is None:
+            return
+        
+        next_fire_ts = None
+        if user['daily_checkins']:
+            next_fire_ts, _, _ = self.next_fire(user_id, user['notification_time'], user['timezone'], user['last_sent_date'], now)
+        conn.execute(
+            '''INSERT INTO daily_schedule_state (user_id, next_fire_ts, changed_ts) VALUES (?, ?, ?)
+               ON CONFLICT(user_id) DO UPDATE SET next_fire_ts = excluded.next_fire_ts, changed_ts = excluded.changed_ts''',
+            (user_id, next_fire_ts, now)
+        )
+    
+    def wake(self):
+        """Tell the timer thread committed changes are waiting"""
+        self._wakeup.set()
+    
+    def poll_changes(self, now=None):
+        """Re-plan the users whose preferences changed since the last poll, returns how many"""
+        now = now or time.time()
+        conn = get_db_connection()
+        try:
+            # Changes are stamped by other processes' clocks, so look back a little for skew
+            users = conn.execute(
+                '''SELECT s.user_id, s.changed_ts, u.daily_checkins, u.notification_time, u.timezone, s.last_sent_date
+                   FROM daily_schedule_state s JOIN users u ON u.id = s.user_id
+                   WHERE s.changed_ts > ?''',
+                (self._changes_seen_ts - CHANGE_SKEW_SECONDS,)
+            ).fetchall()
+        finally:
+            conn.close()
+        
+        with self._lock:
+            self._polled_ts = now
+            for user in users:
+                self._changes_seen_ts = max(self._changes_seen_ts, user['changed_ts'])
+                if not user['daily_checkins']:
+                    self._fire_at.pop(user['user_id'], None)
+                    continue
+                fire_ts, day, _ = self.next_fire(
+                    user['user_id'], user['notification_time'], user['timezone'], user['last_sent_date'], now
+                )
+                if self._fire_at.get(user['user_id']) != fire_ts:
+                    self._push(user['user_id'], fire_ts, day)
+        return len(users)
+    
+    def _pop_due(self, now):
+        """Up to batch_size live entries that are due, earliest first"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                fire_ts, user_id, day = heapq.heappop(self._heap)
+                if self._fire_at.get(user_id) == fire_ts:
+                    del self._fire_at[user_id]
+                    due.append((user_id, day))
+        return due
+    
+    def run_due(self, now=None):
+        """Queue the schedule of every user who is due, returns how many were queued"""
+        now = now or time.time()
+        queued = 0
+        while True:
+            due = self._pop_due(now)
+            if not due:
+                return queued
+            by_day = {}
+            for user_id, day in due:
+                by_day.setdefault(day, []).append(user_id)
+            for day, user_ids in by_day.items():
+                queued += self._send_day(day, user_ids)
+    
+    def _send_day(self, day, user_ids):
+        """Queue day's schedule for user_ids and record it in one transaction, then schedule their next send"""
+        day_start, day_end = local_day_bounds(day)
+        queued = already_queued = 0
+        sent = []
+        failed = []
+        conn = get_db_connection()
+        try:
+            rows = conn.execute(
+                DUE_SCHEDULES_SQL.format(ids=','.join('?' * len(user_ids))),
+                (day_start, day_end, *user_ids)
+            ).fetchall()
+            for user_id, user_rows in groupby(rows, key=lambda row: row['user_id']):
+                user_rows = list(user_rows)
+                user = user_rows[0]
+                fire_ts, next_day, _ = self.next_fire(user_id, user['notification_time'], user['timezone'], day.isoformat())
+                try:
+                    if enqueue_schedule(conn, user_id, user_rows, day):
+                        queued += 1
+                    else:
+                        already_queued += 1
+                except Exception as e:
+                    # The same rows would fail again, so the day is skipped and the user moves on to the next one
+                    print(f"Error formatting schedule for user {user_id}, skipping {day}: {e}")
+                    failed.append((user_id, fire_ts, next_day))
+                    continue
+                sent.append((user_id, fire_ts, next_day))
             
-            print(f"Daily schedule sent to {user['username']}")
-            
+            conn.executemany(
+                '''INSERT INTO daily_schedule_state (user_id, last_sent_date, next_fire_ts, sent_ts) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(user_id) DO UPDATE SET last_sent_date = excluded.last_sent_date,
+                   next_fire_ts = excluded.next_fire_ts, sent_ts = excluded.sent_ts''',
+                [(user_id, day.isoformat(), fire_ts, time.time()) for user_id, fire_ts, _ in sent]
+            )
+            conn.executemany(
+                '''INSERT INTO daily_schedule_state (user_id, last_sent_date, next_fire_ts, failed_date) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(user_id) DO UPDATE SET last_sent_date = excluded.last_sent_date,
+                   next_fire_ts = excluded.next_fire_ts, failed_date = excluded.failed_date''',
+                [(user_id, day.isoformat(), fire_ts, day.isoformat()) for user_id, fire_ts, _ in failed]
+            )
+            conn.commit()
         except Exception as e:
-            print(f"Error sending schedule to {user['username']}: {e}")
-
-def schedule_daily_sender():
-    """Run daily schedule sender at 8 AM every day"""
-    while True:
-        now = datetime.now()
+            conn.rollback()
+            print(f"Error queueing daily schedules for {day}: {e}")
+            # Retry the batch in a minute rather than dropping it for the day
+            with self._lock:
+                for user_id in user_ids:
+                    self._fire_at.setdefault(user_id, time.time() + 60)
+                    heapq.heappush(self._heap, (self._fire_at[user_id], user_id, day))
+            return 0
+        finally:
+            conn.close()
         
-        # Check if it's 8 AM
-        if now.hour == 8 and now.minute == 0:
-            print("Sending daily schedules...")
-            send_daily_schedules()
+        if queued:
+            notification_outbox.wake()
+        
+        # Users who turned daily check-ins off since the heap was built are not in rows and drop out here
+        with self._lock:
+            self.sent += queued
+            self.already_queued += already_queued
+            self.format_failed += len(failed)
+            for user_id, fire_ts, next_day in sent + failed:
+                if user_id not in self._fire_at:
+                    self._push(user_id, fire_ts, next_day)
+        return queued
+    
+    def _run(self):
+        leading = False
+        while True:
+            try:
+                if not self.lease.is_leader():
+                    if leading:
+                        print("Daily schedules: another process took over the timer")
+                        leading = False
+                    self.lease.wait_until_leader()
+                    continue
+                
+                if not leading:
+                    leading = True
+                    # Another process may have sent schedules while this one followed, so
+                    # reload from saved state and catch up from the moment of taking over
+                    self._started_ts = time.time()
+                    self._loaded_ts = 0.0
+                    
+                    # A manual send-everyone run a restart interrupted is finished first
+                    today = datetime.now().date()
+                    if has_unfinished_run(JOB_DAILY_SCHEDULE, today):
+                        print("Resuming the interrupted daily schedule run...")
+                        send_daily_schedules(today)
+                
+                self._wakeup.clear()
+                if time.time() - self._loaded_ts >= self.refresh_seconds:
+                    self.load()
+                else:
+                    self.poll_changes()
+                self.run_due()
+            except Exception as e:
+                print(f"Error sending daily schedules: {e}")
             
-            # Wait 60 seconds to avoid sending multiple times
-            time.sleep(60)
-        else:
-            # Check every minute
-            time.sleep(60)
+            with self._lock:
+                next_fire_ts = self._heap[0][0] if self._heap else float('inf')
+            wait = min(next_fire_ts, self._loaded_ts + self.refresh_seconds, self._polled_ts + self.poll_seconds) - time.time()
+            self._wakeup.wait(max(1.0, wait))
+    
+    def start(self):
+        """Start the timer thread, safe to call more than once.
+        
+        Every process may start it, only the holder of the daily_schedule lease sends.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.lease.start()
+            self._thread = threading.Thread(target=self._run, name='daily-schedule', daemon=True)
+            self._thread.start()
+    
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            upcoming = sorted(self._fire_at.values())
+            return {
+                'leader': self.lease.is_leader(),
+                'scheduled_users': len(upcoming),
+                'next_fire_ts': round(upcoming[0], 1) if upcoming else None,
+                'due_next_hour': sum(1 for fire_ts in upcoming if fire_ts < now + 3600),
+                'sent': self.sent,
+                'already_queued': self.already_queued,
+                'caught_up': self.caught_up,
+                'missed': self.missed,
+                'format_failed': self.format_failed,
+                'spread_minutes': self.spread_seconds / 60,
+                'catchup_hours': self.catchup_seconds / 3600
+            }
 
 def start_daily_scheduler():
-    """Start the daily scheduler in a background thread"""
-    scheduler_thread = threading.Thread(target=schedule_daily_sender, daemon=True)
-    scheduler_thread.start()
-    print("Daily scheduler started - will send schedules at 8 AM daily")
+    """Start the per-user daily schedule timer in a background thread"""
+    daily_schedule_timer.start()
+    print("Daily scheduler started - will send schedules at each user's notification time")
 
 # Manual trigger for testing
 def send_schedule_now(user_id):
@@ -139,18 +586,21 @@ def send_schedule_now(user_id):
         events = get_daily_schedule(user_id)
         schedule_message = format_schedule_message(events, datetime.now().date())
         
-        notification_system.send_notification(
-            user_id,
-            "Daily Schedule",
-            schedule_message,
-            f"Your Schedule for {datetime.now().strftime('%B %d, %Y')}"
-        )
+        notification_outbox.send(KIND_NOTIFICATION, {
+            'user_id': user_id,
+            'notification_type': "Daily Schedule",
+            'message': schedule_message,
+            'subject': f"Your Schedule for {datetime.now().strftime('%B %d, %Y')}"
+        })
         
         return True
     except Exception as e:
         print(f"Error sending manual schedule: {e}")
         return False
 
+# Global daily schedule timer instance
+daily_schedule_timer = DailyScheduleTimer()
+
 if __name__ == "__main__":
     # Test the scheduler
     print("Testing daily schedule sender...")
@@ -0,0 +1,156 @@
+"""
+Database Connection Pool for HavenMind
+Hands out one pooled SQLite connection per request and lets background threads borrow from the same pool
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'havenmind.db')
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to the pool instead of closing it"""
+
+    def close(self):
+        pool = getattr(self, '_pool', None)
+        if pool is None:
+            return super().close()
+
+        if getattr(self, '_request_bound', False):
+            # The request owns this connection until teardown, helpers that close it
+            # mid-request must not end a transaction their caller still has open.
+            return None
+
+        pool.release(self)
+
+    def really_close(self):
+        super().close()
+
+
+class ConnectionPool:
+    def __init__(self, database=DATABASE_PATH, max_size=None, busy_timeout_ms=None,
+                 cache_size_kb=None, mmap_size=None):
+        self.database = database
+        self.max_size = max_size or int(os.getenv('DB_POOL_SIZE', '16'))
+        self.busy_timeout_ms = busy_timeout_ms or int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+        # Negative cache_size is KiB per connection, see https://sqlite.org/pragma.html#pragma_cache_size
+        self.cache_size_kb = cache_size_kb or int(os.getenv('DB_CACHE_SIZE_KB', '8192'))
+        self.mmap_size = mmap_size if mmap_size is not None else int(os.getenv('DB_MMAP_SIZE', str(64 * 1024 * 1024)))
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            factory=PooledConnection
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA cache_size = {-int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn._pool = self
+        conn._request_bound = False
+        return conn
+
+    def acquire(self):
+        """Borrow a connection, reusing an idle one when available"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self._created += 1
+            conn = self._connect()
+        conn._request_bound = False
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any uncommitted work"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        conn._request_bound = False
+        if self._idle.qsize() < self.max_size:
+            self._idle.put(conn)
+        else:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.really_close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with-block (for background threads)"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        return {
+            'open_connections': self._created,
+            'idle_connections': self._idle.qsize(),
+            'max_idle': self.max_size
+        }
+
+
+# Global connection pool instance
+db_pool = ConnectionPool()
+
+
+def get_db_connection():
+    """Return the current request's connection, or a pooled one outside of a request.
+
+    Inside an app context every caller shares one connection which is returned to the
+    pool on teardown. Outside of it (scheduler, CLI scripts) the caller gets its own
+    pooled connection and close() hands it back.
+    """
+    if has_app_context():
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = db_pool.acquire()
+            conn._request_bound = True
+            g._db_conn = conn
+        return conn
+    return db_pool.acquire()
+
+
+def close_db_connection(exception=None):
+    """Teardown handler returning the request's connection to the pool"""
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+
+def init_app(app):
+    app.teardown_appcontext(close_db_connection)
@@ -0,0 +1,139 @@
+"""
+Hot Path Indexes for HavenMind
+Verifies with EXPLAIN QUERY PLAN that the indexes created by the migrations serve the app's hot queries
+"""
+
+import sys
+
+# (label, query, sample parameters) for the hot queries the migrations' indexes must serve
+HOT_QUERIES = [
+    ('journal: recent entries',
+     'SELECT * FROM journal_entries WHERE user_id = ? ORDER BY created_at DESC LIMIT 3', (1,)),
+    ('journal: weekly mood',
+     'SELECT AVG(sentiment_score) as avg_mood FROM journal_entries WHERE user_id = ? AND created_ts >= ?', (1, 0)),
+    ('journal: emotion distribution',
+     'SELECT emotion_tags, COUNT(*) as count FROM journal_entries WHERE user_id = ? GROUP BY emotion_tags', (1,)),
+    ('journal: analytics timeline',
+     'SELECT date(created_at) as date, AVG(sentiment_score) as avg_mood FROM journal_entries WHERE user_id = ? GROUP BY date(created_at) ORDER BY date DESC LIMIT 30', (1,)),
+    ('admin: recent crisis entries',
+     'SELECT COUNT(*) as count FROM journal_entries WHERE sentiment_score < 0.3 AND created_ts >= ?', (0,)),
+    ('admin: students by role',
+     'SELECT * FROM users WHERE role = "student" ORDER BY created_at DESC', ()),
+    ('calendar: all events',
+     'SELECT * FROM calendar_events WHERE user_id = ? ORDER BY event_ts', (1,)),
+    ('calendar: current month',
+     'SELECT * FROM calendar_events WHERE user_id = ? AND event_ts >= ? AND event_ts < ? ORDER BY event_ts', (1, 0, 0)),
+    ('calendar: upcoming week',
+     'SELECT * FROM calendar_events WHERE user_id = ? AND event_ts >= ? AND event_ts <= ? ORDER BY event_ts', (1, 0, 0)),
+    ('daily schedule',
+     'SELECT * FROM calendar_events WHERE user_id = ? AND event_ts >= ? AND event_ts < ? ORDER BY event_ts', (1, 0, 0)),
+    ('peer queue',
+     '''SELECT sr.*, u.username
+        FROM support_requests sr
+        JOIN users u ON sr.user_id = u.id
+        WHERE sr.status = "waiting" AND sr.peer_id IS NULL
+        ORDER BY
+        CASE sr.priority
+            WHEN "urgent" THEN 1
+            WHEN "high" THEN 2
+            WHEN "medium" THEN 3
+            ELSE 4
+        END, sr.created_at ASC''', ()),
+    ('peer active chats',
+     '''SELECT sr.*, u.username
+        FROM support_requests sr
+        JOIN users u ON sr.user_id = u.id
+        WHERE sr.status = "active" AND sr.peer_id = ?
+        ORDER BY sr.created_at DESC''', (1,)),
+    ('professional escalated cases',
+     '''SELECT sr.*, u.username, u.email, u.created_at as user_created,
+               COUNT(je.id) as journal_count,
+               AVG(je.sentiment_score) as avg_mood
+        FROM support_requests sr
+        JOIN users u ON sr.user_id = u.id
+        LEFT JOIN journal_entries je ON u.id = je.user_id
+        WHERE sr.status IN ("escalated", "professional", "professional_booking")
+        AND (sr.professional_id IS NULL OR sr.professional_id = ?)
+        GROUP BY sr.id, u.id
+        ORDER BY sr.created_at DESC''', (1,)),
+    ('student current request',
+     'SELECT id, status FROM support_requests WHERE user_id = ? AND status IN ("waiting", "active", "escalated", "professional", "professional_booking") ORDER BY created_at DESC LIMIT 1', (1,)),
+    ('student-messages / chat history',
+     '''SELECT cm.id, cm.message, cm.created_at, u.username, u.role
+        FROM chat_messages cm
+        JOIN users u ON cm.sender_id = u.id
+        WHERE cm.request_id = ? AND cm.id > ?
+        ORDER BY cm.id''', (1, 0)),
+    ('chat poll version',
+     '''SELECT sr.status, sr.created_ts, cm.id AS last_id, cm.created_ts AS last_ts
+        FROM support_requests sr
+        LEFT JOIN chat_messages cm ON cm.id = (SELECT MAX(id) FROM chat_messages WHERE request_id = sr.id)
+        WHERE sr.id = ?''', (1,)),
+    ('session notes',
+     '''SELECT sn.*, u.username
+        FROM session_notes sn
+        JOIN users u ON sn.professional_id = u.id
+        WHERE sn.case_id = ?
+        ORDER BY sn.created_at DESC''', (1,)),
+    ('institution students',
+     'SELECT id, username, created_at, university FROM users WHERE university = ? AND role = "student"', ('U',)),
+    ('institution departments',
+     'SELECT DISTINCT major FROM users WHERE university = ? AND role = "student" AND major IS NOT NULL', ('U',)),
+    ('institution department students',
+     'SELECT id FROM users WHERE university = ? AND role = "student" AND major = ?', ('U', 'CS')),
+    ('institution crisis count',
+     '''SELECT COUNT(DISTINCT u.id) as count
+        FROM journal_entries je
+        JOIN users u ON je.user_id = u.id
+        WHERE u.university = ? AND u.role = "student"
+        AND je.sentiment_score < 0.3
+        AND je.created_ts >= ?''', ('U', 0)),
+    ('institution stress distribution',
+     '''SELECT ce.stress_level, COUNT(*) as count
+        FROM calendar_events ce
+        JOIN users u ON ce.user_id = u.id
+        WHERE u.university = ? AND u.role = "student" AND ce.event_ts >= ?
+        GROUP BY ce.stress_level''', ('U', 0)),
+    ('department support requests',
+     'SELECT COUNT(*) as count FROM support_requests WHERE user_id IN (?, ?) AND created_ts >= ?', (1, 2, 0)),
+    ('journal analysis recovery',
+     '''SELECT id, user_id, content, sentiment_score, emotion_tags FROM journal_entries
+        WHERE analysis_status = 'pending' AND created_ts < ?
+        ORDER BY created_ts LIMIT ?''', (0, 500)),
+]
+
+
+def find_full_table_scans(conn, queries=HOT_QUERIES):
+    """Return (label, plan detail) for every query whose plan still scans a whole table"""
+    offenders = []
+    for label, query, params in queries:
+        plan = conn.execute(f'EXPLAIN QUERY PLAN {query}', params).fetchall()
+        for row in plan:
+            detail = row[3]
+            # "SCAN t USING INDEX ..." walks an index; a bare "SCAN t" reads every row
+            if detail.startswith('SCAN ') and ' USING ' not in detail:
+                offenders.append((label, detail))
+    return offenders
+
+
+def verify_query_plans(conn, queries=HOT_QUERIES):
+    """Print the plan check and return True when no hot query needs a full table scan"""
+    offenders = find_full_table_scans(conn, queries)
+    if not offenders:
+        print(f'All {len(queries)} hot queries are served by an index')
+        return True
+
+    for label, detail in offenders:
+        print(f'Full table scan in "{label}": {detail}')
+    return False
+
+
+if __name__ == '__main__':
+    from db import db_pool
+    from migrator import apply_migrations
+
+    with db_pool.connection() as conn:
+        apply_migrations(conn)
+        ok = verify_query_plans(conn)
+
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,166 @@
+"""
+Latency-Budgeted AI Responses for HavenMind
+Races each route's LLM call against its latency budget, answers locally on a miss and keeps the late LLM result for later views
+"""
+
+import json
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from db import get_db_connection
+from leases import run_as_leader
+
+# Per-route budgets in milliseconds, overridable with AI_BUDGET_<ROUTE>_MS
+DEFAULT_BUDGETS_MS = {
+    'chat': 2500,
+    'peer_assist': 3000
+}
+
+LATE_PENDING = 'pending'
+LATE_READY = 'ready'
+LATE_UNAVAILABLE = 'unavailable'
+
+JOB_LATE_RESULTS_PURGE = 'ai_late_results_purge'
+
+
+def budget_seconds(route):
+    return float(os.getenv(f'AI_BUDGET_{route.upper()}_MS', DEFAULT_BUDGETS_MS[route])) / 1000.0
+
+
+def remaining_budget(route, started):
+    """Seconds left of route's budget for a request that started at time.monotonic() == started"""
+    return max(0.0, started + budget_seconds(route) - time.monotonic())
+
+
+class LateResultStore:
+    """LLM answers that missed their budget, kept in ai_late_results so a poll reaching any worker finds them"""
+
+    def __init__(self, ttl_seconds=None):
+        self.ttl_seconds = ttl_seconds or float(os.getenv('AI_LATE_RESULTS_TTL', '300'))
+        self._purge = None
+
+    def reserve(self, route, user_id):
+        token = secrets.token_urlsafe(12)
+        now = time.time()
+        conn = get_db_connection()
+        try:
+            conn.execute(
+                '''INSERT INTO ai_late_results (token, user_id, route, status, created_ts, expires_ts)
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                (token, user_id, route, LATE_PENDING, now, now + self.ttl_seconds)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return token
+
+    def resolve(self, token, status, response=None):
+        conn = get_db_connection()
+        try:
+            conn.execute(
+                'UPDATE ai_late_results SET status = ?, response = ? WHERE token = ?',
+                (status, json.dumps(response) if response is not None else None, token)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, token, user_id):
+        """{'status', 'response'} for token if it belongs to user_id and has not expired, else None"""
+        conn = get_db_connection()
+        try:
+            row = conn.execute(
+                'SELECT status, response FROM ai_late_results WHERE token = ? AND user_id = ? AND expires_ts > ?',
+                (token, user_id, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {'status': row['status'], 'response': json.loads(row['response']) if row['response'] else None}
+
+    def purge_expired(self):
+        conn = get_db_connection()
+        try:
+            conn.execute('DELETE FROM ai_late_results WHERE expires_ts < ?', (time.time(),))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def start(self):
+        """Purge expired results hourly, in whichever process holds the purge lease"""
+        if self._purge is None:
+            self._purge = run_as_leader(JOB_LATE_RESULTS_PURGE, self.purge_expired, 3600)
+
+
+class AIHedge:
+    def __init__(self, max_workers=None):
+        # Callers stop waiting at their budget while the LLM call carries on here
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv('AI_HEDGE_WORKERS', '16')),
+            thread_name_prefix='ai-hedge'
+        )
+        self.late_results = LateResultStore()
+        self.answered = {route: 0 for route in DEFAULT_BUDGETS_MS}
+        self.fell_back = {route: 0 for route in DEFAULT_BUDGETS_MS}
+        self.missed_budget = {route: 0 for route in DEFAULT_BUDGETS_MS}
+
+    def run(self, route, call, fallback, user_id=None):
+        """Return (response, late_id) for the first of call() within route's budget or fallback().
+
+        fallback() is computed while call() is in flight. If call() raises, the fallback is
+        returned at once. If it is still running when the budget runs out, the fallback is
+        returned with a late_id that late_results.get() resolves once call() finishes.
+        """
+        started = time.monotonic()
+        future = self._executor.submit(call)
+        local = fallback()
+
+        try:
+            response = future.result(timeout=remaining_budget(route, started))
+            self.answered[route] += 1
+            return response, None
+        except FutureTimeout:
+            pass
+        except Exception as e:
+            print(f"AI {route} call failed, answering locally: {e}")
+            self.fell_back[route] += 1
+            return local, None
+
+        self.missed_budget[route] += 1
+        try:
+            late_id = self.late_results.reserve(route, user_id)
+        except Exception as e:
+            print(f"AI {route} late result not kept: {e}")
+            return local, None
+
+        def store_late(done):
+            try:
+                status, response = LATE_READY, done.result()
+            except Exception as e:
+                print(f"AI {route} late call failed: {e}")
+                status, response = LATE_UNAVAILABLE, None
+            try:
+                self.late_results.resolve(late_id, status, response)
+            except Exception as e:
+                print(f"AI {route} late result not saved: {e}")
+
+        future.add_done_callback(store_late)
+        return local, late_id
+
+    def stats(self):
+        return {
+            route: {
+                'budget_ms': int(budget_seconds(route) * 1000),
+                'answered': self.answered[route],
+                'fell_back': self.fell_back[route],
+                'missed_budget': self.missed_budget[route]
+            }
+            for route in DEFAULT_BUDGETS_MS
+        }
+
+
+# Global AI hedge instance
+ai_hedge = AIHedge()
@@ -0,0 +1,168 @@
+"""
+Journal Analysis Pipeline for HavenMind
+Runs the slow LLM enrichment of journal entries on a background worker pool and writes the result back to the row
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from crisis_screening import SEVERITY_CRISIS
+from db import get_db_connection
+from leases import run_as_leader
+from llm_scheduler import LANE_CRISIS, LANE_JOURNAL
+
+STATUS_PENDING = 'pending'
+STATUS_COMPLETE = 'complete'
+STATUS_FAILED = 'failed'
+
+JOB_JOURNAL_RECOVERY = 'journal_analysis_recovery'
+
+# Entries left pending by a process that stopped before analysing them, oldest first
+STALE_PENDING_SQL = '''
+    SELECT id, user_id, content, sentiment_score, emotion_tags FROM journal_entries
+    WHERE analysis_status = 'pending' AND created_ts < ?
+    ORDER BY created_ts LIMIT ?
+'''
+
+
+class JournalAnalysisPipeline:
+    def __init__(self, analyze, fallback_respond, on_complete=None, screen=None, max_workers=None,
+                 stale_seconds=None):
+        """
+        analyze(content, user_id, lane) -> (sentiment_score, emotion_tags, ai_response) from one LLM call,
+        raises when the LLM is unavailable or its reply does not validate
+        fallback_respond(content, emotion_tags, sentiment_score) -> local response used instead
+        on_complete(entry) is called with the final values once the row is updated
+        screen(content) -> the local crisis screen's severity, for entries recovered after a restart
+        """
+        self.analyze = analyze
+        self.fallback_respond = fallback_respond
+        self.on_complete = on_complete
+        self.screen = screen
+        self.max_workers = max_workers or int(os.getenv('JOURNAL_ANALYSIS_WORKERS', '4'))
+        # An entry pending this long is taken to have been lost by the process that saved it
+        self.stale_seconds = stale_seconds or float(os.getenv('JOURNAL_ANALYSIS_STALE_SECONDS', '300'))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='journal-analysis')
+        self._lock = threading.Lock()
+        self._queued = set()
+        self._recovery = None
+        self.recovered = 0
+        self.write_failures = 0
+
+    def submit(self, entry_id, user_id, content, sentiment_score, emotion_tags, screened_severity):
+        """Queue LLM enrichment for an entry already stored with a provisional local analysis.
+
+        Entries the crisis screen flagged as a crisis use the scheduler's crisis lane.
+        """
+        with self._lock:
+            self._queued.add(entry_id)
+        return self._executor.submit(self._run, {
+            'id': entry_id,
+            'user_id': user_id,
+            'content': content,
+            'sentiment_score': sentiment_score,
+            'emotion_tags': emotion_tags,
+            'provisional_score': sentiment_score,
+            'provisional_emotion': emotion_tags,
+            'screened_severity': screened_severity,
+            'lane': LANE_CRISIS if screened_severity == SEVERITY_CRISIS else LANE_JOURNAL
+        })
+
+    def _run(self, entry):
+        try:
+            return self._analyze_and_save(entry)
+        finally:
+            with self._lock:
+                self._queued.discard(entry['id'])
+
+    def _analyze_and_save(self, entry):
+        status = STATUS_COMPLETE
+        try:
+            entry['sentiment_score'], entry['emotion_tags'], entry['ai_response'] = self.analyze(entry['content'], entry['user_id'], entry['lane'])
+        except Exception as e:
+            # Keep the provisional local sentiment and answer locally
+            print(f"Journal analysis failed for entry {entry['id']}: {e}")
+            status = STATUS_FAILED
+            entry['ai_response'] = self.fallback_respond(entry['content'], entry['emotion_tags'], entry['sentiment_score'])
+
+        entry['analysis_status'] = status
+        try:
+            self._save(entry, (entry['sentiment_score'], entry['emotion_tags'], entry['ai_response'], status))
+        except Exception as e:
+            # Mark it failed so the page stops waiting, the provisional analysis stays
+            print(f"Journal analysis for entry {entry['id']} could not be saved: {e}")
+            with self._lock:
+                self.write_failures += 1
+            entry['analysis_status'] = STATUS_FAILED
+            try:
+                self._save(entry, (entry['provisional_score'], entry['provisional_emotion'],
+                                   self.fallback_respond(entry['content'], entry['provisional_emotion'], entry['provisional_score']),
+                                   STATUS_FAILED))
+            except Exception as e:
+                # Still pending, recover_pending() retries it once it is stale
+                print(f"Journal entry {entry['id']} could not be marked failed: {e}")
+
+        if self.on_complete:
+            try:
+                self.on_complete(entry)
+            except Exception as e:
+                print(f"Journal analysis callback error for entry {entry['id']}: {e}")
+        return entry
+
+    @staticmethod
+    def _save(entry, values):
+        conn = get_db_connection()
+        try:
+            conn.execute(
+                '''UPDATE journal_entries SET sentiment_score = ?, emotion_tags = ?, ai_response = ?, analysis_status = ?
+                   WHERE id = ?''',
+                (*values, entry['id'])
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def recover_pending(self, limit=500):
+        """Re-submit entries still pending after stale_seconds, returns how many.
+
+        Their analysis was lost with the process that saved them, e.g. on a restart or a
+        recycled worker. Entries already queued in this process are left alone.
+        """
+        conn = get_db_connection()
+        try:
+            rows = conn.execute(STALE_PENDING_SQL, (time.time() - self.stale_seconds, limit)).fetchall()
+        finally:
+            conn.close()
+
+        with self._lock:
+            rows = [row for row in rows if row['id'] not in self._queued]
+        for row in rows:
+            severity = self.screen(row['content']) if self.screen else None
+            self.submit(row['id'], row['user_id'], row['content'], row['sentiment_score'], row['emotion_tags'], severity)
+        if rows:
+            print(f"Recovering the analysis of {len(rows)} pending journal entries")
+            with self._lock:
+                self.recovered += len(rows)
+        return len(rows)
+
+    def start(self):
+        """Re-submit stale pending entries now and every stale_seconds, in whichever process holds the recovery lease"""
+        with self._lock:
+            if self._recovery is not None:
+                return
+            self._recovery = run_as_leader(JOB_JOURNAL_RECOVERY, self.recover_pending, self.stale_seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': len(self._queued),
+                'recovered': self.recovered,
+                'write_failures': self.write_failures
+            }
+
+    def shutdown(self, wait=True):
+        if self._recovery is not None:
+            self._recovery.stop()
+        self._executor.shutdown(wait=wait)
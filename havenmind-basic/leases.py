@@ -0,0 +1,215 @@
+"""
+Job Leases for HavenMind
+Elects one process per background job through a heartbeated row in job_leases, so extra web workers and hosts do not repeat scheduled work
+"""
+
+import atexit
+import os
+import socket
+import threading
+import time
+import uuid
+
+from db import get_db_connection
+
+# Takes the lease when nobody holds it, renews it for its holder, or takes it over once it expired
+ACQUIRE_SQL = '''
+    INSERT INTO job_leases (job, holder, term, acquired_ts, heartbeat_ts, expires_ts)
+    VALUES (?, ?, 1, ?, ?, ?)
+    ON CONFLICT(job) DO UPDATE SET
+        term = CASE WHEN holder = excluded.holder THEN term ELSE term + 1 END,
+        acquired_ts = CASE WHEN holder = excluded.holder THEN acquired_ts ELSE excluded.acquired_ts END,
+        holder = excluded.holder,
+        heartbeat_ts = excluded.heartbeat_ts,
+        expires_ts = excluded.expires_ts
+    WHERE holder = excluded.holder OR expires_ts < excluded.heartbeat_ts
+'''
+
+
+class JobLease:
+    def __init__(self, job, ttl_seconds=None):
+        """A lease on job for this process. The holder renews it every third of ttl_seconds,
+        when it stops (crash, hang, lost host) another process takes over after ttl_seconds"""
+        self.job = job
+        self.ttl_seconds = ttl_seconds or float(os.getenv('JOB_LEASE_TTL_SECONDS', '30'))
+        self.heartbeat_seconds = self.ttl_seconds / 3
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.term = None
+
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._leading = threading.Event()
+        self._thread = None
+        # Monotonic deadline of the last renewal, one heartbeat short of the stored expiry
+        # so clock skew between hosts cannot give two holders at once
+        self._valid_until = 0.0
+        self.acquired = 0
+        self.lost = 0
+
+    def try_acquire(self):
+        """Take or renew the lease, returns True while this process is the job's leader"""
+        if self._stopping.is_set():
+            return False
+        started = time.monotonic()
+        now = time.time()
+        conn = get_db_connection()
+        try:
+            conn.execute(ACQUIRE_SQL, (self.job, self.holder, now, now, now + self.ttl_seconds))
+            row = conn.execute('SELECT holder, term FROM job_leases WHERE job = ?', (self.job,)).fetchone()
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            # Leadership lapses on its own once the last renewal runs out
+            print(f"Lease {self.job} heartbeat failed: {e}")
+            return self.is_leader()
+        finally:
+            conn.close()
+
+        leading = row['holder'] == self.holder
+        with self._lock:
+            was_leading = self._leading.is_set()
+            if leading:
+                self._valid_until = started + self.ttl_seconds - self.heartbeat_seconds
+                self.term = row['term']
+                self._leading.set()
+            else:
+                self._valid_until = 0.0
+                self._leading.clear()
+            if leading and not was_leading:
+                self.acquired += 1
+            elif was_leading and not leading:
+                self.lost += 1
+
+        if leading and not was_leading:
+            print(f"Lease {self.job}: leader is {self.holder} (term {row['term']})")
+        elif was_leading and not leading:
+            print(f"Lease {self.job}: lost to {row['holder']}")
+        return leading
+
+    def is_leader(self):
+        """True if this process renewed the lease recently enough to still own it, without a query"""
+        leading = time.monotonic() < self._valid_until
+        if not leading:
+            self._leading.clear()
+        return leading
+
+    def wait_until_leader(self, timeout=None):
+        """Block until this process leads the job or timeout passes, returns whether it leads"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._stopping.is_set():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            wait = self.heartbeat_seconds if remaining is None else min(self.heartbeat_seconds, remaining)
+            if self._leading.wait(wait) and self.is_leader():
+                return True
+        return self.is_leader()
+
+    def last_run_ts(self):
+        conn = get_db_connection()
+        try:
+            row = conn.execute('SELECT last_run_ts FROM job_leases WHERE job = ?', (self.job,)).fetchone()
+        finally:
+            conn.close()
+        return (row['last_run_ts'] or 0.0) if row else 0.0
+
+    def mark_run(self):
+        """Record a finished run on the lease row, so a new leader knows when the job last ran"""
+        conn = get_db_connection()
+        try:
+            conn.execute('UPDATE job_leases SET last_run_ts = ? WHERE job = ? AND holder = ?',
+                         (time.time(), self.job, self.holder))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def start(self):
+        """Start heartbeating in a daemon thread, safe to call more than once"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._heartbeat, name=f'lease-{self.job}', daemon=True)
+            self._thread.start()
+        _leases[self.job] = self
+        atexit.register(self.stop)
+
+    def _heartbeat(self):
+        while not self._stopping.is_set():
+            self.try_acquire()
+            self._stopping.wait(self.heartbeat_seconds)
+
+    def stop(self):
+        """Stop heartbeating and hand the lease over at once instead of letting it expire"""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        with self._lock:
+            self._valid_until = 0.0
+            self._leading.clear()
+        try:
+            conn = get_db_connection()
+            try:
+                # Expiring rather than deleting the row keeps its term and last run time
+                conn.execute('UPDATE job_leases SET expires_ts = 0 WHERE job = ? AND holder = ?', (self.job, self.holder))
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Lease {self.job} release failed: {e}")
+
+    @property
+    def stopped(self):
+        return self._stopping.is_set()
+
+
+# Leases started in this process, by job
+_leases = {}
+
+
+def run_as_leader(job, step, interval_seconds, ttl_seconds=None):
+    """Call step() about every interval_seconds, in this process only while it holds job's lease.
+
+    The last run time is kept on the lease row, so a process that takes over does not
+    run the job again until the interval since the previous leader's run has passed.
+    Returns the lease, stop() it to end the loop and hand over.
+    """
+    lease = JobLease(job, ttl_seconds)
+    lease.start()
+
+    def loop():
+        while lease.wait_until_leader():
+            try:
+                wait = lease.last_run_ts() + interval_seconds - time.time()
+                if wait <= 0:
+                    step()
+                    lease.mark_run()
+                    wait = interval_seconds
+            except Exception as e:
+                print(f"Job {job} failed: {e}")
+                wait = interval_seconds
+            # Re-check leadership at least every heartbeat while waiting for the next run
+            lease._stopping.wait(min(wait, lease.heartbeat_seconds))
+
+    threading.Thread(target=loop, name=f'job-{job}', daemon=True).start()
+    return lease
+
+
+def stats():
+    """Every job's current holder, and whether it is this process"""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute('SELECT * FROM job_leases ORDER BY job').fetchall()
+    finally:
+        conn.close()
+    now = time.time()
+    return {
+        row['job']: {
+            'holder': row['holder'],
+            'term': row['term'],
+            'held_here': row['job'] in _leases and _leases[row['job']].holder == row['holder'],
+            'expires_in_seconds': round(row['expires_ts'] - now, 1),
+            'held_for_seconds': round(now - row['acquired_ts'], 1),
+            'last_run_ts': row['last_run_ts']
+        }
+        for row in rows
+    }
@@ -0,0 +1,143 @@
+"""
+Crisis and Sentiment Lexicon for HavenMind
+Every keyword category compiled once into a single word-bounded regex so a text is scanned in one pass
+"""
+
+import re
+
+# Phrases are matched on whole words, with an optional plural 's', so 'die' no
+# longer fires on "diet" or "studied" and 'deadline' still matches "deadlines".
+CATEGORIES = {
+    # Sentiment
+    'crisis': [
+        'die', 'diee', 'dieee', 'kill myself', 'end it', 'suicide', 'hurt myself', 'no point', 'give up',
+        'cant go on', "can't go on", 'want to die', 'wanna die', 'end my life',
+        'go die', 'imma die', 'gonna die', 'so imma go die'
+    ],
+    'negative': [
+        'stressed', 'anxious', 'overwhelmed', 'tired', 'sad', 'depressed', 'worried', 'frustrated', 'angry',
+        'lonely', 'hopeless', 'exhausted', 'scared', 'afraid', 'upset', 'miss', 'dont care', "don't care",
+        'whatever', 'ded', 'dead', 'drained', 'burnt out', 'burnout', 'struggling', 'rough', 'tough', 'hard',
+        'due', 'deadline', 'not started', 'have to learn', 'so much work', "don't know", 'stuck', 'suffocating',
+        'piling up', 'screaming', 'blowing up', 'magically', 'zero progress', 'laid off', 'lost', 'leaving'
+    ],
+    'positive': [
+        'happy', 'good', 'great', 'excited', 'confident', 'grateful', 'peaceful', 'motivated', 'accomplished',
+        'loved', 'optimistic', 'energized', 'yay', 'joy', 'groove', 'getting into', 'finally', 'progress',
+        'better', 'improving', 'finished', 'completed', 'done'
+    ],
+    'sad_emoticon': [':(', ':-(', '😢', '😭', '💔'],
+    'academic_stress': [
+        'project due', 'due on', "haven't even touched", 'know nothing about', 'learn from scratch',
+        'dad issues', 'deadlines', "can't think straight"
+    ],
+
+    # Support request priority
+    'urgent_support': ['panic', 'crisis', 'emergency', 'urgent'],
+    'high_support': ['overwhelmed', 'stressed', 'anxious', 'depressed', 'help', 'struggling'],
+
+    # Contextual fallback responses
+    'academic_overwhelm': [
+        'project due', 'due on', 'deadlines', "haven't even touched", 'know nothing about', 'learn from scratch'
+    ],
+    'achievement': ['completed', 'finished', 'done', 'accomplished'],
+    'academic_task': ['assignment', 'work', 'project', 'task'],
+    'study': ['project', 'deadline', 'assignment', 'study', 'exam'],
+    'not_started': [
+        'have not started', 'not started', 'have to complete', 'due on', "don't know", 'so much work', 'have to learn'
+    ],
+    'deadline_pressure': [
+        'due on', 'project due', 'have not started', 'not started', 'have to complete', 'so much work',
+        "don't know what", 'have to learn', 'upcoming few days'
+    ],
+    'deadline_urgent': ['due on', 'project due', 'have not started', 'have to learn', "don't know what"],
+    'workload': ['lot of work', 'too much', 'overwhelmed', 'stressed'],
+    'apathy': ['dont care', "don't care", 'whatever', 'give up'],
+    'family': ['brother', 'sister', 'family'],
+    'family_trouble': ['issues', 'problems', 'stress'],
+    'departure': ['going', 'leaving', 'away'],
+    'exhaustion': ['ded', 'dead', 'exhausted', 'drained', 'burnt out', 'feel ded', 'look ded'],
+    'momentum': ['groove', 'getting into', 'finally', 'progress', 'better']
+}
+
+
+def _phrase_pattern(phrase):
+    """Regex for one phrase, word-bounded only on the sides that are word characters"""
+    pattern = re.escape(phrase)
+    if re.match(r'\w', phrase):
+        pattern = r'(?<!\w)' + pattern
+    if re.search(r'\w$', phrase):
+        pattern += r"s?(?!\w)"
+    return pattern
+
+
+def _trie_pattern(node, last_char):
+    """Regex for a character trie, longer continuations are tried before the phrase ending here"""
+    alternatives = [re.escape(char) + _trie_pattern(child, char) for char, child in sorted(node.items()) if char]
+    if '' in node:
+        alternatives.append(r"s?(?!\w)" if re.match(r'\w', last_char) else '')
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return '(?:' + '|'.join(alternatives) + ')'
+
+
+def _compile(phrases):
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    word_start, other = [], []
+    for char, child in sorted(trie.items()):
+        branch = re.escape(char) + _trie_pattern(child, char)
+        (word_start if re.match(r'\w', char) else other).append(branch)
+
+    # One lookbehind for all word-start branches keeps mid-word positions cheap, and the
+    # zero-width lookahead at every position finds overlapping matches in one scan
+    alternatives = [r'(?<!\w)(?:' + '|'.join(word_start) + ')'] + other
+    return re.compile('(?=(' + '|'.join(alternatives) + '))')
+
+
+class Lexicon:
+    def __init__(self, categories):
+        self.phrases = {}
+        for category, phrases in categories.items():
+            for phrase in phrases:
+                self.phrases.setdefault(phrase, set()).add(category)
+
+        # The trie tries longer phrases first, so at any position the regex reports only
+        # the longest phrase. Fold every phrase contained in a longer one into it so the
+        # shorter phrase's categories are still reported ('project due' -> 'project').
+        patterns = {phrase: re.compile(_phrase_pattern(phrase)) for phrase in self.phrases}
+        self._expansions = {}
+        for phrase in self.phrases:
+            contained = {other for other, pattern in patterns.items() if pattern.search(phrase)}
+            self._expansions[phrase] = [(other, self.phrases[other]) for other in contained]
+
+        self._regex = _compile(self.phrases)
+
+    def scan(self, text):
+        """Return {category: set of matched phrases} for every category present in text"""
+        hits = {}
+        if not text:
+            return hits
+
+        normalized = text.lower().replace('’', "'")
+        for match in self._regex.finditer(normalized):
+            found = match.group(1)
+            if found not in self._expansions:
+                found = found[:-1]  # plural 's'
+            for phrase, categories in self._expansions[found]:
+                for category in categories:
+                    hits.setdefault(category, set()).add(phrase)
+        return hits
+
+
+# Global lexicon instance
+lexicon = Lexicon(CATEGORIES)
+
+
+def scan_text(text):
+    return lexicon.scan(text)
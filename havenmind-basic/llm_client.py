@@ -0,0 +1,314 @@
+"""
+Shared Gemini Client for HavenMind
+One configured model per process with per-call deadlines, retries with jitter, a circuit breaker and fair-share scheduling
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from llm_scheduler import LLMScheduler, LANE_CHAT
+
+
+class LLMUnavailable(Exception):
+    """The LLM could not answer within its deadline, callers should use their local fallback"""
+
+
+class LLMThrottled(LLMUnavailable):
+    """The call was refused by the user's quota or could not get a concurrency slot in time"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets a single probe call through once reset_timeout has passed"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self.failure_threshold = failure_threshold or int(os.getenv('LLM_BREAKER_FAILURES', '5'))
+        self.reset_timeout = reset_timeout or float(os.getenv('LLM_BREAKER_RESET_SECONDS', '30'))
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """The call ended without telling us whether upstream is healthy, let the next probe through"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"LLM circuit breaker opened after {self.failures} failure(s)")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class LLMClient:
+    def __init__(self, model_name=None, timeout=None, max_retries=None, max_concurrency=None):
+        self.model_name = model_name or os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+        self.timeout = timeout or float(os.getenv('LLM_TIMEOUT_SECONDS', '8'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('LLM_MAX_RETRIES', '1'))
+        self.retry_base_delay = float(os.getenv('LLM_RETRY_BASE_SECONDS', '0.25'))
+        self.breaker = CircuitBreaker()
+
+        # Calls run on these threads so a hung upstream cannot hold the caller past its deadline.
+        # The scheduler hands out max_concurrency slots, so calls queue by priority there
+        # instead of FIFO in the executor. A call still running past its caller's deadline
+        # gives its slot back and keeps one of max_abandoned spare threads until upstream
+        # returns, once those are all taken further hung calls keep their slots.
+        max_concurrency = max_concurrency or int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+        self.max_abandoned = int(os.getenv('LLM_MAX_ABANDONED', str(max_concurrency)))
+        self.scheduler = LLMScheduler(max_concurrency=max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency + self.max_abandoned, thread_name_prefix='llm')
+        self._model = None
+        self._lock = threading.Lock()
+        self._calls_lock = threading.Lock()
+        self.abandoned_in_flight = 0
+        self.abandoned = 0
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.short_circuited = 0
+        self.throttled = 0
+
+    def _get_model(self):
+        """Configure the SDK once and reuse the model (and its transport) for every call"""
+        if self._model is not None:
+            return self._model
+
+        with self._lock:
+            if self._model is None:
+                api_key = os.getenv('GEMINI_API_KEY')
+                if not api_key:
+                    raise LLMUnavailable('GEMINI_API_KEY is not set')
+                try:
+                    import google.generativeai as genai
+                except ImportError as e:
+                    raise LLMUnavailable(f'google-generativeai is not installed: {e}')
+                genai.configure(api_key=api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt, timeout=None, lane=LANE_CHAT, user_id=None, **kwargs):
+        """Return the model's text for prompt, or raise LLMUnavailable.
+
+        lane is the llm_scheduler priority lane and user_id the user whose quota the call counts against.
+        """
+        # Missing key or SDK is a configuration problem, not an upstream failure
+        model = self._get_model()
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._admit(lane, user_id, deadline)
+
+        self.calls += 1
+        last_error = None
+        holding_slot = True
+
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not holding_slot and not self.scheduler.acquire(lane, remaining):
+                break
+
+            # The pinned SDK (0.3.x) has no per-request timeout option, the deadline is
+            # enforced here and a call that outlives it is abandoned rather than waited for
+            future, call = self._submit(model.generate_content, prompt, **kwargs)
+            holding_slot = False
+            remaining = deadline - time.monotonic()
+            try:
+                response = future.result(timeout=remaining)
+                text = response.text.strip()
+                self.breaker.record_success()
+                return text
+            except FutureTimeout:
+                if not future.cancel():
+                    self._abandon(call)
+                self.timeouts += 1
+                last_error = TimeoutError(f'no response within {timeout or self.timeout}s')
+                break
+            except Exception as e:
+                last_error = e
+
+            # Full jitter so retries from many requests do not arrive together
+            delay = random.uniform(0, self.retry_base_delay * (2 ** attempt))
+            if time.monotonic() + delay >= deadline:
+                break
+            time.sleep(delay)
+
+        if holding_slot:
+            self.scheduler.release()
+        self.failures += 1
+        self.breaker.record_failure()
+        raise LLMUnavailable(str(last_error) if last_error else 'deadline exceeded')
+
+    def stream(self, prompt, timeout=None, first_timeout=None, lane=LANE_CHAT, user_id=None, **kwargs):
+        """Yield the model's reply in chunks as they arrive, raises LLMUnavailable if it fails or stalls.
+
+        timeout bounds the wait for each chunk rather than the whole reply, so a long answer
+        that keeps flowing is not cut off. first_timeout, if given, bounds the time to the
+        first chunk instead. Nothing is retried once a chunk has been yielded.
+        """
+        model = self._get_model()
+        chunk_timeout = timeout or self.timeout
+        first_timeout = first_timeout or chunk_timeout
+        started = time.monotonic()
+        self._admit(lane, user_id, started + first_timeout)
+        self.calls += 1
+
+        chunks = queue.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for chunk in model.generate_content(prompt, stream=True, **kwargs):
+                    if stop.is_set():
+                        return
+                    if chunk.text:
+                        chunks.put(chunk.text)
+                chunks.put(None)
+            except Exception as e:
+                chunks.put(e)
+
+        future, call = self._submit(produce)
+
+        first = True
+        try:
+            while True:
+                wait = max(0.0, started + first_timeout - time.monotonic()) if first else chunk_timeout
+                try:
+                    item = chunks.get(timeout=wait)
+                except queue.Empty:
+                    self.timeouts += 1
+                    raise LLMUnavailable(f'no chunk within {first_timeout if first else chunk_timeout}s')
+                if item is None:
+                    if first:
+                        self.breaker.record_success()
+                        first = False
+                    break
+                if isinstance(item, Exception):
+                    raise LLMUnavailable(str(item))
+                if first:
+                    # Upstream answered, that is all the breaker needs to know
+                    self.breaker.record_success()
+                    first = False
+                yield item
+        except LLMUnavailable:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        finally:
+            # Also reached when the consumer goes away mid-reply, the producer only sees
+            # stop between chunks so one blocked on upstream is abandoned
+            stop.set()
+            if not future.done():
+                self._abandon(call)
+            if first:
+                self.breaker.release_probe()
+
+    def _submit(self, fn, *args, **kwargs):
+        """Run fn on the executor with the caller's slot, released when it finishes unless abandoned first"""
+        call = {'done': False, 'abandoned': False}
+
+        def finished(_):
+            with self._calls_lock:
+                call['done'] = True
+                abandoned = call['abandoned']
+                if abandoned:
+                    self.abandoned_in_flight -= 1
+            if not abandoned:
+                self.scheduler.release()
+
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(finished)
+        return future, call
+
+    def _abandon(self, call):
+        """Hand back the slot of a call its caller gave up on, unless max_abandoned calls already hang"""
+        with self._calls_lock:
+            if call['done'] or call['abandoned'] or self.abandoned_in_flight >= self.max_abandoned:
+                return False
+            call['abandoned'] = True
+            self.abandoned_in_flight += 1
+            self.abandoned += 1
+        self.scheduler.release()
+        return True
+
+    def _admit(self, lane, user_id, deadline):
+        """Take a quota token, a concurrency slot and the breaker's permission, or raise without holding any"""
+        if not self.scheduler.admit(lane, user_id):
+            self.throttled += 1
+            raise LLMThrottled(f'LLM quota exceeded for user {user_id}')
+        if not self.scheduler.acquire(lane, deadline - time.monotonic()):
+            self.throttled += 1
+            raise LLMThrottled(f'no LLM slot free for the {lane} lane')
+
+        if not self.breaker.allow():
+            self.scheduler.release()
+            self.short_circuited += 1
+            raise LLMUnavailable('circuit breaker is open')
+
+    def generate_json(self, prompt, timeout=None, **kwargs):
+        """Like generate() but parses the reply as a JSON object, raises LLMUnavailable if it is not one"""
+        text = self.generate(prompt, timeout=timeout, **kwargs)
+        try:
+            return extract_json_object(text)
+        except ValueError as e:
+            raise LLMUnavailable(f'unparseable JSON reply: {e}')
+
+    def stats(self):
+        return {
+            'model': self.model_name,
+            'breaker_state': self.breaker.state,
+            'calls': self.calls,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'short_circuited': self.short_circuited,
+            'throttled': self.throttled,
+            'abandoned': self.abandoned,
+            'abandoned_in_flight': self.abandoned_in_flight,
+            'max_abandoned': self.max_abandoned,
+            'scheduler': self.scheduler.stats()
+        }
+
+
+def extract_json_object(text):
+    """Parse the JSON object in a model reply, tolerating ```json fences and surrounding prose"""
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        raise ValueError('no JSON object found')
+    data = json.loads(text[start:end + 1])
+    if not isinstance(data, dict):
+        raise ValueError('reply is not a JSON object')
+    return data
+
+
+# Global LLM client instance
+llm_client = LLMClient()
@@ -0,0 +1,143 @@
+"""
+LLM Call Scheduler for HavenMind
+Shares the Gemini concurrency cap across priority lanes and rate limits each user with a token bucket
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+
+# Lanes in priority order, a free slot always goes to the most urgent waiter
+LANE_CRISIS = 'crisis'
+LANE_JOURNAL = 'journal'
+LANE_CHAT = 'chat'
+LANE_PROMPTS = 'prompts'
+LANES = [LANE_CRISIS, LANE_JOURNAL, LANE_CHAT, LANE_PROMPTS]
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def is_full(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency=None, user_rate_per_minute=None, user_burst=None, queue_timeout=None):
+        self.max_concurrency = max_concurrency or int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+        self.user_rate = (user_rate_per_minute or float(os.getenv('LLM_USER_RATE_PER_MINUTE', '20'))) / 60.0
+        self.user_burst = user_burst or float(os.getenv('LLM_USER_BURST', '5'))
+        # How long a non-crisis call may wait for a slot before its caller falls back
+        self.queue_timeout = queue_timeout or float(os.getenv('LLM_QUEUE_TIMEOUT_SECONDS', '2'))
+
+        self.in_flight = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._buckets = {}
+        self._cond = threading.Condition()
+        self._metrics = {lane: {
+            'granted': 0,
+            'throttled': 0,
+            'timed_out': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0
+        } for lane in LANES}
+
+    def admit(self, lane, user_id):
+        """Take one token from the user's bucket, crisis calls are never rate limited"""
+        if lane == LANE_CRISIS or user_id is None:
+            return True
+
+        now = time.monotonic()
+        with self._cond:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                if len(self._buckets) >= 10000:
+                    self._prune_buckets(now)
+                bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst, now)
+            if bucket.take(now):
+                return True
+            self._metrics[lane]['throttled'] += 1
+            return False
+
+    def _prune_buckets(self, now):
+        # A full bucket is indistinguishable from a new one
+        for user_id in [user_id for user_id, bucket in self._buckets.items() if bucket.is_full(now)]:
+            del self._buckets[user_id]
+
+    def acquire(self, lane, timeout):
+        """Wait up to timeout for a concurrency slot, returns False if none came free in time"""
+        if lane != LANE_CRISIS:
+            timeout = min(timeout, self.queue_timeout)
+
+        started = time.monotonic()
+        deadline = started + timeout
+        waiter = (LANES.index(lane), next(self._sequence))
+
+        with self._cond:
+            heapq.heappush(self._waiters, waiter)
+            try:
+                while self._waiters[0] != waiter or self.in_flight >= self.max_concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics[lane]['timed_out'] += 1
+                        return False
+                    self._cond.wait(remaining)
+
+                self.in_flight += 1
+            finally:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                # The next waiter may now be at the head with a slot still free
+                self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            metrics = self._metrics[lane]
+            metrics['granted'] += 1
+            metrics['wait_seconds_total'] += waited
+            metrics['wait_seconds_max'] = max(metrics['wait_seconds_max'], waited)
+        return True
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            depth = {lane: 0 for lane in LANES}
+            for rank, _ in self._waiters:
+                depth[LANES[rank]] += 1
+
+            lanes = {}
+            for lane, metrics in self._metrics.items():
+                granted = metrics['granted']
+                lanes[lane] = {
+                    'queue_depth': depth[lane],
+                    'granted': granted,
+                    'throttled': metrics['throttled'],
+                    'timed_out': metrics['timed_out'],
+                    'avg_wait_ms': round(metrics['wait_seconds_total'] / granted * 1000, 1) if granted else 0.0,
+                    'max_wait_ms': round(metrics['wait_seconds_max'] * 1000, 1)
+                }
+
+            return {
+                'max_concurrency': self.max_concurrency,
+                'in_flight': self.in_flight,
+                'tracked_users': len(self._buckets),
+                'lanes': lanes
+            }
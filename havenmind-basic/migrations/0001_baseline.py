@@ -0,0 +1,139 @@
+"""
+Baseline schema: the tables init_db() used to create, plus the columns older databases picked up through ALTER TABLE
+"""
+
+from migrator import add_column_if_missing
+
+USERS_COLUMNS = [
+    ('first_name', 'TEXT'),
+    ('last_name', 'TEXT'),
+    ('university', 'TEXT'),
+    ('major', 'TEXT'),
+    ('phone', 'TEXT'),
+    ('year_of_study', 'TEXT'),
+    ('daily_checkins', 'BOOLEAN DEFAULT 1'),
+    ('mood_reminders', 'BOOLEAN DEFAULT 1'),
+    ('peer_notifications', 'BOOLEAN DEFAULT 0'),
+    ('ai_insights', 'BOOLEAN DEFAULT 1'),
+    ('appointment_reminders', 'BOOLEAN DEFAULT 1'),
+    ('support_type', "TEXT DEFAULT 'self_help'"),
+    ('emergency_alerts', 'BOOLEAN DEFAULT 1'),
+    ('share_location', 'BOOLEAN DEFAULT 0'),
+    ('auto_professional_escalation', 'BOOLEAN DEFAULT 0'),
+    ('emergency_contact_name', 'TEXT'),
+    ('emergency_contact_phone', 'TEXT'),
+    ('emergency_contact_relationship', 'TEXT'),
+    ('notification_method', "TEXT DEFAULT 'email'"),
+    ('notification_time', "TEXT DEFAULT 'morning'"),
+    ('share_research', 'BOOLEAN DEFAULT 0'),
+    ('ai_analysis', 'BOOLEAN DEFAULT 1'),
+    ('share_counselors', 'BOOLEAN DEFAULT 0'),
+]
+
+
+def upgrade(conn):
+    # Users table
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        role TEXT DEFAULT 'student',
+        is_verified BOOLEAN DEFAULT 0,
+        reset_token TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        cognitive_load_score REAL DEFAULT 0.0,
+        first_name TEXT,
+        last_name TEXT,
+        university TEXT,
+        major TEXT,
+        phone TEXT,
+        year_of_study TEXT,
+        daily_checkins BOOLEAN DEFAULT 1,
+        mood_reminders BOOLEAN DEFAULT 1,
+        peer_notifications BOOLEAN DEFAULT 0,
+        ai_insights BOOLEAN DEFAULT 1,
+        appointment_reminders BOOLEAN DEFAULT 1,
+        support_type TEXT DEFAULT 'self_help',
+        emergency_alerts BOOLEAN DEFAULT 1,
+        share_location BOOLEAN DEFAULT 0,
+        auto_professional_escalation BOOLEAN DEFAULT 0,
+        emergency_contact_name TEXT,
+        emergency_contact_phone TEXT,
+        emergency_contact_relationship TEXT,
+        notification_method TEXT DEFAULT 'email',
+        notification_time TEXT DEFAULT 'morning',
+        share_research BOOLEAN DEFAULT 0,
+        ai_analysis BOOLEAN DEFAULT 1,
+        share_counselors BOOLEAN DEFAULT 0
+    )''')
+    # Databases created before these columns were part of CREATE TABLE
+    for column, declaration in USERS_COLUMNS:
+        add_column_if_missing(conn, 'users', column, declaration)
+
+    # Journal entries table
+    conn.execute('''CREATE TABLE IF NOT EXISTS journal_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        content TEXT NOT NULL,
+        sentiment_score REAL,
+        emotion_tags TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''')
+
+    # Calendar events table
+    conn.execute('''CREATE TABLE IF NOT EXISTS calendar_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT,
+        event_date TIMESTAMP NOT NULL,
+        stress_level TEXT DEFAULT 'medium',
+        completed BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''')
+    add_column_if_missing(conn, 'calendar_events', 'completed', 'BOOLEAN DEFAULT 0')
+
+    # Support requests table
+    conn.execute('''CREATE TABLE IF NOT EXISTS support_requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        message TEXT NOT NULL,
+        priority TEXT DEFAULT 'medium',
+        status TEXT DEFAULT 'waiting',
+        peer_id INTEGER,
+        professional_id INTEGER,
+        appointment_date TEXT,
+        appointment_time TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (peer_id) REFERENCES users (id),
+        FOREIGN KEY (professional_id) REFERENCES users (id)
+    )''')
+    add_column_if_missing(conn, 'support_requests', 'professional_id', 'INTEGER')
+    add_column_if_missing(conn, 'support_requests', 'appointment_date', 'TEXT')
+    add_column_if_missing(conn, 'support_requests', 'appointment_time', 'TEXT')
+
+    # Chat messages table
+    conn.execute('''CREATE TABLE IF NOT EXISTS chat_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        request_id INTEGER NOT NULL,
+        sender_id INTEGER NOT NULL,
+        message TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (request_id) REFERENCES support_requests (id),
+        FOREIGN KEY (sender_id) REFERENCES users (id)
+    )''')
+
+    # Session notes table for professional notes
+    conn.execute('''CREATE TABLE IF NOT EXISTS session_notes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        case_id INTEGER NOT NULL,
+        professional_id INTEGER NOT NULL,
+        note TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (case_id) REFERENCES support_requests (id),
+        FOREIGN KEY (professional_id) REFERENCES users (id)
+    )''')
@@ -0,0 +1,31 @@
+"""
+Secondary indexes for the hot query paths, checked by db_indexes.py
+"""
+
+# Frozen as first shipped, later indexes get their own migration
+HOT_PATH_INDEXES = [
+    # /journal, /journal/analytics, dashboards, AI context: user_id + created_at windows
+    ('idx_journal_entries_user_created', 'journal_entries', 'user_id, created_at'),
+    # Admin / institution rollups over recent entries regardless of user
+    ('idx_journal_entries_created', 'journal_entries', 'created_at'),
+    # /calendar, cognitive load, daily schedule: user_id + event_date windows
+    ('idx_calendar_events_user_date', 'calendar_events', 'user_id, event_date'),
+    # Peer queue and professional dashboard: status + priority
+    ('idx_support_requests_status_priority', 'support_requests', 'status, priority, created_at'),
+    # /student-messages, appointment lookups: a student's latest open request
+    ('idx_support_requests_user_status', 'support_requests', 'user_id, status, created_at'),
+    # Peer dashboard active / closed chats
+    ('idx_support_requests_peer_status', 'support_requests', 'peer_id, status'),
+    # Chat history polling: request_id + created_at
+    ('idx_chat_messages_request_created', 'chat_messages', 'request_id, created_at'),
+    ('idx_session_notes_case_created', 'session_notes', 'case_id, created_at'),
+    # Institution dashboards: university + role + major
+    ('idx_users_university_role_major', 'users', 'university, role, major'),
+    # Admin dashboard role listings and peer availability checks
+    ('idx_users_role_created', 'users', 'role, created_at'),
+]
+
+
+def upgrade(conn):
+    for name, table, columns in HOT_PATH_INDEXES:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
@@ -0,0 +1,16 @@
+"""
+Location shares sent during a crisis, previously created on first use by /share-location
+"""
+
+
+def upgrade(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS location_shares (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL,
+        shared_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        emergency_contact_phone TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_location_shares_user_shared ON location_shares (user_id, shared_at)')
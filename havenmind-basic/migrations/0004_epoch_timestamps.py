@@ -0,0 +1,42 @@
+"""
+Integer UTC epoch columns (created_ts / event_ts) kept in sync by triggers and indexed for time-window range scans
+"""
+
+from migrator import add_column_if_missing
+from timestamps import CREATED_TS_SQL, EVENT_TS_SQL
+
+CREATED_TS_TABLES = ['journal_entries', 'support_requests', 'chat_messages']
+
+EPOCH_INDEXES = [
+    ('idx_journal_entries_user_created_ts', 'journal_entries', 'user_id, created_ts'),
+    ('idx_journal_entries_created_ts', 'journal_entries', 'created_ts'),
+    ('idx_calendar_events_user_event_ts', 'calendar_events', 'user_id, event_ts'),
+    ('idx_support_requests_user_created_ts', 'support_requests', 'user_id, created_ts'),
+    ('idx_support_requests_created_ts', 'support_requests', 'created_ts'),
+]
+
+
+def upgrade(conn):
+    for table in CREATED_TS_TABLES:
+        add_column_if_missing(conn, table, 'created_ts', 'INTEGER')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_created_ts
+            AFTER INSERT ON {table} WHEN NEW.created_ts IS NULL
+            BEGIN
+                UPDATE {table} SET created_ts = {CREATED_TS_SQL.format(column='NEW.created_at')} WHERE id = NEW.id;
+            END''')
+
+    add_column_if_missing(conn, 'calendar_events', 'event_ts', 'INTEGER')
+    event_ts = EVENT_TS_SQL.format(column='NEW.event_date')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_calendar_events_event_ts_insert
+        AFTER INSERT ON calendar_events WHEN NEW.event_ts IS NULL
+        BEGIN
+            UPDATE calendar_events SET event_ts = {event_ts} WHERE id = NEW.id;
+        END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_calendar_events_event_ts_update
+        AFTER UPDATE OF event_date ON calendar_events
+        BEGIN
+            UPDATE calendar_events SET event_ts = {event_ts} WHERE id = NEW.id;
+        END''')
+
+    for name, table, columns in EPOCH_INDEXES:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
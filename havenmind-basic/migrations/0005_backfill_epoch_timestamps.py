@@ -0,0 +1,17 @@
+"""
+Backfill created_ts / event_ts for rows written before 0004, in small batches so the app keeps serving writes
+"""
+
+from migrator import backfill_in_batches
+from timestamps import CREATED_TS_SQL, EVENT_TS_SQL
+
+TRANSACTIONAL = False
+
+
+def upgrade(conn):
+    for table in ['journal_entries', 'support_requests', 'chat_messages']:
+        backfill_in_batches(conn, table, 'created_ts = ' + CREATED_TS_SQL.format(column='created_at'),
+                            where='created_ts IS NULL')
+
+    backfill_in_batches(conn, 'calendar_events', 'event_ts = ' + EVENT_TS_SQL.format(column='event_date'),
+                        where='event_ts IS NULL')
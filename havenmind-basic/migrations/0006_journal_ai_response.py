@@ -0,0 +1,9 @@
+"""
+Store the AI companion response with each journal entry instead of generating it on every page render
+"""
+
+from migrator import add_column_if_missing
+
+
+def upgrade(conn):
+    add_column_if_missing(conn, 'journal_entries', 'ai_response', 'TEXT')
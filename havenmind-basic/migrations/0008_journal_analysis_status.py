@@ -0,0 +1,10 @@
+"""
+Track background LLM analysis of journal entries (pending / complete / failed)
+"""
+
+from migrator import add_column_if_missing
+
+
+def upgrade(conn):
+    # Entries written before the background pipeline were analyzed inline
+    add_column_if_missing(conn, 'journal_entries', 'analysis_status', "TEXT DEFAULT 'complete'")
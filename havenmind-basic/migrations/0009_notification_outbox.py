@@ -0,0 +1,21 @@
+"""
+Outbox of notifications waiting for the dispatch workers, written in the same transaction as the row that caused them
+"""
+
+
+def upgrade(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS notification_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        priority INTEGER NOT NULL DEFAULT 1,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_ts REAL NOT NULL,
+        last_error TEXT,
+        created_ts REAL NOT NULL,
+        sent_ts REAL
+    )''')
+    # Workers claim due rows by status and next attempt time, sent and dead rows fall out of the scan
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_notification_outbox_due ON notification_outbox (status, next_attempt_ts)')
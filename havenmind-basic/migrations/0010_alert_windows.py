@@ -0,0 +1,16 @@
+"""
+Coalescing windows for alerts to emergency contacts, one row per recipient and alert topic
+"""
+
+
+def upgrade(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS alert_windows (
+        recipient TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        opened_ts REAL NOT NULL,
+        severity TEXT,
+        alerts INTEGER NOT NULL DEFAULT 1,
+        suppressed INTEGER NOT NULL DEFAULT 0,
+        outbox_id INTEGER,
+        PRIMARY KEY (recipient, topic)
+    )''')
@@ -0,0 +1,17 @@
+"""
+Checkpoints for batch jobs such as the daily schedule send, so a crashed run resumes where it stopped
+"""
+
+
+def upgrade(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schedule_runs (
+        job TEXT NOT NULL,
+        run_date TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'running',
+        last_user_id INTEGER NOT NULL DEFAULT 0,
+        queued INTEGER NOT NULL DEFAULT 0,
+        started_ts REAL NOT NULL,
+        checkpoint_ts REAL,
+        finished_ts REAL,
+        PRIMARY KEY (job, run_date)
+    )''')
@@ -0,0 +1,17 @@
+"""
+Per-user timezone and last-sent state for the daily schedule timer, so a restart knows who was already sent today
+"""
+
+from migrator import add_column_if_missing
+
+
+def upgrade(conn):
+    # IANA zone name from the browser, NULL means the server's local time
+    add_column_if_missing(conn, 'users', 'timezone', 'TEXT')
+    conn.execute('''CREATE TABLE IF NOT EXISTS daily_schedule_state (
+        user_id INTEGER PRIMARY KEY,
+        last_sent_date TEXT,
+        next_fire_ts REAL,
+        sent_ts REAL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''')
@@ -0,0 +1,15 @@
+"""
+Leases that elect one process per background job, renewed by heartbeat and taken over once they expire
+"""
+
+
+def upgrade(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS job_leases (
+        job TEXT PRIMARY KEY,
+        holder TEXT NOT NULL,
+        term INTEGER NOT NULL DEFAULT 1,
+        acquired_ts REAL NOT NULL,
+        heartbeat_ts REAL NOT NULL,
+        expires_ts REAL NOT NULL,
+        last_run_ts REAL
+    )''')
@@ -0,0 +1,7 @@
+"""
+Index chat_messages on (request_id, id) for chat polls that pass an after_id cursor, checked by db_indexes.py
+"""
+
+
+def upgrade(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chat_messages_request_id ON chat_messages (request_id, id)')
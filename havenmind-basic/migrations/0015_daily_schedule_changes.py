@@ -0,0 +1,10 @@
+"""
+When a user's daily schedule was last changed, so the process holding the timer lease picks up changes made in other processes
+"""
+
+from migrator import add_column_if_missing
+
+
+def upgrade(conn):
+    add_column_if_missing(conn, 'daily_schedule_state', 'changed_ts', 'REAL')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_daily_schedule_state_changed ON daily_schedule_state (changed_ts)')
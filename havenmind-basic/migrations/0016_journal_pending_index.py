@@ -0,0 +1,9 @@
+"""
+Partial index over journal entries still pending analysis, for the recovery scan after a restart
+"""
+
+
+def upgrade(conn):
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_journal_entries_pending ON journal_entries (created_ts) WHERE analysis_status = 'pending'"
+    )
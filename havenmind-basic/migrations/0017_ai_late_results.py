@@ -0,0 +1,17 @@
+"""
+LLM answers that missed their route's latency budget, kept for a while so the page that got the local answer can fetch them from any worker
+"""
+
+
+def upgrade(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS ai_late_results (
+        token TEXT PRIMARY KEY,
+        user_id INTEGER,
+        route TEXT NOT NULL,
+        status TEXT NOT NULL,
+        response TEXT,
+        created_ts REAL NOT NULL,
+        expires_ts REAL NOT NULL
+    )''')
+    # The hourly purge deletes by expiry
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ai_late_results_expires ON ai_late_results (expires_ts)')
@@ -0,0 +1,15 @@
+"""
+Provider chains and rate limits changed from the admin endpoint, kept so every worker applies them and they survive a restart
+"""
+
+
+def upgrade(conn):
+    # kind is 'chain' (name is a channel, value a JSON list of providers) or
+    # 'rate_limit' (name is a provider, value sends per minute, NULL for no limit)
+    conn.execute('''CREATE TABLE IF NOT EXISTS notification_provider_settings (
+        kind TEXT NOT NULL,
+        name TEXT NOT NULL,
+        value TEXT,
+        updated_ts REAL NOT NULL,
+        PRIMARY KEY (kind, name)
+    )''')
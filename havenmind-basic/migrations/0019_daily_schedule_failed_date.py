@@ -0,0 +1,9 @@
+"""
+The last day a user's daily schedule could not be formatted, so that day is skipped rather than retried at every reload
+"""
+
+from migrator import add_column_if_missing
+
+
+def upgrade(conn):
+    add_column_if_missing(conn, 'daily_schedule_state', 'failed_date', 'TEXT')
@@ -0,0 +1,7 @@
+"""
+Schema Migrations for HavenMind
+Each NNNN_name.py module defines upgrade(conn) and is applied once, in order, by migrator.py
+
+Set TRANSACTIONAL = False in a module whose upgrade commits in batches itself
+(large backfills), everything else runs inside a single BEGIN IMMEDIATE transaction.
+"""
@@ -0,0 +1,161 @@
+"""
+Schema Migration Runner for HavenMind
+Applies the ordered files in migrations/ once each and records them in the schema_version table
+
+Usage:
+    python migrator.py           # apply pending migrations
+    python migrator.py status    # list applied and pending migrations
+"""
+
+import importlib
+import os
+import pkgutil
+import sys
+import time
+
+from db import db_pool
+
+MIGRATIONS_PACKAGE = 'migrations'
+
+
+def discover_migrations():
+    """Return [(version, name, module)] for every migration file, ordered by version"""
+    package = importlib.import_module(MIGRATIONS_PACKAGE)
+    found = []
+    for info in pkgutil.iter_modules(package.__path__):
+        prefix, _, _ = info.name.partition('_')
+        if not prefix.isdigit():
+            continue
+        module = importlib.import_module(f'{MIGRATIONS_PACKAGE}.{info.name}')
+        found.append((int(prefix), info.name, module))
+
+    found.sort(key=lambda migration: migration[0])
+    versions = [version for version, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f'Duplicate migration version in {MIGRATIONS_PACKAGE}/: {versions}')
+    return found
+
+
+def ensure_schema_version_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    conn.commit()
+
+
+def applied_versions(conn):
+    return {row[0] for row in conn.execute('SELECT version FROM schema_version')}
+
+
+def current_version(conn):
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def _apply(conn, version, name, module):
+    started = time.time()
+
+    if getattr(module, 'TRANSACTIONAL', True):
+        # BEGIN IMMEDIATE takes the write lock up front so two processes starting at
+        # once cannot both apply the same migration
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if version in applied_versions(conn):
+                conn.rollback()
+                return False
+            module.upgrade(conn)
+            conn.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)', (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    else:
+        # Online migrations commit in batches themselves and must be safe to re-run
+        module.upgrade(conn)
+        conn.execute('INSERT OR IGNORE INTO schema_version (version, name) VALUES (?, ?)', (version, name))
+        conn.commit()
+
+    print(f'Applied migration {name} in {time.time() - started:.2f}s')
+    return True
+
+
+def apply_migrations(conn=None):
+    """Apply every pending migration in order, returns the list of applied names"""
+    if conn is None:
+        with db_pool.connection() as pooled:
+            return apply_migrations(pooled)
+
+    ensure_schema_version_table(conn)
+    done = applied_versions(conn)
+    applied = []
+    for version, name, module in discover_migrations():
+        if version in done:
+            continue
+        if _apply(conn, version, name, module):
+            applied.append(name)
+    return applied
+
+
+# Helpers used by migration files
+
+def column_exists(conn, table, column):
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+
+def add_column_if_missing(conn, table, column, declaration):
+    """ALTER TABLE ... ADD COLUMN unless the column is already there"""
+    if not column_exists(conn, table, column):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+        return True
+    return False
+
+
+def backfill_in_batches(conn, table, assignments, where='1', params=(), batch_size=None, pause=None):
+    """Run UPDATE table SET assignments WHERE where over rowid ranges, committing per batch.
+
+    Each batch holds the write lock for one short transaction, so requests keep
+    writing while a large table is reshaped. Rows inserted after the backfill starts
+    are expected to be written in the new shape by the application.
+    """
+    batch_size = batch_size or int(os.getenv('MIGRATION_BATCH_SIZE', '1000'))
+    pause = pause if pause is not None else float(os.getenv('MIGRATION_BATCH_PAUSE', '0.05'))
+
+    bounds = conn.execute(f'SELECT MIN(rowid), MAX(rowid) FROM {table}').fetchone()
+    if bounds[0] is None:
+        return 0
+    low, high = bounds[0] - 1, bounds[1]
+
+    updated = 0
+    while low < high:
+        upper = min(low + batch_size, high)
+        cursor = conn.execute(
+            f'UPDATE {table} SET {assignments} WHERE rowid > ? AND rowid <= ? AND ({where})',
+            (low, upper, *params)
+        )
+        conn.commit()
+        updated += cursor.rowcount
+        low = upper
+        if pause:
+            time.sleep(pause)
+
+    print(f'Backfilled {updated} rows in {table}')
+    return updated
+
+
+def print_status():
+    with db_pool.connection() as conn:
+        ensure_schema_version_table(conn)
+        done = applied_versions(conn)
+        for version, name, _ in discover_migrations():
+            state = 'applied' if version in done else 'pending'
+            print(f'{version:04d}  {state:8s} {name}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        print_status()
+    else:
+        applied = apply_migrations()
+        print(f'Database is up to date ({len(applied)} migration(s) applied)')
@@ -3,9 +3,378 @@ Notification System for HavenMind
 Handles SMS, Email, and Emergency Alerts
 """
 
+import json
 import os
+import queue
+import random
+import smtplib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeout
 from datetime import datetime
-import sqlite3
+from db import get_db_connection
+from llm_scheduler import TokenBucket
+from user_cache import get_user
+
+OUTCOME_SENT = 'sent'
+OUTCOME_FAILED = 'failed'
+OUTCOME_PENDING = 'pending'
+
+CHANNEL_SMS = 'sms'
+CHANNEL_EMAIL = 'email'
+CHANNEL_CHAT = 'chat'
+CHANNEL_EMERGENCY = 'emergency'
+
+# Ordered provider chains, overridable with NOTIFY_<CHANNEL>_PROVIDERS=name,name,...
+# sms, email and chat fail over down the chain, emergency sends to the whole chain at once
+DEFAULT_CHAINS = {
+    CHANNEL_SMS: ['twilio'],
+    CHANNEL_EMAIL: ['smtp'],
+    CHANNEL_CHAT: ['telegram'],
+    CHANNEL_EMERGENCY: ['twilio', 'sms_gateway', 'whatsapp', 'callmebot']
+}
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class SMTPConnectionPool:
+    """Logged-in yagmail connections reused across sends, a dropped connection is replaced and the send retried once"""
+
+    def __init__(self, user, password, max_size=None, timeout=None):
+        self.user = user
+        self.password = password
+        self.max_size = max_size or int(os.getenv('NOTIFY_SMTP_POOL_SIZE', '2'))
+        self.timeout = timeout or float(os.getenv('NOTIFY_SMTP_TIMEOUT_SECONDS', '10'))
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+
+    def _connect(self):
+        import yagmail
+        return yagmail.SMTP(self.user, self.password, timeout=self.timeout)
+
+    def send(self, to, subject, contents):
+        # One connection per sender at a time, SMTP sessions cannot interleave messages
+        with self._slots:
+            for attempt in range(2):
+                try:
+                    client = self._idle.get_nowait()
+                except queue.Empty:
+                    client = self._connect()
+
+                try:
+                    client.send(to, subject, contents)
+                except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError):
+                    # The server closed an idle connection, reconnect once before giving up
+                    self._discard(client)
+                    if attempt:
+                        raise
+                    continue
+                except Exception:
+                    self._discard(client)
+                    raise
+
+                self._idle.put(client)
+                return
+
+    def _discard(self, client):
+        try:
+            client.close()
+        except Exception:
+            pass
+
+
+class Provider:
+    """One outbound provider, send() returns True once the provider accepted the message"""
+    name = None
+
+    def __init__(self, system):
+        self.system = system
+
+    def configured(self):
+        return True
+
+    def send(self, to, message, subject=None):
+        raise NotImplementedError
+
+
+class TwilioProvider(Provider):
+    name = 'twilio'
+
+    def configured(self):
+        return bool(os.getenv('TWILIO_ACCOUNT_SID') and os.getenv('TWILIO_AUTH_TOKEN'))
+
+    def send(self, to, message, subject=None):
+        return self.system._send_twilio_sms(to, message)
+
+
+class TextBeltProvider(Provider):
+    name = 'textbelt'
+
+    def send(self, to, message, subject=None):
+        return self.system._send_textbelt_sms(to, message)
+
+
+class SMSGatewayProvider(Provider):
+    name = 'sms_gateway'
+
+    def configured(self):
+        # The gateways are reached by email, without a mailbox nothing would leave
+        return bool(self.system.sms_via_email and self.system.email_user and self.system.email_password)
+
+    def send(self, to, message, subject=None):
+        return self.system._send_sms_via_email(to, message)
+
+
+class WhatsAppProvider(Provider):
+    name = 'whatsapp'
+
+    def configured(self):
+        return bool(self.system.whatsapp_token and self.system.whatsapp_phone_id)
+
+    def send(self, to, message, subject=None):
+        return self.system._send_whatsapp_business(to, message)
+
+
+class CallMeBotProvider(Provider):
+    name = 'callmebot'
+
+    def configured(self):
+        return bool(self.system.callmebot_key)
+
+    def send(self, to, message, subject=None):
+        return self.system._send_callmebot(to, message)
+
+
+class SMTPProvider(Provider):
+    name = 'smtp'
+
+    def configured(self):
+        return bool(self.system.email_user and self.system.email_password)
+
+    def send(self, to, message, subject=None):
+        return self.system._send_smtp_email(to, subject or "HavenMind", message)
+
+
+class TelegramProvider(Provider):
+    """Posts to the configured chat, the recipient is ignored"""
+    name = 'telegram'
+
+    def configured(self):
+        return bool(self.system.telegram_token and self.system.telegram_chat_id)
+
+    def send(self, to, message, subject=None):
+        return self.system._send_telegram(message)
+
+
+class LoopbackProvider(Provider):
+    """Local fake that accepts every message after a set latency, for development and benchmarks"""
+    name = 'loopback'
+
+    def __init__(self, system):
+        super().__init__(system)
+        self.latency = float(os.getenv('NOTIFY_LOOPBACK_LATENCY_MS', '0')) / 1000.0
+        self.failure_rate = float(os.getenv('NOTIFY_LOOPBACK_FAILURE_RATE', '0'))
+        self.delivered = deque(maxlen=1000)
+
+    def send(self, to, message, subject=None):
+        if self.latency:
+            time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            return False
+        self.delivered.append((to, subject, message))
+        return True
+
+
+PROVIDERS = [
+    TwilioProvider, TextBeltProvider, SMSGatewayProvider, WhatsAppProvider,
+    CallMeBotProvider, SMTPProvider, TelegramProvider, LoopbackProvider
+]
+
+
+class ProviderRegistry:
+    def __init__(self, system, providers=PROVIDERS):
+        self.providers = {provider.name: provider(system) for provider in providers}
+        self._lock = threading.Lock()
+        
+        # Chains and limits from the environment, saved settings are applied over them
+        self._base_chains = {}
+        self._base_limits = {}
+        self._saved_chains = {}
+        self._saved_limits = {}
+        self._chains = {}
+        for channel, default in DEFAULT_CHAINS.items():
+            names = os.getenv(f'NOTIFY_{channel.upper()}_PROVIDERS')
+            self.configure(channel, names.split(',') if names else default)
+
+        # Optional per-provider limits, NOTIFY_RATE_<PROVIDER>_PER_MINUTE with a burst of the same size
+        self._buckets = {}
+        for name in self.providers:
+            per_minute = os.getenv(f'NOTIFY_RATE_{name.upper()}_PER_MINUTE')
+            if per_minute:
+                self.set_rate_limit(name, float(per_minute))
+
+        # Every worker re-reads notification_provider_settings this often
+        self.reload_seconds = float(os.getenv('NOTIFY_PROVIDER_RELOAD_SECONDS', '30'))
+        self._reloaded_at = None
+
+        self._stats = {name: {'sent': 0, 'failed': 0, 'rate_limited': 0} for name in self.providers}
+
+    def _check_chain(self, channel, names):
+        names = [name.strip() for name in names if name.strip()]
+        unknown = [name for name in names if name not in self.providers]
+        if channel not in DEFAULT_CHAINS or unknown:
+            raise ValueError(f"unknown channel {channel!r} or providers {unknown}")
+        return names
+
+    def configure(self, channel, names):
+        """Replace channel's provider chain in this process, a saved chain still takes precedence"""
+        names = self._check_chain(channel, names)
+        with self._lock:
+            self._base_chains[channel] = names
+            self._apply()
+
+    def set_rate_limit(self, name, per_minute, burst=None):
+        """Limit name to per_minute sends in this process, None removes the limit, a saved limit still takes precedence"""
+        with self._lock:
+            if per_minute is None:
+                self._base_limits.pop(name, None)
+            else:
+                self._base_limits[name] = (per_minute, burst)
+            self._apply()
+
+    def _apply(self):
+        """Rebuild the effective chains and buckets, called with _lock held"""
+        self._chains = dict(self._base_chains, **self._saved_chains)
+        limits = dict(self._base_limits)
+        for name, per_minute in self._saved_limits.items():
+            if per_minute is None:
+                limits.pop(name, None)
+            else:
+                limits[name] = (per_minute, None)
+        # Unchanged limits keep their bucket so a reload does not refill it
+        buckets = {}
+        for name, (per_minute, burst) in limits.items():
+            bucket = self._buckets.get(name)
+            if bucket is None or bucket.rate != per_minute / 60.0:
+                bucket = TokenBucket(per_minute / 60.0, burst or max(1.0, per_minute), time.monotonic())
+            buckets[name] = bucket
+        self._buckets = buckets
+
+    def save(self, chains=None, rate_limits=None):
+        """Store chain and rate limit changes for every worker and apply them here.
+        
+        Raises ValueError before anything is stored if a channel or provider is unknown.
+        """
+        chains = {channel: self._check_chain(channel, names) for channel, names in (chains or {}).items()}
+        rate_limits = dict(rate_limits or {})
+        for name, per_minute in rate_limits.items():
+            if name not in self.providers:
+                raise ValueError(f"unknown provider {name!r}")
+            rate_limits[name] = None if per_minute is None else float(per_minute)
+
+        now = time.time()
+        rows = [('chain', channel, json.dumps(names), now) for channel, names in chains.items()]
+        rows += [('rate_limit', name, None if per_minute is None else str(per_minute), now)
+                 for name, per_minute in rate_limits.items()]
+        conn = get_db_connection()
+        try:
+            conn.executemany(
+                '''INSERT INTO notification_provider_settings (kind, name, value, updated_ts) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(kind, name) DO UPDATE SET value = excluded.value, updated_ts = excluded.updated_ts''',
+                rows
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        self.reload()
+
+    def reload(self):
+        """Apply the saved settings of notification_provider_settings over the environment's"""
+        conn = get_db_connection()
+        try:
+            rows = conn.execute('SELECT kind, name, value FROM notification_provider_settings').fetchall()
+        finally:
+            conn.close()
+
+        chains, limits = {}, {}
+        for row in rows:
+            if row['kind'] == 'chain':
+                names = [name for name in json.loads(row['value']) if name in self.providers]
+                if row['name'] in DEFAULT_CHAINS:
+                    chains[row['name']] = names
+            elif row['name'] in self.providers:
+                limits[row['name']] = None if row['value'] is None else float(row['value'])
+
+        with self._lock:
+            self._saved_chains = chains
+            self._saved_limits = limits
+            self._reloaded_at = time.monotonic()
+            self._apply()
+
+    def _maybe_reload(self):
+        with self._lock:
+            due = self._reloaded_at is None or time.monotonic() - self._reloaded_at >= self.reload_seconds
+            if due:
+                # Claimed up front so concurrent sends do not all query at once
+                self._reloaded_at = time.monotonic()
+        if due:
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Could not reload notification provider settings, keeping the current ones: {e}")
+
+    def available(self, channel):
+        """Configured providers of channel's chain, in order"""
+        self._maybe_reload()
+        with self._lock:
+            names = list(self._chains[channel])
+        return [name for name in names if self.providers[name].configured()]
+
+    def send_via(self, name, to, message, subject=None):
+        """Send through one provider unless it is over its rate limit, returns True if it accepted"""
+        with self._lock:
+            bucket = self._buckets.get(name)
+            if bucket is not None and not bucket.take(time.monotonic()):
+                self._stats[name]['rate_limited'] += 1
+                return False
+
+        try:
+            sent = self.providers[name].send(to, message, subject) is True
+        except Exception as e:
+            print(f"Provider {name} error: {e}")
+            sent = False
+
+        with self._lock:
+            self._stats[name]['sent' if sent else 'failed'] += 1
+        return sent
+
+    def failover(self, channel, to, message, subject=None):
+        """Try channel's providers in order until one accepts, returns False if none did"""
+        for name in self.available(channel):
+            if self.send_via(name, to, message, subject):
+                return True
+        print(f"No {channel} provider delivered to {to}")
+        return False
+
+    def stats(self):
+        self._maybe_reload()
+        with self._lock:
+            return {
+                'chains': {channel: list(names) for channel, names in self._chains.items()},
+                'rate_limits_per_minute': {name: round(bucket.rate * 60, 1) for name, bucket in self._buckets.items()},
+                'saved': {'chains': dict(self._saved_chains), 'rate_limits': dict(self._saved_limits)},
+                'providers': {
+                    name: dict(self._stats[name], configured=provider.configured())
+                    for name, provider in self.providers.items()
+                }
+            }
+
 
 class NotificationSystem:
     def __init__(self):
@@ -21,38 +390,190 @@ class NotificationSystem:
         self.telegram_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID')
         self.sms_via_email = os.getenv('SMS_VIA_EMAIL', 'true').lower() == 'true'
+        self.textbelt_key = os.getenv('TEXTBELT_KEY', 'textbelt')  # 'textbelt' is the free daily quota
+        self.whatsapp_token = os.getenv('WHATSAPP_TOKEN')
+        self.whatsapp_phone_id = os.getenv('WHATSAPP_PHONE_ID')
+        self.callmebot_key = os.getenv('CALLMEBOT_API_KEY')
+        
+        # Every provider call uses the same (connect, read) timeout
+        self.http_timeout = (
+            float(os.getenv('NOTIFY_CONNECT_TIMEOUT_SECONDS', '3')),
+            float(os.getenv('NOTIFY_READ_TIMEOUT_SECONDS', '10'))
+        )
+        self.http_pool_size = int(os.getenv('NOTIFY_HTTP_POOL_SIZE', '8'))
+        
+        # Long-lived provider clients, created on first use so TLS and SMTP handshakes are paid once
+        self._lock = threading.Lock()
+        self._session = None
+        self._twilio = None
+        self._twilio_credentials = None
+        self._smtp_pool = None
+        
+        # Channels of one notification are sent side by side, bounded by an overall deadline
+        self.fanout_deadline = float(os.getenv('NOTIFY_FANOUT_DEADLINE_SECONDS', '15'))
+        self._fanout = ThreadPoolExecutor(
+            max_workers=int(os.getenv('NOTIFY_FANOUT_WORKERS', '16')),
+            thread_name_prefix='notify-channel'
+        )
+        self._stats_lock = threading.Lock()
+        self._channel_stats = {}
+        self._fanout_stats = {}
+        
+        # Which provider serves each channel is configuration, see DEFAULT_CHAINS
+        self.providers = ProviderRegistry(self)
         print(f"Loaded Telegram config: token={self.telegram_token[:10] if self.telegram_token else 'None'}..., chat_id={self.telegram_chat_id}")
     
+    def _http(self):
+        """Keep-alive HTTP session shared by the Telegram, Formspree, TextBelt, WhatsApp and CallMeBot calls"""
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.http_pool_size, pool_maxsize=self.http_pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
+    
+    def _smtp(self):
+        with self._lock:
+            if self._smtp_pool is None:
+                self._smtp_pool = SMTPConnectionPool(self.email_user, self.email_password)
+            return self._smtp_pool
+    
+    def _twilio_client(self, account_sid, auth_token):
+        """Twilio client with a pooled HTTP connection, rebuilt only if the credentials change"""
+        with self._lock:
+            if self._twilio is None or self._twilio_credentials != (account_sid, auth_token):
+                from twilio.rest import Client
+                from twilio.http.http_client import TwilioHttpClient
+                
+                self._twilio = Client(
+                    account_sid,
+                    auth_token,
+                    http_client=TwilioHttpClient(pool_connections=True, timeout=self.http_timeout[1])
+                )
+                self._twilio_credentials = (account_sid, auth_token)
+            return self._twilio
+    
+    def fan_out(self, kind, sends, deadline=None):
+        """Run every channel send concurrently, returns (delivered, {channel: outcome}).
+
+        sends maps a channel name to a no-argument callable that returns True once the
+        provider accepted the message. This returns as soon as one channel delivers, all
+        have failed or the deadline passes, so the caller waits for the fastest channel
+        rather than the sum of them. Channels still running carry on and their outcome
+        is counted when they finish. The first delivery is the SLA event for kind.
+        """
+        started = time.monotonic()
+        deadline = self.fanout_deadline if deadline is None else deadline
+        futures = {}
+        for channel, send in sends.items():
+            future = self._fanout.submit(send)
+            future.add_done_callback(lambda done, channel=channel: self._record_channel(channel, done, started))
+            futures[future] = channel
+        
+        outcomes = {channel: OUTCOME_PENDING for channel in sends}
+        delivered = False
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                outcomes[futures[future]] = OUTCOME_SENT if self._delivered(future) else OUTCOME_FAILED
+                if outcomes[futures[future]] == OUTCOME_SENT:
+                    delivered = True
+                    break
+        except FutureTimeout:
+            pass
+        
+        self._record_fanout(kind, delivered, time.monotonic() - started)
+        print(f"{kind} fan-out {'delivered' if delivered else 'undelivered'}: {outcomes}")
+        return delivered, outcomes
+    
+    @staticmethod
+    def _delivered(future):
+        try:
+            return future.result() is True
+        except Exception as e:
+            print(f"Notification channel error: {e}")
+            return False
+    
+    def _record_channel(self, channel, future, started):
+        elapsed = time.monotonic() - started
+        sent = not future.exception() and future.result() is True
+        with self._stats_lock:
+            stats = self._channel_stats.setdefault(channel, {'sent': 0, 'failed': 0, 'latency': deque(maxlen=500)})
+            stats['sent' if sent else 'failed'] += 1
+            stats['latency'].append(elapsed)
+    
+    def _record_confirmation(self, future, user_id, started):
+        """Count the emergency confirmation email under its own channel and log it if it did not go out"""
+        self._record_channel('emergency_confirmation', future, started)
+        if not self._delivered(future):
+            print(f"Emergency confirmation email to user {user_id} was not delivered")
+    
+    def _record_fanout(self, kind, delivered, elapsed):
+        with self._stats_lock:
+            stats = self._fanout_stats.setdefault(kind, {'delivered': 0, 'undelivered': 0, 'first_delivery': deque(maxlen=500)})
+            if delivered:
+                stats['delivered'] += 1
+                stats['first_delivery'].append(elapsed)
+            else:
+                stats['undelivered'] += 1
+    
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'channels': {
+                    channel: {
+                        'sent': stats['sent'],
+                        'failed': stats['failed'],
+                        'p50_seconds': round(_percentile(list(stats['latency']), 0.5), 3),
+                        'p95_seconds': round(_percentile(list(stats['latency']), 0.95), 3)
+                    }
+                    for channel, stats in self._channel_stats.items()
+                },
+                'fan_out': {
+                    kind: {
+                        'delivered': stats['delivered'],
+                        'undelivered': stats['undelivered'],
+                        'first_delivery_p50_seconds': round(_percentile(list(stats['first_delivery']), 0.5), 3),
+                        'first_delivery_p95_seconds': round(_percentile(list(stats['first_delivery']), 0.95), 3)
+                    }
+                    for kind, stats in self._fanout_stats.items()
+                },
+                'registry': self.providers.stats()
+            }
+    
     def send_email(self, to_email, subject, message):
+        """Send email through the email provider chain"""
+        return self.providers.failover(CHANNEL_EMAIL, to_email, message, subject)
+    
+    def _send_smtp_email(self, to_email, subject, message):
         """Send email using simple SMTP with timeout"""
         try:
             if not self.email_user or not self.email_password:
-                print(f"Email simulated for {to_email}: {subject} - {message}")
-                return True
+                print(f"Email credentials missing - email simulated for {to_email}: {subject} - {message}")
+                return False
             
-            # Try using yagmail (simpler library)
+            # Try using yagmail (simpler library) over a pooled SMTP connection
             try:
-                import yagmail
-                yag = yagmail.SMTP(self.email_user, self.email_password)
-                yag.send(to_email, subject, message)
+                self._smtp().send(to_email, subject, message)
                 print(f"Email sent to {to_email}")
                 return True
             except ImportError:
                 print("yagmail not installed. Install with: pip install yagmail")
             
-            # Fallback: Use requests to send via web API
-            import requests
-            
-            # Use a free email service API
+            # Fallback: Use a free email service API
             url = "https://formspree.io/f/xpznvqpb"  # Replace with your Formspree endpoint
             data = {
-                "email": to_email,
+                "email": to_email if isinstance(to_email, str) else ', '.join(to_email),
                 "subject": subject,
                 "message": message,
                 "_replyto": self.email_user
             }
             
-            response = requests.post(url, data=data, timeout=10)
+            response = self._http().post(url, data=data, timeout=self.http_timeout)
             if response.status_code == 200:
                 print(f"Email sent via API to {to_email}")
                 return True
@@ -62,19 +583,21 @@ class NotificationSystem:
         except Exception as e:
             print(f"Email error: {e}")
         
-        print(f"Email simulated for {to_email}: {subject} - {message}")
-        return True
+        print(f"Email not delivered to {to_email}: {subject}")
+        return False
     
     def send_telegram(self, message):
+        """Send a chat notification through the chat provider chain"""
+        return self.providers.failover(CHANNEL_CHAT, self.telegram_chat_id, message)
+    
+    def _send_telegram(self, message):
         """Send Telegram notification"""
         try:
             # Debug output removed since we print in __init__ now
             
             if not self.telegram_token or not self.telegram_chat_id:
                 print(f"Telegram credentials missing - simulating: {message}")
-                return True
-            
-            import requests
+                return False
             
             url = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
             data = {
@@ -83,7 +606,7 @@ class NotificationSystem:
             }
             
             print(f"Sending to Telegram: {url}")
-            response = requests.post(url, data=data, timeout=10)
+            response = self._http().post(url, data=data, timeout=self.http_timeout)
             result = response.json()
             
             print(f"Telegram response: {result}")
@@ -97,14 +620,11 @@ class NotificationSystem:
                 
         except Exception as e:
             print(f"Telegram error: {e}")
-            print(f"Telegram would be sent: {message}")
-            return True
+            return False
     
     def _send_textbelt_sms(self, to_phone, message):
         """Send SMS via TextBelt (1 free per day)"""
         try:
-            import requests
-            
             url = "https://textbelt.com/text"
             data = {
                 'phone': to_phone,
@@ -112,7 +632,7 @@ class NotificationSystem:
                 'key': self.textbelt_key
             }
             
-            response = requests.post(url, data=data, timeout=10)
+            response = self._http().post(url, data=data, timeout=self.http_timeout)
             result = response.json()
             
             if result.get('success'):
@@ -145,19 +665,12 @@ class NotificationSystem:
             # Clean phone number
             clean_phone = to_phone.replace('+', '').replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
             
-            # Try multiple carriers (since we don't know which one)
-            success = False
-            for carrier, gateway in carriers.items():
-                try:
-                    sms_email = f"{clean_phone}@{gateway}"
-                    result = self.send_email(sms_email, "HavenMind", message)
-                    if result:
-                        print(f"SMS sent via {carrier} gateway to {to_phone}")
-                        success = True
-                        break
-                except:
-                    continue
-            
+            # We don't know the carrier, so one message goes to every gateway and the
+            # mail server delivers to all of them at once instead of one send per carrier
+            gateways = [f"{clean_phone}@{gateway}" for gateway in carriers.values()]
+            success = self._send_smtp_email(gateways, "HavenMind", message)
+            if success:
+                print(f"SMS sent via {len(gateways)} carrier gateways to {to_phone}")
             return success
             
         except Exception as e:
@@ -166,8 +679,6 @@ class NotificationSystem:
     
     def _send_whatsapp_business(self, to_phone, message):
         """Send via WhatsApp Business API"""
-        import requests
-        
         url = f"https://graph.facebook.com/v18.0/{self.whatsapp_phone_id}/messages"
         headers = {
             "Authorization": f"Bearer {self.whatsapp_token}",
@@ -180,25 +691,25 @@ class NotificationSystem:
             "text": {"body": message}
         }
         
-        response = requests.post(url, json=data, headers=headers)
+        response = self._http().post(url, json=data, headers=headers, timeout=self.http_timeout)
         return response.status_code == 200
     
     def _send_callmebot(self, to_phone, message):
         """Send via CallMeBot (Free)"""
-        import requests
-        import urllib.parse
+        url = "https://api.callmebot.com/whatsapp.php"
+        params = {'phone': to_phone, 'text': message, 'apikey': self.callmebot_key}
         
-        encoded_message = urllib.parse.quote(message)
-        url = f"https://api.callmebot.com/whatsapp.php?phone={to_phone}&text={encoded_message}&apikey={self.callmebot_key}"
-        
-        response = requests.get(url)
-        return response.status_code == 200
+        response = self._http().get(url, params=params, timeout=self.http_timeout)
+        # Errors such as a wrong API key also come back as 200, only a queued message was accepted
+        return response.status_code == 200 and 'queued' in response.text.lower()
     
     def send_sms(self, to_phone, message):
+        """Send SMS through the SMS provider chain"""
+        return self.providers.failover(CHANNEL_SMS, to_phone, message)
+    
+    def _send_twilio_sms(self, to_phone, message):
         """Send SMS using Twilio"""
         try:
-            from twilio.rest import Client
-            
             account_sid = os.getenv('TWILIO_ACCOUNT_SID')
             auth_token = os.getenv('TWILIO_AUTH_TOKEN')
             twilio_phone = os.getenv('TWILIO_PHONE_NUMBER', '+13203228495')
@@ -209,7 +720,7 @@ class NotificationSystem:
                 print(f"Twilio credentials missing - SMS simulated for {to_phone}: {message}")
                 return False
             
-            client = Client(account_sid, auth_token)
+            client = self._twilio_client(account_sid, auth_token)
             
             # Format phone number
             if len(to_phone) == 10:
@@ -232,42 +743,52 @@ class NotificationSystem:
     
     def send_notification(self, user_id, notification_type, message, subject=None):
         """Send notification based on user preferences"""
-        conn = sqlite3.connect('havenmind.db')
-        conn.row_factory = sqlite3.Row
-        
-        user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-        conn.close()
+        user = get_user(user_id)
         
         if not user:
             return False
         
-        notification_method = user['notification_method'] if user['notification_method'] else 'email'
+        return self.send_to_address(user['email'], user['notification_method'], notification_type, message, subject)
+    
+    def send_to_address(self, email, notification_method, notification_type, message, subject=None):
+        """send_notification for a caller that already has the user's email and notification method"""
+        notification_method = notification_method or 'email'
         
-        success = False
+        sends = {}
         
         if notification_method in ['email', 'both']:
-            if user['email']:
-                success = self.send_email(user['email'], subject or f"HavenMind - {notification_type}", message)
+            if email:
+                sends['email'] = lambda: self.send_email(email, subject or f"HavenMind - {notification_type}", message)
         
         if notification_method in ['telegram', 'both']:
             telegram_message = f"<b>HavenMind - {notification_type}</b>\n\n{message}"
-            success = self.send_telegram(telegram_message)
+            sends['telegram'] = lambda: self.send_telegram(telegram_message)
+        
+        if not sends:
+            return False
         
-        return success
+        delivered, _ = self.fan_out('notification', sends)
+        return delivered
+    
+    def send_emergency_sms(self, to_phone, message):
+        """Text an emergency contact through every configured provider of the emergency chain at once, True once any delivers"""
+        sends = {
+            name: lambda name=name: self.providers.send_via(name, to_phone, message)
+            for name in self.providers.available(CHANNEL_EMERGENCY)
+        }
+        if not sends:
+            print(f"No emergency provider configured for {to_phone}")
+            return False
+        
+        delivered, _ = self.fan_out('emergency', sends)
+        return delivered
     
     def send_emergency_alert(self, user_id, crisis_message):
         """Send emergency alert to emergency contact"""
-        conn = sqlite3.connect('havenmind.db')
-        conn.row_factory = sqlite3.Row
-        
-        user_row = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-        conn.close()
+        user = get_user(user_id)
         
-        if not user_row:
+        if not user:
             return False
-            
-        # Convert sqlite3.Row to dict to avoid .get() issues
-        user = dict(user_row)
         
         if not user.get('emergency_alerts'):
             return False
@@ -282,13 +803,10 @@ class NotificationSystem:
         journal_preview = crisis_message[:30] + "..." if len(crisis_message) > 30 else crisis_message
         alert_message = f"🚨 EMERGENCY: {user['username']} needs help. Journal: '{journal_preview}' Call them NOW. Crisis: 91-9820466726"
         
-        # Send SMS to emergency contact
         print(f"Sending emergency SMS to {emergency_contact_phone}")
         print(f"Emergency message: {alert_message}")
-        sms_sent = self.send_sms(emergency_contact_phone, alert_message)
-        print(f"Emergency SMS result: {sms_sent}")
         
-        # Also send email if we have emergency contact email
+        # Also send email if we have emergency contact email, alongside the SMS rather than after it
         if user.get('email'):
             email_message = f"""
 Your emergency contact ({emergency_contact_name}) has been notified about your crisis indicators.
@@ -301,8 +819,14 @@ If you're in immediate danger, please:
 
 You are not alone. Help is available.
 """
-            self.send_email(user['email'], "Emergency Alert Sent", email_message)
+            # Not one of the emergency sends, the student's own email must not count as reaching the contact
+            started = time.monotonic()
+            future = self._fanout.submit(self.send_email, user['email'], "Emergency Alert Sent", email_message)
+            future.add_done_callback(lambda done: self._record_confirmation(done, user_id, started))
         
+        # Send SMS to emergency contact
+        sms_sent = self.send_emergency_sms(emergency_contact_phone, alert_message)
+        print(f"Emergency SMS result: {sms_sent}")
         return sms_sent
     
     def send_daily_checkin(self, user_id):
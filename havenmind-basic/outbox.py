@@ -0,0 +1,277 @@
+"""
+Notification Outbox for HavenMind
+Records outbound notifications in the caller's transaction and delivers them from background dispatch workers with retries
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+
+from db import get_db_connection
+from leases import run_as_leader
+from notification_system import notification_system
+
+STATUS_PENDING = 'pending'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_DEAD = 'dead'
+
+# Urgent rows (crisis alerts) are always claimed before normal ones
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_NAMES = {PRIORITY_URGENT: 'urgent', PRIORITY_NORMAL: 'normal'}
+
+KIND_SMS = 'sms'
+KIND_EMERGENCY_SMS = 'emergency_sms'
+KIND_NOTIFICATION = 'notification'
+# A notification whose payload carries the user's email and method, so dispatch skips the user lookup
+KIND_ADDRESSED_NOTIFICATION = 'addressed_notification'
+
+JOB_OUTBOX_RETENTION = 'outbox_retention'
+
+
+def enqueue(conn, kind, payload, idempotency_key=None, priority=PRIORITY_NORMAL, not_before=None):
+    """Add a notification to the outbox inside the caller's open transaction.
+
+    Nothing is sent until the caller commits, call notification_outbox.wake() after
+    the commit so a worker picks it up at once. A row held until the epoch time
+    not_before counts as created then, so its time to send leaves out the hold. A
+    second row with the same idempotency_key is ignored, returns the new row id or
+    None for a duplicate.
+    """
+    due = max(time.time(), not_before or 0)
+    cursor = conn.execute(
+        '''INSERT OR IGNORE INTO notification_outbox
+           (idempotency_key, kind, payload, priority, status, next_attempt_ts, created_ts)
+           VALUES (?, ?, ?, ?, ?, ?, ?)''',
+        (idempotency_key or uuid.uuid4().hex, kind, json.dumps(payload), priority, STATUS_PENDING, due, due)
+    )
+    return cursor.lastrowid if cursor.rowcount else None
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class NotificationOutbox:
+    def __init__(self, handlers, workers=None, max_attempts=None, base_delay=None, max_delay=None,
+                 lease_seconds=None, poll_seconds=None, urgent_slo_seconds=None, retention_days=None):
+        """handlers maps a row kind to a callable taking its payload as keyword arguments,
+        it fails by raising or returning False"""
+        self.handlers = handlers
+        self.workers = workers or int(os.getenv('OUTBOX_WORKERS', '4'))
+        self.max_attempts = max_attempts or int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+        self.base_delay = base_delay or float(os.getenv('OUTBOX_RETRY_BASE_SECONDS', '2'))
+        self.max_delay = max_delay or float(os.getenv('OUTBOX_RETRY_MAX_SECONDS', '300'))
+        # A row left 'sending' this long by a crashed worker is claimed again
+        self.lease_seconds = lease_seconds or float(os.getenv('OUTBOX_LEASE_SECONDS', '60'))
+        self.poll_seconds = poll_seconds or float(os.getenv('OUTBOX_POLL_SECONDS', '1'))
+        self.urgent_slo_seconds = urgent_slo_seconds or float(os.getenv('CRISIS_ALERT_SLO_SECONDS', '5'))
+        self.retention_days = retention_days or float(os.getenv('OUTBOX_RETENTION_DAYS', '7'))
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._retention = None
+        self._time_to_send = {priority: deque(maxlen=1000) for priority in PRIORITY_NAMES}
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self.slo_violations = 0
+
+    def start(self):
+        """Start the dispatch workers, safe to call more than once.
+
+        Workers in every process dispatch since claiming a row is atomic, the retention
+        purge runs in whichever process holds its lease.
+        """
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'outbox-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._retention = run_as_leader(JOB_OUTBOX_RETENTION, self.purge_sent, 3600)
+
+    def shutdown(self, wait=True):
+        """Stop the workers after the row each is delivering, rows left behind stay queued"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._retention is not None:
+            self._retention.stop()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def wake(self):
+        """Tell the workers committed rows are waiting"""
+        self.start()
+        self._wakeup.set()
+
+    def send(self, kind, payload, idempotency_key=None, priority=PRIORITY_NORMAL):
+        """Enqueue a notification in its own transaction, for callers with no triggering row to write"""
+        conn = get_db_connection()
+        try:
+            outbox_id = enqueue(conn, kind, payload, idempotency_key, priority)
+            conn.commit()
+        finally:
+            conn.close()
+        self.wake()
+        return outbox_id
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                # Clearing before claiming means a wake() for a row committed after this
+                # point is never lost, it leaves the event set for the next wait
+                self._wakeup.clear()
+                while not self._stopping.is_set() and self.dispatch_one():
+                    pass
+            except Exception as e:
+                print(f"Outbox worker error: {e}")
+            self._wakeup.wait(self.poll_seconds)
+
+    def dispatch_one(self):
+        """Claim and deliver the most urgent due row, returns False if none was due"""
+        row = self._claim()
+        if row is None:
+            return False
+        self._deliver(row)
+        return True
+
+    def _claim(self):
+        now = time.time()
+        conn = get_db_connection()
+        try:
+            # BEGIN IMMEDIATE takes the write lock so two workers cannot claim the same row
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                '''SELECT * FROM notification_outbox
+                   WHERE status IN (?, ?) AND next_attempt_ts <= ?
+                   ORDER BY priority, next_attempt_ts LIMIT 1''',
+                (STATUS_PENDING, STATUS_SENDING, now)
+            ).fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            conn.execute(
+                'UPDATE notification_outbox SET status = ?, attempts = attempts + 1, next_attempt_ts = ? WHERE id = ?',
+                (STATUS_SENDING, now + self.lease_seconds, row['id'])
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return dict(row, attempts=row['attempts'] + 1)
+
+    def _deliver(self, row):
+        handler = self.handlers.get(row['kind'])
+        if handler is None:
+            self._finish(row, STATUS_DEAD, error=f"no handler for kind {row['kind']!r}")
+            return
+
+        try:
+            if handler(**json.loads(row['payload'])) is False:
+                raise RuntimeError('provider reported failure')
+        except Exception as e:
+            if row['attempts'] >= self.max_attempts:
+                print(f"Outbox {row['kind']} #{row['id']} dead after {row['attempts']} attempts: {e}")
+                self._finish(row, STATUS_DEAD, error=str(e))
+            else:
+                # Exponential backoff with full jitter so a provider outage is not hit in lockstep
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (row['attempts'] - 1)))
+                self._finish(row, STATUS_PENDING, error=str(e), retry_at=time.time() + delay)
+            return
+
+        self._finish(row, STATUS_SENT)
+
+    def _finish(self, row, status, error=None, retry_at=None):
+        now = time.time()
+        conn = get_db_connection()
+        try:
+            conn.execute(
+                '''UPDATE notification_outbox SET status = ?, last_error = ?, next_attempt_ts = COALESCE(?, next_attempt_ts),
+                   sent_ts = ? WHERE id = ?''',
+                (status, error, retry_at, now if status == STATUS_SENT else None, row['id'])
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        elapsed = now - row['created_ts']
+        late = status == STATUS_SENT and row['priority'] == PRIORITY_URGENT and elapsed > self.urgent_slo_seconds
+        with self._lock:
+            if status == STATUS_SENT:
+                self.sent += 1
+                self._time_to_send[row['priority']].append(elapsed)
+                self.slo_violations += late
+            elif status == STATUS_DEAD:
+                self.dead += 1
+            else:
+                self.retried += 1
+
+        if late:
+            print(f"Urgent {row['kind']} #{row['id']} took {elapsed:.1f}s, over the {self.urgent_slo_seconds:.0f}s SLO")
+
+    def purge_sent(self):
+        """Delete sent rows older than the retention period"""
+        now = time.time()
+        conn = get_db_connection()
+        try:
+            conn.execute(
+                'DELETE FROM notification_outbox WHERE status = ? AND sent_ts < ?',
+                (STATUS_SENT, now - self.retention_days * 86400)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = get_db_connection()
+        try:
+            counts = dict(conn.execute(
+                'SELECT status, COUNT(*) FROM notification_outbox WHERE status != ? GROUP BY status', (STATUS_SENT,)
+            ).fetchall())
+        finally:
+            conn.close()
+
+        with self._lock:
+            time_to_send = {}
+            for priority, name in PRIORITY_NAMES.items():
+                samples = list(self._time_to_send[priority])
+                time_to_send[name] = {
+                    'p50_seconds': round(_percentile(samples, 0.5), 3),
+                    'p95_seconds': round(_percentile(samples, 0.95), 3)
+                }
+            return {
+                'workers': len(self._threads),
+                'pending': counts.get(STATUS_PENDING, 0),
+                'sending': counts.get(STATUS_SENDING, 0),
+                'dead': counts.get(STATUS_DEAD, 0),
+                'sent': self.sent,
+                'retried': self.retried,
+                'dead_lettered': self.dead,
+                'time_to_send': time_to_send,
+                'urgent_slo_seconds': self.urgent_slo_seconds,
+                'slo_violations': self.slo_violations
+            }
+
+
+# Global notification outbox instance
+notification_outbox = NotificationOutbox(handlers={
+    KIND_SMS: notification_system.send_sms,
+    KIND_EMERGENCY_SMS: notification_system.send_emergency_sms,
+    KIND_NOTIFICATION: notification_system.send_notification,
+    KIND_ADDRESSED_NOTIFICATION: notification_system.send_to_address
+})
@@ -33,7 +33,7 @@ def seed_database():
     
     for title, desc, event_date, stress in sample_events:
         c.execute('INSERT OR IGNORE INTO calendar_events (user_id, title, description, event_date, stress_level) VALUES (1, ?, ?, ?, ?)', 
-                 (title, desc, event_date, stress))
+                 (title, desc, event_date.strftime('%Y-%m-%dT%H:%M'), stress))
     
     conn.commit()
     conn.close()
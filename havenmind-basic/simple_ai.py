@@ -1,30 +1,19 @@
-def analyze_sentiment_simple(content):
+from lexicon import scan_text
+
+def analyze_sentiment_simple(content, hits=None):
     """Simple sentiment analysis without external APIs"""
-    content_lower = content.lower()
+    if hits is None:
+        hits = scan_text(content)
     
     # Crisis detection - highest priority
-    crisis_words = ['die', 'diee', 'dieee', 'kill myself', 'end it', 'suicide', 'hurt myself', 'no point', 'give up', 'cant go on', 'want to die', 'wanna die', 'end my life']
-    crisis_patterns = ['go die', 'imma die', 'gonna die', 'wanna die', 'so imma go die']
-    
-    has_crisis = any(word in content_lower for word in crisis_words)
-    if not has_crisis:
-        has_crisis = any(pattern in content_lower for pattern in crisis_patterns)
-    
-    if has_crisis:
+    if 'crisis' in hits:
         return 0.05, 'crisis'
     
-    # Negative words
-    negative_words = ['stressed', 'anxious', 'overwhelmed', 'tired', 'sad', 'depressed', 'worried', 'frustrated', 'angry', 'lonely', 'hopeless', 'exhausted', 'scared', 'afraid', 'upset', 'miss', 'dont care', "don't care", 'whatever', 'ded', 'dead', 'drained', 'burnt out', 'burnout', 'struggling', 'rough', 'tough', 'hard', 'due', 'deadline', 'not started', 'have to learn', 'so much work', "don't know", 'stuck', 'suffocating', 'piling up', 'screaming', 'blowing up', 'magically', 'zero progress']
-    
-    # Positive words
-    positive_words = ['happy', 'good', 'great', 'excited', 'confident', 'grateful', 'peaceful', 'motivated', 'accomplished', 'loved', 'optimistic', 'energized', 'yay', 'groove', 'getting into', 'finally', 'progress', 'better', 'improving', 'finished', 'completed', 'done']
-    
-    negative_count = sum(1 for word in negative_words if word in content_lower)
-    positive_count = sum(1 for word in positive_words if word in content_lower)
+    negative_count = len(hits.get('negative', ()))
+    positive_count = len(hits.get('positive', ()))
     
     # Check for specific academic stress patterns
-    academic_stress_patterns = ['project due', 'due on', 'haven\'t even touched', 'know nothing about', 'learn from scratch', 'dad issues', 'deadlines', 'can\'t think straight']
-    academic_stress = sum(1 for pattern in academic_stress_patterns if pattern in content_lower)
+    academic_stress = len(hits.get('academic_stress', ()))
     
     if academic_stress >= 2 or negative_count > positive_count + 2:
         return 0.2, 'negative'
@@ -37,7 +26,7 @@ def analyze_sentiment_simple(content):
 
 def generate_contextual_response(content, emotion_tags, sentiment_score):
     """Generate contextual response based on content analysis"""
-    content_lower = content.lower()
+    hits = scan_text(content)
     
     # Crisis response
     if emotion_tags == 'crisis':
@@ -53,7 +42,7 @@ CRISIS RESOURCES (INDIA):
 You don't have to face this alone. There are people who want to help you through this difficult time. Please consider reaching out to a counselor, trusted friend, or family member right now."""
     
     # Academic overwhelm with multiple deadlines
-    if any(phrase in content_lower for phrase in ['project due', 'due on', 'deadlines', 'haven\'t even touched', 'know nothing about', 'learn from scratch']):
+    if 'academic_overwhelm' in hits:
         return """I can hear the overwhelming stress in your words about these multiple project deadlines. Having projects due so close together, especially when you need to learn new technologies like Flask and Vue from scratch, feels incredibly daunting. It's completely understandable to feel lost and stuck when facing unfamiliar tech with tight deadlines.
 
 Let's break this down into manageable steps:
@@ -64,19 +53,19 @@ Let's break this down into manageable steps:
 Remember: You don't have to be perfect. A working basic project is better than a perfect unfinished one. What's one small step you could take right now to get started?"""
     
     # Exhaustion with some progress
-    elif any(word in content_lower for word in ['ded', 'dead', 'exhausted', 'drained']) and any(word in content_lower for word in ['groove', 'getting into', 'finally', 'progress']):
+    elif 'exhaustion' in hits and 'momentum' in hits:
         return """I can hear that you're feeling really drained and exhausted right now, but it sounds like you're also starting to find your rhythm and make some progress. That's actually a really positive sign - even when we feel physically and emotionally depleted, recognizing that we're getting into a groove shows resilience. It's okay to feel tired while still moving forward. How can you take care of yourself while maintaining this momentum?"""
     
     # Pure exhaustion
-    elif any(word in content_lower for word in ['ded', 'dead', 'exhausted', 'drained', 'burnt out']):
+    elif 'exhaustion' in hits:
         return """It sounds like you're feeling really exhausted and drained right now. When we say we feel 'dead' or completely worn out, it usually means we've been pushing ourselves pretty hard. Your body and mind are telling you they need some care and rest. What's been taking so much out of you lately? And what's one small thing you could do today to recharge, even just a little?"""
     
     # Family issues combined with academic stress
-    elif 'dad issues' in content_lower or ('family' in content_lower and any(word in content_lower for word in ['issues', 'problems', 'stress'])):
+    elif 'dad issues' in hits.get('academic_stress', ()) or ('family' in hits.get('family', ()) and 'family_trouble' in hits):
         return """It sounds like you're dealing with family stress on top of your academic pressures. Having personal and academic challenges happening at the same time can feel incredibly overwhelming. It's important to acknowledge that you're handling multiple difficult situations right now. Have you been able to talk to anyone about what you're going through? Sometimes just having someone listen can help lighten the load."""
     
     # General academic stress
-    elif any(word in content_lower for word in ['project', 'deadline', 'assignment', 'study', 'exam']):
+    elif 'study' in hits:
         return """Academic pressure can be intense, and it sounds like you're feeling the weight of your coursework right now. It's important to remember that feeling overwhelmed doesn't mean you can't handle it - it just means you're human. Breaking things down into smaller, manageable pieces can help. What's the most pressing thing you need to address first?"""
     
     # Positive responses
@@ -0,0 +1,65 @@
+// Incremental polling for support chats
+// Asks only for messages after the last one seen and sends the conversation's ETag,
+// so the server answers 304 without touching the database while nothing changed
+class ConversationPoller {
+    constructor(url) {
+        this.url = url;
+        this.reset();
+    }
+
+    reset() {
+        this.messages = [];
+        this.lastId = 0;
+        this.etag = null;
+        this.conversationId = null;
+    }
+
+    // Point the poller at another conversation, dropping what it has seen
+    setUrl(url) {
+        if (url !== this.url) {
+            this.url = url;
+            this.reset();
+        }
+    }
+
+    // Resolves to every message seen so far when something changed, or null when the
+    // conversation is unchanged. A non-list reply such as {professional_takeover: true}
+    // is passed through as is.
+    async poll() {
+        const separator = this.url.includes('?') ? '&' : '?';
+        const response = await fetch(`${this.url}${separator}after_id=${this.lastId}`, {
+            cache: 'no-store',
+            headers: this.etag ? { 'If-None-Match': this.etag } : {}
+        });
+        if (response.status === 304) {
+            return null;
+        }
+        if (!response.ok) {
+            throw new Error(`Failed to load messages (${response.status})`);
+        }
+        const data = await response.json();
+
+        if (!Array.isArray(data)) {
+            return data;
+        }
+
+        // An empty or missing id means there is no open case
+        const conversationId = response.headers.get('X-Conversation-Id') || null;
+        if (conversationId !== this.conversationId) {
+            // The endpoint moved on to another case or none, drop what was seen of the old one
+            const resumed = this.lastId > 0;
+            this.reset();
+            if (resumed && conversationId) {
+                // This reply only has messages after the old case's cursor, fetch the full history
+                return this.poll();
+            }
+            this.conversationId = conversationId;
+        }
+        this.etag = response.headers.get('ETag');
+        this.messages.push(...data);
+        if (data.length > 0) {
+            this.lastId = data[data.length - 1].id;
+        }
+        return this.messages;
+    }
+}
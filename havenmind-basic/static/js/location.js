@@ -20,8 +20,8 @@ function requestLocationForEmergency() {
                 .then(response => response.json())
                 .then(data => {
                     if (data.success) {
-                        console.log('Location shared with emergency contact');
-                        showLocationAlert('Your live location has been shared with your emergency contact for safety.');
+                        console.log(data.message);
+                        showLocationAlert(data.deferred ? data.message + '.' : 'Your live location has been shared with your emergency contact for safety.');
                     } else {
                         console.error('Failed to share location:', data.error);
                     }
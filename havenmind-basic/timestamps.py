@@ -0,0 +1,50 @@
+"""
+Epoch Timestamps for HavenMind
+Canonical UTC epoch seconds behind the indexed created_ts / event_ts columns and the bounds used to range-scan them
+"""
+
+import time
+from datetime import datetime, timedelta
+
+DAY_SECONDS = 86400
+
+# created_at is CURRENT_TIMESTAMP, i.e. UTC text
+CREATED_TS_SQL = "CAST(strftime('%s', {column}) AS INTEGER)"
+
+# event_date is the local wall-clock time the user typed, in any of the formats the
+# app has written over time ('%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M:%S', str(datetime)).
+# The 'utc' modifier converts it from local time before taking the epoch.
+EVENT_TS_SQL = "CAST(strftime('%s', {column}, 'utc') AS INTEGER)"
+
+
+def now_ts():
+    return int(time.time())
+
+
+def days_ago_ts(days):
+    return now_ts() - int(days * DAY_SECONDS)
+
+
+def days_ahead_ts(days):
+    return now_ts() + int(days * DAY_SECONDS)
+
+
+def local_ts(value):
+    """Epoch seconds for a naive local datetime"""
+    return int(value.timestamp())
+
+
+def local_day_bounds(day):
+    """[start, end) epoch bounds of a local calendar day"""
+    start = datetime(day.year, day.month, day.day)
+    return local_ts(start), local_ts(start + timedelta(days=1))
+
+
+def local_month_bounds(day):
+    """[start, end) epoch bounds of the local calendar month containing day"""
+    start = datetime(day.year, day.month, 1)
+    if day.month == 12:
+        end = datetime(day.year + 1, 1, 1)
+    else:
+        end = datetime(day.year, day.month + 1, 1)
+    return local_ts(start), local_ts(end)
@@ -0,0 +1,90 @@
+"""
+User Record Cache for HavenMind
+Keeps recently used users rows in a small TTL'd LRU so per-request user lookups skip SQLite
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_app_context
+
+from db import get_db_connection
+
+
+class UserCache:
+    def __init__(self, max_size=None, ttl_seconds=None):
+        self.max_size = max_size or int(os.getenv('USER_CACHE_SIZE', '1024'))
+        # Bounds how stale another worker process can see a user after an update
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('USER_CACHE_TTL', '30'))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """Return a copy of the user's row as a dict, or None if the user does not exist"""
+        if user_id is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+
+        conn = get_db_connection()
+        row = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+        conn.close()
+
+        if row is None:
+            self.invalidate(user_id)
+            return None
+
+        user = dict(row)
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl_seconds, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return dict(user)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+        # Drop the request-level copy too so the rest of the request sees the write
+        if has_app_context():
+            current = g.get('_current_user')
+            if current is not None and current['id'] == user_id:
+                g.pop('_current_user', None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {
+            'size': size,
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+# Global user cache instance
+user_cache = UserCache()
+
+
+def get_user(user_id):
+    return user_cache.get(user_id)
+
+
+def invalidate_user(user_id):
+    user_cache.invalidate(user_id)